@@ -0,0 +1,158 @@
+import tkinter as tk
+
+# Alert levels, in increasing severity
+NEAR_BUDGET = "NEAR_BUDGET"
+OVER_BUDGET = "OVER_BUDGET"
+
+# (level, fraction of the budget the total must exceed)
+DEFAULT_THRESHOLDS = ((NEAR_BUDGET, 0.9), (OVER_BUDGET, 1.0))
+HYSTERESIS = 0.05  # Fraction of the budget the total must drop below a threshold to re-arm it
+
+ALERT_DISPLAY_MS = 4000  # How long an alert stays on screen
+OVERLAY_STYLES = {
+    NEAR_BUDGET: {"bg": "#FFD700", "fg": "black"},
+    OVER_BUDGET: {"bg": "#CB4949", "fg": "white"},
+}
+
+
+class BudgetAlert:
+    """One threshold crossing."""
+    __slots__ = ("level", "total", "budget")
+
+    def __init__(self, level, total, budget):
+        self.level = level
+        self.total = total
+        self.budget = budget
+
+    @property
+    def message(self):
+        if self.level == OVER_BUDGET:
+            return f"Your total (₱{self.total:.2f}) is over your budget (₱{self.budget:.2f})!"
+        return f"Your total (₱{self.total:.2f}) is close to your budget (₱{self.budget:.2f})."
+
+    def __repr__(self):
+        return f"BudgetAlert({self.level}, total={self.total:.2f}, budget={self.budget:.2f})"
+
+
+class BudgetAlertEngine:
+    """
+    Edge-triggered budget thresholds.
+
+    `evaluate` is called with the running total after every basket change and
+    costs a comparison per threshold. A threshold fires once when the total
+    rises above it and is then disarmed; it is re-armed only after the total
+    has fallen below the threshold by `hysteresis` (a fraction of the budget),
+    so an item being taken out and put back near the limit does not alert
+    again and again.
+    """
+
+    def __init__(self, thresholds=DEFAULT_THRESHOLDS, hysteresis=HYSTERESIS):
+        """
+        Args:
+            thresholds: (level, fraction of budget) pairs, in increasing order.
+            hysteresis (float): Re-arm margin as a fraction of the budget.
+        """
+        self.thresholds = tuple(thresholds)
+        self.hysteresis = hysteresis
+        self.budget = 0.0
+        self._armed = {level: True for level, _ in self.thresholds}
+
+    def set_budget(self, budget, total):
+        """
+        Sets a new budget, re-arms every threshold and evaluates the current total.
+
+        Returns:
+            list of BudgetAlert: Thresholds the current total is already over.
+        """
+        self.budget = budget
+        for level in self._armed:
+            self._armed[level] = True
+        return self.evaluate(total)
+
+    def evaluate(self, total):
+        """
+        Checks the total against the thresholds.
+
+        Returns:
+            list of BudgetAlert: Thresholds crossed since the last call (usually empty).
+        """
+        if self.budget <= 0:
+            return []
+        alerts = []
+        for level, fraction in self.thresholds:
+            limit = self.budget * fraction
+            if self._armed[level]:
+                if total > limit:
+                    self._armed[level] = False
+                    alerts.append(BudgetAlert(level, total, self.budget))
+            elif total < limit - self.budget * self.hysteresis:
+                self._armed[level] = True
+        # When several thresholds are crossed at once, only the most severe matters
+        return alerts[-1:]
+
+
+class AlertOverlay:
+    """
+    A single non-modal banner drawn over the top of the main window.
+
+    The widgets are created once, on the first alert, and then only
+    reconfigured: showing an alert updates two labels and places the frame,
+    and a timer hides it again. Unlike a Toplevel with `grab_set`, the banner
+    never blocks scanning or other input.
+    """
+
+    def __init__(self, root, icon_loader=None, display_ms=ALERT_DISPLAY_MS):
+        """
+        Args:
+            root (tk.Tk): Window the banner is placed on.
+            icon_loader (callable, optional): Returns a PhotoImage (or None)
+                for the warning icon; called once.
+        """
+        self.root = root
+        self.icon_loader = icon_loader
+        self.display_ms = display_ms
+        self._frame = None
+        self._hide_job = None
+        self.shown = 0
+
+    def _build(self):
+        self._frame = tk.Frame(self.root, bd=0, padx=10, pady=6)
+        icon = self.icon_loader() if self.icon_loader else None
+        if icon is not None:
+            self._icon = tk.Label(self._frame, image=icon)
+            self._icon.image = icon  # Keep a reference
+        else:
+            self._icon = tk.Label(self._frame, text="⚠️", font=("Arial", 16))
+        self._icon.pack(side=tk.LEFT, padx=(0, 8))
+        self._message = tk.Label(self._frame, font=("Arial", 12, "bold"), wraplength=560, justify=tk.LEFT)
+        self._message.pack(side=tk.LEFT)
+        self._close = tk.Button(self._frame, text="✕", bd=0, font=("Arial", 12, "bold"), command=self.hide)
+        self._close.pack(side=tk.LEFT, padx=(10, 0))
+
+    def show(self, message, level=OVER_BUDGET):
+        """Shows (or replaces) the banner message for `display_ms` milliseconds."""
+        if self._frame is None:
+            self._build()
+        style = OVERLAY_STYLES.get(level, OVERLAY_STYLES[OVER_BUDGET])
+        for widget in (self._frame, self._icon, self._message, self._close):
+            widget.config(bg=style["bg"])
+        for widget in (self._message, self._close):
+            widget.config(fg=style["fg"])
+        self._message.config(text=message)
+        self._frame.place(relx=0.5, y=8, anchor="n")
+        self._frame.lift()
+        self.shown += 1
+
+        if self._hide_job is not None:
+            self.root.after_cancel(self._hide_job)
+        self._hide_job = self.root.after(self.display_ms, self.hide)
+
+    def show_alert(self, alert):
+        self.show(alert.message, alert.level)
+
+    def hide(self):
+        if self._hide_job is not None:
+            self.root.after_cancel(self._hide_job)
+            self._hide_job = None
+        if self._frame is not None:
+            self._frame.place_forget()
@@ -0,0 +1,423 @@
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from outbox import RECEIVED_AT_FIELD
+
+# Columnar store for checkout history.
+#
+# Checkout records (see main.build_transaction_record) are flattened into two
+# tables of fixed-width columns, each column an append-only binary file read
+# back through np.memmap:
+#
+#   checkouts:   timestamp, total, budget, units, lines, basket
+#   line_items:  checkout (row in checkouts), product, quantity, price
+#
+# Product and basket IDs are dictionary-encoded to small integers, so the
+# reports below are a handful of vectorized passes (bincount, masks,
+# histograms) over contiguous arrays instead of per-document queries.
+# meta.json holds the committed row counts and is replaced atomically after
+# every ingest; anything past those counts (an interrupted append) is cut off
+# when the store is opened.
+
+ANALYTICS_DIR = "analytics"
+# Firestore ingestion re-reads this many seconds before its watermark, for
+# commits that were still in flight during the previous read.
+RECEIVED_OVERLAP = 60.0
+OUTBOX_READER = "analytics"  # Name under which ingest_outbox holds back outbox purges
+STORE_FORMAT = 1
+
+TABLES = {
+    'checkouts': (
+        ('timestamp', '<f8'),
+        ('total', '<f8'),
+        ('budget', '<f8'),
+        ('units', '<i4'),
+        ('lines', '<i4'),
+        ('basket', '<i4'),
+    ),
+    'line_items': (
+        ('checkout', '<i4'),
+        ('product', '<i4'),
+        ('quantity', '<i4'),
+        ('price', '<f8'),
+    ),
+}
+
+
+class CheckoutAnalytics:
+    """
+    Checkout history as memory-mapped columns, with aggregate reports.
+
+    Records are de-duplicated by transaction ID, so the same outbox or
+    Firestore export can be ingested repeatedly.
+    """
+
+    def __init__(self, path=ANALYTICS_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._meta = self._read_json("meta.json", {
+            'format': STORE_FORMAT,
+            'rows': {table: 0 for table in TABLES},
+            'outbox_seq': 0,
+        })
+        if self._meta.get('format') != STORE_FORMAT:
+            raise ValueError(f"Unsupported analytics store format: {self._meta.get('format')}")
+
+        products = self._read_json("products.json", {'ids': [], 'names': []})
+        self._product_ids = products['ids']
+        self._product_names = products['names']
+        self._product_codes = {product_id: code for code, product_id in enumerate(self._product_ids)}
+        self._basket_ids = self._read_json("baskets.json", [])
+        self._basket_codes = {basket_id: code for code, basket_id in enumerate(self._basket_ids)}
+
+        rows = self._meta['rows']['checkouts']
+        txn_path = os.path.join(path, "txn_ids.txt")
+        txn_ids = []
+        if os.path.exists(txn_path):
+            with open(txn_path) as f:
+                txn_ids = f.read().split()
+        self._txn_ids = txn_ids[:rows]
+        self._txn_set = set(self._txn_ids)
+
+        self._truncate_uncommitted(rewrite_txn_ids=len(txn_ids) > rows)
+        self._columns = {}
+
+    # --- Storage ---
+
+    def _file(self, table, column):
+        return os.path.join(self.path, f"{table}.{column}.bin")
+
+    def _read_json(self, name, default):
+        try:
+            with open(os.path.join(self.path, name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+
+    def _write_json(self, name, value):
+        tmp = os.path.join(self.path, name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(value, f, separators=(",", ":"))
+        os.replace(tmp, os.path.join(self.path, name))
+
+    def _truncate_uncommitted(self, rewrite_txn_ids):
+        """Cuts every column file (and the txn ID list) back to the committed row count."""
+        for table, columns in TABLES.items():
+            rows = self._meta['rows'][table]
+            for column, dtype in columns:
+                path = self._file(table, column)
+                size = rows * np.dtype(dtype).itemsize
+                if os.path.exists(path) and os.path.getsize(path) > size:
+                    with open(path, "r+b") as f:
+                        f.truncate(size)
+        if rewrite_txn_ids:
+            with open(os.path.join(self.path, "txn_ids.txt"), "w") as f:
+                f.write("".join(txn_id + "\n" for txn_id in self._txn_ids))
+
+    def column(self, table, column):
+        """Returns a read-only array of one column (memory-mapped, cached until the next ingest)."""
+        key = (table, column)
+        array = self._columns.get(key)
+        if array is None:
+            dtype = dict(TABLES[table])[column]
+            rows = self._meta['rows'][table]
+            if rows == 0:
+                array = np.empty(0, dtype=dtype)
+            else:
+                array = np.memmap(self._file(table, column), dtype=dtype, mode="r", shape=(rows,))
+            self._columns[key] = array
+        return array
+
+    def __len__(self):
+        """Number of checkouts in the store."""
+        return self._meta['rows']['checkouts']
+
+    @property
+    def line_item_count(self):
+        return self._meta['rows']['line_items']
+
+    # --- Ingestion ---
+
+    def _code(self, codes, values, key, label=None):
+        code = codes.get(key)
+        if code is None:
+            code = codes[key] = len(values)
+            values.append(key)
+            if label is not None:
+                self._product_names.append(label)
+        return code
+
+    def ingest(self, records):
+        """
+        Appends checkout records, skipping transactions already stored.
+
+        Args:
+            records: Iterable of checkout dicts with 'txnId', 'timestamp',
+                'items' [{'productId', 'itemName', 'itemPrice', 'quantity'}],
+                'total' and optionally 'budget' and 'basketId'.
+
+        Returns:
+            int: Number of checkouts added.
+        """
+        checkouts = {column: [] for column, _ in TABLES['checkouts']}
+        lines = {column: [] for column, _ in TABLES['line_items']}
+        txn_ids = []
+        row = len(self)
+
+        for record in records:
+            txn_id = record.get('txnId')
+            if txn_id is None or txn_id in self._txn_set:
+                continue
+            self._txn_set.add(txn_id)
+            txn_ids.append(txn_id)
+
+            items = record.get('items', [])
+            for item in items:
+                lines['checkout'].append(row)
+                lines['product'].append(self._code(self._product_codes, self._product_ids, item['productId'],
+                                                   item.get('itemName', '')))
+                lines['quantity'].append(int(item.get('quantity', 1)))
+                lines['price'].append(float(item.get('itemPrice', 0.0)))
+            checkouts['timestamp'].append(float(record.get('timestamp', 0.0)))
+            checkouts['total'].append(float(record.get('total', 0.0)))
+            checkouts['budget'].append(float(record.get('budget') or 0.0))
+            checkouts['units'].append(sum(int(item.get('quantity', 1)) for item in items))
+            checkouts['lines'].append(len(items))
+            checkouts['basket'].append(self._code(self._basket_codes, self._basket_ids,
+                                                  record.get('basketId', '')))
+            row += 1
+
+        if not txn_ids:
+            return 0
+
+        for table, values in (('checkouts', checkouts), ('line_items', lines)):
+            for column, dtype in TABLES[table]:
+                with open(self._file(table, column), "ab") as f:
+                    np.asarray(values[column], dtype=dtype).tofile(f)
+        with open(os.path.join(self.path, "txn_ids.txt"), "a") as f:
+            f.write("".join(txn_id + "\n" for txn_id in txn_ids))
+        self._txn_ids.extend(txn_ids)
+        self._write_json("products.json", {'ids': self._product_ids, 'names': self._product_names})
+        self._write_json("baskets.json", self._basket_ids)
+
+        # Committing the new row counts makes the appended data visible
+        self._meta['rows']['checkouts'] = row
+        self._meta['rows']['line_items'] += len(lines['checkout'])
+        self._write_json("meta.json", self._meta)
+        self._columns.clear()
+        return len(txn_ids)
+
+    def ingest_outbox(self, outbox, batch_size=5000):
+        """
+        Ingests the checkouts appended to a CheckoutOutbox since the last call.
+
+        Returns:
+            int: Number of checkouts added.
+        """
+        added = 0
+        while True:
+            rows = outbox.records_after(self._meta['outbox_seq'], batch_size)
+            if not rows:
+                return added
+            added += self.ingest(record for _, _, record in rows)
+            self._meta['outbox_seq'] = rows[-1][0]
+            self._write_json("meta.json", self._meta)
+            outbox.mark_read(OUTBOX_READER, rows[-1][0])
+
+    def ingest_collection(self, collection_ref):
+        """
+        Ingests checkouts from the Firestore 'transactions' collection that
+        arrived since the previous call.
+
+        Paging is on the server-assigned `receivedAt`, not on the basket's own
+        'timestamp', so checkouts delivered late by a basket that was offline
+        (or whose clock is off) are not skipped. The first call reads the
+        whole collection.
+
+        Returns:
+            int: Number of checkouts added.
+        """
+        watermark = self._meta.get('firestore_received')
+        query = collection_ref
+        if watermark is not None:
+            since = datetime.fromtimestamp(watermark - RECEIVED_OVERLAP, tz=timezone.utc)
+            query = collection_ref.where(RECEIVED_AT_FIELD, '>=', since)
+        newest = watermark or 0.0
+
+        def records():
+            nonlocal newest
+            for doc in query.stream():
+                record = doc.to_dict()
+                received = record.get(RECEIVED_AT_FIELD)
+                if received is not None:
+                    newest = max(newest, received.timestamp())
+                yield record
+
+        added = self.ingest(records())
+        self._meta['firestore_received'] = newest
+        self._write_json("meta.json", self._meta)
+        return added
+
+    # --- Reports ---
+
+    def _checkout_mask(self, since=None, until=None):
+        """Boolean mask over checkouts for a time range, or None for all of them."""
+        if since is None and until is None:
+            return None
+        timestamps = self.column('checkouts', 'timestamp')
+        mask = np.ones(len(timestamps), dtype=bool)
+        if since is not None:
+            mask &= timestamps >= since
+        if until is not None:
+            mask &= timestamps < until
+        return mask
+
+    def top_sellers(self, n=10, by="units", since=None, until=None):
+        """
+        Best-selling products.
+
+        Args:
+            n (int): Number of products to return.
+            by (str): 'units' or 'revenue'.
+            since, until (float, optional): Unix time range of the checkouts.
+
+        Returns:
+            list of dict: {'productId', 'itemName', 'units', 'revenue'}, best first.
+        """
+        if by not in ("units", "revenue"):
+            raise ValueError("by must be 'units' or 'revenue'")
+        products = self.column('line_items', 'product')
+        quantities = self.column('line_items', 'quantity')
+        prices = self.column('line_items', 'price')
+        mask = self._checkout_mask(since, until)
+        if mask is not None:
+            line_mask = mask[self.column('line_items', 'checkout')]
+            products, quantities, prices = products[line_mask], quantities[line_mask], prices[line_mask]
+
+        size = len(self._product_ids)
+        units = np.bincount(products, weights=quantities, minlength=size)
+        revenue = np.bincount(products, weights=quantities * prices, minlength=size)
+        ranking = units if by == "units" else revenue
+
+        n = min(n, int(np.count_nonzero(ranking)))
+        if n <= 0:
+            return []
+        top = np.argpartition(-ranking, n - 1)[:n]
+        top = top[np.argsort(-ranking[top], kind="stable")]
+        return [{
+            'productId': self._product_ids[code],
+            'itemName': self._product_names[code],
+            'units': int(units[code]),
+            'revenue': round(float(revenue[code]), 2),
+        } for code in top]
+
+    def basket_size_distribution(self, by="units", bins=10, since=None, until=None):
+        """
+        Distribution of basket sizes.
+
+        Args:
+            by (str): 'units' (items scanned), 'lines' (distinct products) or
+                'total' (amount spent).
+            bins (int): Number of histogram bins for 'total'; unit and line
+                counts are counted exactly.
+
+        Returns:
+            dict: {'by', 'checkouts', 'mean', 'median', 'p90', 'histogram'}, where
+            histogram is [(size, count)] or, for 'total', [(low, high, count)].
+        """
+        if by not in ("units", "lines", "total"):
+            raise ValueError("by must be 'units', 'lines' or 'total'")
+        values = self.column('checkouts', by)
+        mask = self._checkout_mask(since, until)
+        if mask is not None:
+            values = values[mask]
+        if len(values) == 0:
+            return {'by': by, 'checkouts': 0, 'mean': None, 'median': None, 'p90': None, 'histogram': []}
+
+        if by == "total":
+            counts, edges = np.histogram(values, bins=bins)
+            histogram = [(round(float(edges[i]), 2), round(float(edges[i + 1]), 2), int(count))
+                         for i, count in enumerate(counts)]
+        else:
+            counts = np.bincount(values)
+            sizes = np.flatnonzero(counts)
+            histogram = [(int(size), int(counts[size])) for size in sizes]
+        median, p90 = np.percentile(values, [50, 90])
+        return {
+            'by': by,
+            'checkouts': int(len(values)),
+            'mean': round(float(values.mean()), 3),
+            'median': float(median),
+            'p90': float(p90),
+            'histogram': histogram,
+        }
+
+    def budget_overrun_rate(self, since=None, until=None):
+        """
+        How often shoppers who set a budget went over it.
+
+        Returns:
+            dict: {'checkouts', 'with_budget', 'overruns', 'rate',
+            'mean_overrun', 'mean_overrun_pct'} (rates as fractions).
+        """
+        totals = self.column('checkouts', 'total')
+        budgets = self.column('checkouts', 'budget')
+        mask = self._checkout_mask(since, until)
+        if mask is not None:
+            totals, budgets = totals[mask], budgets[mask]
+
+        has_budget = budgets > 0
+        over = has_budget & (totals > budgets)
+        with_budget = int(np.count_nonzero(has_budget))
+        overruns = int(np.count_nonzero(over))
+        excess = totals[over] - budgets[over]
+        return {
+            'checkouts': int(len(totals)),
+            'with_budget': with_budget,
+            'overruns': overruns,
+            'rate': overruns / with_budget if with_budget else None,
+            'mean_overrun': round(float(excess.mean()), 2) if overruns else None,
+            'mean_overrun_pct': round(float((excess / budgets[over]).mean()), 4) if overruns else None,
+        }
+
+    def report(self, top=10, since=None, until=None):
+        """Returns all reports in one dict."""
+        return {
+            'checkouts': len(self),
+            'line_items': self.line_item_count,
+            'top_sellers': self.top_sellers(top, since=since, until=until),
+            'top_by_revenue': self.top_sellers(top, by="revenue", since=since, until=until),
+            'basket_units': self.basket_size_distribution("units", since=since, until=until),
+            'basket_totals': self.basket_size_distribution("total", since=since, until=until),
+            'budget_overrun': self.budget_overrun_rate(since, until),
+        }
+
+
+# Main Execution Block
+if __name__ == "__main__":
+    # Usage: python analytics.py [--outbox checkout_outbox.db] [--firestore] [--top 10]
+    parser = argparse.ArgumentParser(description="Smart Basket checkout analytics")
+    parser.add_argument("--store", default=ANALYTICS_DIR, help="Directory of the columnar store")
+    parser.add_argument("--outbox", help="Ingest new checkouts from this outbox database first")
+    parser.add_argument("--firestore", action="store_true", help="Ingest new checkouts from Firestore first")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--since", type=float, help="Only checkouts at or after this Unix time")
+    parser.add_argument("--until", type=float, help="Only checkouts before this Unix time")
+    args = parser.parse_args()
+
+    analytics = CheckoutAnalytics(args.store)
+    if args.outbox:
+        from outbox import CheckoutOutbox
+        print(f"Ingested {analytics.ingest_outbox(CheckoutOutbox(args.outbox))} checkouts from {args.outbox}")
+    if args.firestore:
+        import firestore
+        from outbox import TRANSACTIONS_COLLECTION
+        if firestore.init_backend():
+            count = analytics.ingest_collection(firestore.db.collection(TRANSACTIONS_COLLECTION))
+            print(f"Ingested {count} checkouts from Firestore")
+
+    print(json.dumps(analytics.report(args.top, args.since, args.until), indent=2, ensure_ascii=False))
@@ -0,0 +1,132 @@
+class BasketLine:
+    """One product line in the basket: a product and how many units of it."""
+    __slots__ = ("product_id", "name", "price", "quantity")
+
+    def __init__(self, product_id, name, price):
+        self.product_id = product_id
+        self.name = name
+        self.price = price
+        self.quantity = 0
+
+    @property
+    def subtotal(self):
+        return self.price * self.quantity
+
+    def __repr__(self):
+        return f"BasketLine({self.product_id!r}, {self.name!r}, {self.price!r}, quantity={self.quantity})"
+
+
+class Basket:
+    """
+    Incrementally maintained shopping basket.
+
+    Every physical unit is identified by its tag; units of the same product
+    are folded into a single BasketLine. Adding or removing a unit updates the
+    line quantity and the running total in constant time, so nothing ever has
+    to walk the whole basket to re-aggregate it.
+
+    The running total is kept in centavos (integers) so that thousands of
+    add/remove operations never accumulate floating point drift.
+    """
+
+    def __init__(self):
+        self._units = {}  # tag -> product_id
+        self._lines = {}  # product_id -> BasketLine
+        self._total_cents = 0
+        self._changed = set()  # product_ids touched since the last drain_changes()
+        self.version = 0  # Incremented on every change
+
+    # --- Mutations ---
+
+    def add(self, tag, product_id, name, price):
+        """
+        Adds one unit identified by `tag`.
+
+        Returns:
+            bool: False if the tag was already in the basket.
+        """
+        if tag in self._units:
+            return False
+
+        line = self._lines.get(product_id)
+        if line is None:
+            line = self._lines[product_id] = BasketLine(product_id, name, float(price))
+
+        self._units[tag] = product_id
+        line.quantity += 1
+        self._total_cents += round(line.price * 100)
+        self._touch(product_id)
+        return True
+
+    def remove(self, tag):
+        """
+        Removes the unit identified by `tag`.
+
+        Returns:
+            BasketLine or None: The line the unit belonged to (its quantity may
+            now be 0), or None if the tag was not in the basket.
+        """
+        product_id = self._units.pop(tag, None)
+        if product_id is None:
+            return None
+
+        line = self._lines[product_id]
+        line.quantity -= 1
+        self._total_cents -= round(line.price * 100)
+        if line.quantity == 0:
+            del self._lines[product_id]
+        self._touch(product_id)
+        return line
+
+    def clear(self):
+        """Empties the basket; every line is reported as changed."""
+        self._changed.update(self._lines)
+        self._units.clear()
+        self._lines.clear()
+        self._total_cents = 0
+        self.version += 1
+
+    def _touch(self, product_id):
+        self._changed.add(product_id)
+        self.version += 1
+
+    # --- Queries ---
+
+    @property
+    def total(self):
+        """Current basket total."""
+        return self._total_cents / 100
+
+    @property
+    def unit_count(self):
+        """Number of physical units (tags) in the basket."""
+        return len(self._units)
+
+    def line(self, product_id):
+        """Returns the BasketLine for a product, or None if it is not in the basket."""
+        return self._lines.get(product_id)
+
+    def lines(self):
+        """Returns the product lines in insertion order."""
+        return list(self._lines.values())
+
+    def drain_changes(self):
+        """
+        Returns the product_ids added, updated or removed since the last call.
+
+        Renderers and sync components use this to touch only what changed;
+        look each ID up with `line()` (None means the line is gone).
+        """
+        changed = self._changed
+        self._changed = set()
+        return changed
+
+    def __contains__(self, tag):
+        return tag in self._units
+
+    def __len__(self):
+        """Number of distinct product lines."""
+        return len(self._lines)
+
+    def __bool__(self):
+        return bool(self._units)
@@ -0,0 +1,144 @@
+import threading
+import time
+
+BASKETS_COLLECTION = "baskets"
+DEBOUNCE_SECONDS = 0.15  # Quiet time after the last change before writing
+MAX_LATENCY_SECONDS = 0.4  # Upper bound on how long a change may wait
+
+
+class BasketSync:
+    """
+    Coalesced, delta-only sync of the live basket to Firestore.
+
+    Basket changes are recorded on the Tk thread and folded per product into
+    a pending delta; a background thread writes the delta as a single merge
+    into baskets/{basket_id} once the basket has been quiet for `debounce`
+    seconds, or at the latest `max_latency` seconds after the first unsent
+    change. A burst of scans therefore costs one write, and the cloud copy
+    is never more than about `max_latency` plus one write round trip stale.
+    """
+
+    def __init__(self, get_db, basket_id, debounce=DEBOUNCE_SECONDS, max_latency=MAX_LATENCY_SECONDS,
+                 collection=BASKETS_COLLECTION):
+        """
+        Args:
+            get_db (callable): Returns the Firestore client, or None while offline.
+            basket_id (str): Document ID of this basket.
+        """
+        self.get_db = get_db
+        self.basket_id = basket_id
+        self.debounce = debounce
+        self.max_latency = max_latency
+        self.collection = collection
+
+        self._cond = threading.Condition()
+        self._lines = {}  # product_id -> line dict, or None for a removed line
+        self._state = None  # Latest basket-level fields (total, unit count)
+        self._reset = False  # Replace the whole document instead of merging
+        self._first_change = None
+        self._last_change = None
+        self._thread = None
+
+        # Counters: changes recorded vs. writes actually sent
+        self.changes = 0
+        self.writes = 0
+        self.failures = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    # --- Called on the Tk thread ---
+
+    def push(self, basket, changed_ids):
+        """Records the current state of the given product lines."""
+        if not changed_ids:
+            return
+        with self._cond:
+            for product_id in changed_ids:
+                line = basket.line(product_id)
+                self._lines[product_id] = None if line is None else {
+                    'itemName': line.name,
+                    'itemPrice': line.price,
+                    'quantity': line.quantity,
+                }
+            self._record_change(basket)
+
+    def push_reset(self, basket):
+        """Records that the basket was emptied (e.g. after checkout)."""
+        with self._cond:
+            self._lines.clear()
+            self._reset = True
+            self._record_change(basket)
+
+    def _record_change(self, basket):
+        now = time.monotonic()
+        self._state = {'total': basket.total, 'unitCount': basket.unit_count}
+        if self._first_change is None:
+            self._first_change = now
+        self._last_change = now
+        self.changes += 1
+        self._cond.notify()
+
+    # --- Background writer ---
+
+    def _due_in(self, now):
+        """Seconds until the pending delta must be written (<= 0 means now)."""
+        return min(self._last_change + self.debounce, self._first_change + self.max_latency) - now
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._first_change is None:
+                    self._cond.wait()
+                wait = self._due_in(time.monotonic())
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                lines, state, reset = self._lines, self._state, self._reset
+                self._lines, self._reset = {}, False
+                self._first_change = self._last_change = None
+
+            if not self._write(lines, state, reset):
+                self._requeue(lines, state, reset)
+                time.sleep(1.0)
+
+    def _write(self, lines, state, reset):
+        db = self.get_db()
+        if db is None:
+            return False
+        try:
+            from firebase_admin import firestore
+            data = dict(state, updatedAt=firestore.SERVER_TIMESTAMP)
+            doc = db.collection(self.collection).document(self.basket_id)
+            if reset:
+                data['lines'] = {pid: line for pid, line in lines.items() if line is not None}
+                doc.set(data)
+            else:
+                data['lines'] = {pid: (firestore.DELETE_FIELD if line is None else line)
+                                 for pid, line in lines.items()}
+                doc.set(data, merge=True)
+            self.writes += 1
+            return True
+        except Exception as e:
+            self.failures += 1
+            print(f"Basket sync failed: {e}")
+            return False
+
+    def _requeue(self, lines, state, reset):
+        """Puts an unsent delta back, underneath any newer changes."""
+        with self._cond:
+            merged = dict(lines)
+            merged.update(self._lines)
+            self._lines = merged
+            self._reset = self._reset or reset
+            if self._state is None:
+                self._state = state
+            now = time.monotonic()
+            self._first_change = now if self._first_change is None else self._first_change
+            self._last_change = now if self._last_change is None else self._last_change
+            self._cond.notify()
+
+    def stats(self):
+        return {'changes': self.changes, 'writes': self.writes, 'failures': self.failures}
@@ -0,0 +1,253 @@
+import bisect
+import math
+import tkinter as tk
+
+from resources import WidgetPool
+
+ROW_BG = "#F0F0F0"
+ROW_HEIGHT = 51  # Approximate height of one rendered row in pixels (40px image + padding + underline)
+OVERSCAN_ROWS = 4  # Extra rows materialized above and below the visible area
+ROW_POOL_IDLE = 64  # Released row widgets kept for reuse
+
+
+class _Row:
+    """Widgets for one materialized basket line, plus the values they show."""
+    __slots__ = ("frame", "image_label", "name_label", "price_label", "quantity_label", "position", "name",
+                 "price", "quantity")
+
+
+class BasketRowView:
+    """
+    Keyed, diff-based renderer for the basket list.
+
+    Row widgets are kept per product ID and are only touched when that
+    product's line changes: a quantity change reconfigures one label, a new
+    product inserts one row and a removed product destroys one row. Rows are
+    kept sorted by name.
+
+    Only the rows that are visible in the scrollable frame (plus a small
+    overscan) are materialized as widgets; everything above and below is
+    represented by two spacer frames of the equivalent height. The cost of a
+    redraw therefore scales with the size of the change and of the viewport,
+    not with the size of the basket.
+
+    Row widgets that scroll out of view or whose product is removed go back
+    to a `WidgetPool` and are refilled for the next row that needs them, so
+    a long-running basket does not keep creating and destroying widgets.
+    """
+
+    def __init__(self, rows_frame, scroll_frame, image_loader, row_height=ROW_HEIGHT, overscan=OVERSCAN_ROWS):
+        """
+        Args:
+            rows_frame (tk.Frame): Container the rows are gridded into.
+            scroll_frame (customtkinter.CTkScrollableFrame): The scrollable frame
+                holding rows_frame, used to find the visible range.
+            image_loader (callable): `image_loader(name)` returns a PhotoImage
+                (or None) for a product name.
+        """
+        self.rows_frame = rows_frame
+        self.image_loader = image_loader
+        self.row_height = row_height
+        self.overscan = overscan
+
+        self._order = []  # Sorted (name, product_id) keys
+        self._lines = {}  # product_id -> (name, price, quantity)
+        self._rows = {}  # product_id -> _Row, materialized rows only
+        self._window = (0, 0)
+        self.pool = WidgetPool(self._build_row, self._hide_row, self._destroy_row, ROW_POOL_IDLE)
+
+        self._top_spacer = tk.Frame(rows_frame, height=0, bg=ROW_BG)
+        self._bottom_spacer = tk.Frame(rows_frame, height=0, bg=ROW_BG)
+
+        # Re-layout when the list is scrolled or resized.
+        self._canvas = getattr(scroll_frame, "_parent_canvas", None)
+        self._layout_pending = False
+        if self._canvas is not None:
+            scroll_command = self._canvas.cget("yscrollcommand")
+
+            def on_scroll(first, last):
+                if scroll_command:
+                    self._canvas.tk.call(scroll_command, first, last)
+                self.schedule_layout()
+
+            self._canvas.configure(yscrollcommand=on_scroll)
+
+    # --- Diffing ---
+
+    def apply(self, basket, changed_ids):
+        """
+        Applies the changes of the given product IDs and re-lays out the view.
+
+        Args:
+            basket (basket.Basket): The basket to read lines from.
+            changed_ids (iterable): Product IDs whose lines changed, typically
+                from `basket.drain_changes()`.
+        """
+        for product_id in changed_ids:
+            line = basket.line(product_id)
+            old = self._lines.get(product_id)
+
+            if line is None:
+                if old is not None:
+                    self._remove(product_id, old[0])
+                continue
+
+            if old is None:
+                bisect.insort(self._order, (line.name, product_id))
+            elif old[0] != line.name:
+                self._remove(product_id, old[0])
+                bisect.insort(self._order, (line.name, product_id))
+
+            self._lines[product_id] = (line.name, line.price, line.quantity)
+            row = self._rows.get(product_id)
+            if row is not None:
+                self._update_labels(row, line.price, line.quantity)
+
+        self.layout()
+
+    def clear(self):
+        for row in self._rows.values():
+            self.pool.release(row)
+        self._rows.clear()
+        self._lines.clear()
+        self._order.clear()
+        self.layout()
+
+    def _remove(self, product_id, name):
+        index = bisect.bisect_left(self._order, (name, product_id))
+        if index < len(self._order) and self._order[index] == (name, product_id):
+            del self._order[index]
+        self._lines.pop(product_id, None)
+        row = self._rows.pop(product_id, None)
+        if row is not None:
+            self.pool.release(row)
+
+    # --- Virtualized layout ---
+
+    def schedule_layout(self):
+        """Coalesces layout requests (e.g. a burst of scroll events) into one."""
+        if not self._layout_pending:
+            self._layout_pending = True
+            self.rows_frame.after_idle(self._run_scheduled_layout)
+
+    def _run_scheduled_layout(self):
+        self._layout_pending = False
+        self.layout()
+
+    def _visible_range(self):
+        count = len(self._order)
+        if self._canvas is None or count == 0:
+            return 0, count
+        top, bottom = self._canvas.yview()
+        first = max(0, int(top * count) - self.overscan)
+        viewport_rows = math.ceil(self._canvas.winfo_height() / self.row_height)
+        last = min(count, max(math.ceil(bottom * count), first + viewport_rows) + self.overscan)
+        return first, last
+
+    def layout(self):
+        """Materializes the rows in the visible window and grids them in order."""
+        first, last = self._visible_range()
+        visible = {product_id for _, product_id in self._order[first:last]}
+
+        # Release rows that scrolled out of the window.
+        for product_id in [pid for pid in self._rows if pid not in visible]:
+            self.pool.release(self._rows.pop(product_id))
+
+        self._set_spacer(self._top_spacer, 0, first)
+        for position in range(first, last):
+            product_id = self._order[position][1]
+            row = self._rows.get(product_id)
+            if row is None:
+                row = self._rows[product_id] = self.pool.acquire()
+                self._fill_row(row, product_id)
+            if row.position != position:
+                row.frame.grid(row=position + 1, column=0, columnspan=3, sticky="ew", padx=5)
+                row.position = position
+        self._set_spacer(self._bottom_spacer, len(self._order) + 1, len(self._order) - last)
+        self._window = (first, last)
+
+    def _set_spacer(self, spacer, grid_row, rows):
+        if rows <= 0:
+            spacer.grid_remove()
+            return
+        spacer.configure(height=rows * self.row_height)
+        spacer.grid(row=grid_row, column=0, columnspan=3, sticky="ew")
+
+    # --- Row widgets ---
+
+    def _build_row(self):
+        """Creates the widgets of an empty row; `_fill_row` gives it content."""
+        row = _Row()
+        row.position = None
+        row.name = None
+        row.price = None
+        row.quantity = None
+
+        # --- Row Frame for the item ---
+        row.frame = tk.Frame(self.rows_frame, bg=ROW_BG)
+        row.frame.grid_columnconfigure(0, weight=1)  # Name
+        row.frame.grid_columnconfigure(1, weight=0)  # Price
+        row.frame.grid_columnconfigure(2, weight=0)  # Quantity
+
+        # --- Image and Name (Column 0) ---
+        product_frame = tk.Frame(row.frame, bg=ROW_BG)
+        product_frame.grid(row=0, column=0, sticky="w", padx=5, pady=5)
+        row.image_label = tk.Label(product_frame, font=("Arial", 16), bg=ROW_BG)
+        row.image_label.pack(side=tk.LEFT, padx=(5, 10))
+
+        # Product name
+        row.name_label = tk.Label(product_frame, bg=ROW_BG, font=("Arial", 12, "bold"))
+        row.name_label.pack(side=tk.LEFT)
+
+        # Price (Column 1) and Quantity (Column 2)
+        row.price_label = tk.Label(row.frame, bg=ROW_BG, font=("Arial", 12))
+        row.price_label.grid(row=0, column=1, sticky="e", padx=(10, 20))
+        row.quantity_label = tk.Label(row.frame, bg=ROW_BG, font=("Arial", 12))
+        row.quantity_label.grid(row=0, column=2, sticky="e", padx=(10, 20))
+
+        # Underline for separation
+        tk.Frame(row.frame, height=1, bg="#CB4949").grid(row=1, column=0, columnspan=3, sticky="ew", padx=5)
+        return row
+
+    def _fill_row(self, row, product_id):
+        """Shows a product's line in a new or recycled row."""
+        name, price, quantity = self._lines[product_id]
+        if row.name != name:
+            image = self.image_loader(name)
+            if image is not None:
+                row.image_label.config(image=image, text="")
+            else:
+                row.image_label.config(image="", text="📦")
+            row.image_label.image = image  # Keep a reference to prevent garbage collection
+            row.name_label.config(text=name)
+            row.name = name
+        self._update_labels(row, price, quantity)
+
+    @staticmethod
+    def _hide_row(row):
+        row.frame.grid_forget()
+        row.position = None
+
+    @staticmethod
+    def _destroy_row(row):
+        row.frame.destroy()
+
+    @staticmethod
+    def _update_labels(row, price, quantity):
+        """Reconfigures only the labels whose value actually changed."""
+        if row.price != price:
+            row.price_label.config(text=f"₱{price:.2f}")
+            row.price = price
+        if row.quantity != quantity:
+            row.quantity_label.config(text=f"{quantity}")
+            row.quantity = quantity
+
+    # --- Introspection ---
+
+    @property
+    def materialized_rows(self):
+        """Number of rows that currently have widgets."""
+        return len(self._rows)
+
+    def __len__(self):
+        return len(self._order)
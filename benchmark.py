@@ -0,0 +1,674 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from fake_firestore import FakeFirestore, make_catalog, make_checkout_records, synthetic_tag_stream, install
+
+# Benchmark suite for the scan -> lookup -> basket -> render -> checkout path.
+#
+# Runs without network, credentials or camera: the Firestore client is
+# replaced by fake_firestore.FakeFirestore (an in-memory `items` collection
+# with configurable latency) and the RFID reader by a replay of synthetic tag
+# streams. Results are written as JSON so runs can be compared between
+# releases. The Tk benchmarks need a display (e.g. run under xvfb-run) and
+# are reported as skipped otherwise.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = "benchmark_results.json"
+RESULTS_FORMAT = 1  # Bumped when the layout of the results file changes
+
+DEFAULT_CATALOG_SIZE = 5000
+DEFAULT_BASKET_SIZES = (10, 50, 200, 1000)
+
+# Soak test (--soak): sessions run before the memory baseline is taken, and
+# how much the RSS may grow after that before the run counts as a leak.
+SOAK_WARMUP_SESSIONS = 100
+SOAK_SAMPLE_EVERY = 100
+SOAK_RSS_TOLERANCE = 4 * 1024 * 1024  # bytes
+
+
+# --- Measurement helpers ---
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples):
+    """
+    Summarizes durations given in seconds.
+
+    Returns:
+        dict: Sample count and mean/p50/p95/p99/max in milliseconds.
+    """
+    values = sorted(samples)
+    if not values:
+        return {'n': 0}
+    return {
+        'n': len(values),
+        'mean_ms': round(sum(values) / len(values) * 1000, 4),
+        'p50_ms': round(percentile(values, 0.50) * 1000, 4),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 4),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 4),
+        'max_ms': round(values[-1] * 1000, 4),
+    }
+
+
+def time_call(function, *args):
+    """Returns (seconds, result) for one call."""
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+class ReplayReader:
+    """
+    A `read_tag(timeout)` function replaying a synthetic tag stream in real time.
+
+    The time of each tag's first read is kept in `first_read`, so the end of
+    the pipeline can compute per-tag latency. Calling `stop()` ends the
+    `scan_loop` that is reading from it.
+    """
+
+    def __init__(self, stream):
+        self._stream = list(stream)
+        self._position = 0
+        self._start = None
+        self._stopped = threading.Event()
+        self.first_read = {}  # tag -> perf_counter() of its first read
+
+    def __call__(self, timeout):
+        if self._stopped.is_set():
+            # SystemExit ends the scan thread without a traceback
+            raise SystemExit
+        if self._start is None:
+            self._start = time.perf_counter()
+        if self._position >= len(self._stream):
+            self._stopped.wait(timeout if timeout is not None else 1.0)
+            return None
+
+        offset, tag = self._stream[self._position]
+        wait = self._start + offset - time.perf_counter()
+        if timeout is not None and wait > timeout:
+            time.sleep(timeout)
+            return None
+        if wait > 0:
+            time.sleep(wait)
+        self._position += 1
+        self.first_read.setdefault(tag, time.perf_counter())
+        return tag
+
+    def stop(self):
+        self._stopped.set()
+
+
+def start_scan_loop(reader, callback):
+    import firestore
+    thread = threading.Thread(target=firestore.scan_loop, args=(reader, callback), daemon=True)
+    thread.start()
+    return thread
+
+
+# --- Headless benchmarks ---
+
+def bench_lookup(fake, catalog, iterations):
+    """Single-document lookups (network and cache) and batched lookups."""
+    import firestore
+    product_ids = list(catalog)[:iterations]
+    round_trips = fake.round_trips
+
+    firestore.product_cache.clear()
+    network = [time_call(firestore.get_product_info, pid)[0] for pid in product_ids]
+    cached = [time_call(firestore.get_product_info, pid)[0] for pid in product_ids]
+
+    firestore.product_cache.clear()
+    batch_size = 10
+    batches = [time_call(firestore.get_product_info_many, product_ids[i:i + batch_size])[0]
+               for i in range(0, len(product_ids), batch_size)]
+
+    # A stray tag (loyalty card, foreign item) read over and over
+    stray_round_trips = fake.round_trips
+    stray = [time_call(firestore.get_product_info, "15235253435")[0] for _ in range(iterations)]
+
+    return {
+        'network_single': summarize(network),
+        'cache_hit': summarize(cached),
+        f'network_batch_of_{batch_size}': summarize(batches),
+        'stray_tag_repeated': summarize(stray),
+        'stray_tag_round_trips': fake.round_trips - stray_round_trips,
+        'round_trips': fake.round_trips - round_trips,
+    }
+
+
+def bench_tail_latency(fake, catalog, iterations, slow_fraction=0.05, slow_latency=1.0):
+    """
+    Lookups while a share of Firestore round trips stall, with and without
+    hedging, then during an outage (every round trip stalls past the deadline).
+    """
+    import firestore
+    from resilient_lookup import CircuitBreaker
+    client = firestore.lookup_client
+    product_ids = list(catalog)[:iterations]
+    cache_ttl = firestore.product_cache.ttl
+    fake.slow_fraction, fake.slow_latency = slow_fraction, slow_latency
+
+    def lookups():
+        firestore.product_cache.clear()
+        return summarize([time_call(firestore.get_product_info, pid)[0] for pid in product_ids])
+
+    results = {}
+    try:
+        client.hedge = False
+        results['unhedged'] = lookups()
+        client.hedge = True
+        before = client.stats()
+        results['hedged'] = lookups()
+        after = client.stats()
+        results['hedges_sent'] = after['hedged'] - before['hedged']
+        results['hedge_wins'] = after['hedge_wins'] - before['hedge_wins']
+
+        # Outage: lookups give up at the deadline until the breaker opens,
+        # then fail fast; expired cache entries are served meanwhile.
+        fake.slow_fraction, fake.slow_latency = 1.0, 1.0
+        client.deadline = 0.2
+        firestore.product_cache.ttl = 0
+        for pid in product_ids:
+            firestore.product_cache.put(pid, catalog[pid]['itemName'], catalog[pid]['itemPrice'])
+        outage = [time_call(firestore.get_product_info, pid) for pid in product_ids]
+        results['outage'] = summarize([seconds for seconds, _ in outage])
+        results['outage_answered'] = sum(1 for _, (name, _) in outage if name is not None)
+        results['outage_breaker'] = client.stats()['state']
+    finally:
+        fake.slow_fraction = 0.0
+        client.hedge = True
+        client.deadline = firestore.LOOKUP_DEADLINE
+        client.breaker = CircuitBreaker()
+        firestore.product_cache.ttl = cache_ttl
+        firestore.product_cache.clear()
+    results['slow_round_trips'] = fake.slow_round_trips
+    return results
+
+
+def bench_snapshot_lookup(fake, catalog, iterations):
+    """Lookups served by the local catalog snapshot (after a full export)."""
+    import firestore
+    if firestore.catalog_snapshot is None:
+        return {'skipped': 'catalog snapshot disabled'}
+    export_seconds, exported = time_call(firestore.catalog_snapshot.export_all, firestore.doc_ref)
+    firestore.product_cache.clear()
+    round_trips = fake.round_trips
+    samples = [time_call(firestore.get_product_info, pid)[0] for pid in list(catalog)[:iterations]]
+
+    # With a complete snapshot, the known-ID filter rejects unknown tags outright
+    build_seconds, _ = time_call(firestore.rebuild_known_ids)
+    firestore.negative_cache.clear()
+    unknown = [time_call(firestore.get_product_info, f"UNKNOWN{n:013d}")[0] for n in range(iterations)]
+    return {
+        'export_ms': round(export_seconds * 1000, 3),
+        'exported_items': exported,
+        'lookup': summarize(samples),
+        'known_ids_build_ms': round(build_seconds * 1000, 3),
+        'known_ids_bytes': firestore.known_ids.size_bytes if firestore.known_ids else None,
+        'unknown_lookup': summarize(unknown),
+        'round_trips': fake.round_trips - round_trips,
+    }
+
+
+def bench_scan_pipeline(fake, catalog, unique_items, units_per_product=1, timeout=30.0):
+    """
+    Raw tag reads -> debouncer -> batched lookup -> scan callback, in real time.
+
+    Latency is measured from a tag's first read to its ADD event. With
+    `units_per_product` > 1 the stream carries per-unit tags.
+    """
+    import firestore
+    from scan_events import ADD
+    firestore.product_cache.clear()
+    stream = synthetic_tag_stream(catalog, unique_items, units_per_product=units_per_product)
+    unique_items *= units_per_product
+    reader = ReplayReader(stream)
+    latencies = []
+    done = threading.Event()
+    round_trips = fake.round_trips
+
+    def callback(product, tag, event):
+        if event == ADD and product is not None:
+            latencies.append(time.perf_counter() - reader.first_read[tag])
+            if len(latencies) >= unique_items:
+                done.set()
+
+    start_scan_loop(reader, callback)
+    done.wait(timeout)
+    reader.stop()
+    return {
+        'raw_reads': len(stream),
+        'items': unique_items,
+        'events': len(latencies),
+        'scan_to_event': summarize(latencies),
+        'round_trips': fake.round_trips - round_trips,
+    }
+
+
+def bench_session_replay(fake, catalog, unique_items):
+    """Session file size per read, and a recorded stream replayed at maximum speed."""
+    import session_recorder
+    stream = synthetic_tag_stream(catalog, unique_items, units_per_product=3, seed=2)
+    clock = session_recorder.VirtualClock()
+    # A scratch directory, so the benchmark never adds to (or prunes) the real sessions/
+    with tempfile.TemporaryDirectory(prefix="basket-sessions-") as directory:
+        recorder = session_recorder.SessionRecorder(session_recorder.new_session_path(directory), clock)
+        for offset, tag in stream:
+            clock.now = offset
+            recorder.record(tag)
+        recorder.close()
+        session = session_recorder.read_session(recorder.path)
+
+    events = []
+    round_trips = fake.round_trips
+    summary = session_recorder.replay_session(session, lambda product, tag, event: events.append(event), None)
+    summary.update({
+        'file_bytes': recorder.stats()['bytes'],
+        'bytes_per_read': round(recorder.stats()['bytes'] / len(stream), 2),
+        'events': len(events),
+        'round_trips': fake.round_trips - round_trips,
+    })
+    return summary
+
+
+def bench_aggregation(catalog, sizes):
+    """Cost of basket updates as the basket grows (three units per product)."""
+    from basket import Basket
+    from checkout_payload import encode_payload
+    product_ids = list(catalog)
+    results = {}
+    for size in sizes:
+        basket = Basket()
+        adds = []
+        for unit in range(size):
+            pid = product_ids[(unit // 3) % len(product_ids)]
+            item = catalog[pid]
+            adds.append(time_call(basket.add, f"{pid}_U{unit}", pid, item['itemName'], item['itemPrice'])[0])
+        lines = len(basket)
+        drain_seconds, _ = time_call(basket.drain_changes)
+        total_seconds, _ = time_call(lambda: basket.total)
+        lines_seconds, _ = time_call(basket.lines)
+        payload_seconds, payload = time_call(encode_payload, basket.lines(), basket.total)
+        removes = [time_call(basket.remove, f"{product_ids[(unit // 3) % len(product_ids)]}_U{unit}")[0]
+                   for unit in range(0, size, max(1, size // 50))]
+        results[str(size)] = {
+            'units': size,
+            'lines': lines,
+            'add': summarize(adds),
+            'remove': summarize(removes),
+            'drain_changes_ms': round(drain_seconds * 1000, 4),
+            'total_ms': round(total_seconds * 1000, 4),
+            'lines_ms': round(lines_seconds * 1000, 4),
+            'encode_payload_ms': round(payload_seconds * 1000, 4),
+            'payload_chars': len(payload),
+        }
+    return results
+
+
+def bench_checkout_qr(catalog, sizes, repeats=5):
+    """Payload encoding plus QR rendering (of every code, for split payloads), per number of distinct products."""
+    try:
+        from qr_render import render_qr_codes
+        import qrcode  # noqa: F401 (only checking availability)
+    except ImportError as e:
+        return {'skipped': f'qrcode not available: {e}'}
+    from basket import Basket
+    from checkout_payload import encode_payload, split_payload
+    product_ids = list(catalog)
+    results = {}
+    for size in sizes:
+        basket = Basket()
+        for pid in product_ids[:size]:
+            basket.add(pid, pid, catalog[pid]['itemName'], catalog[pid]['itemPrice'])
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            parts = split_payload(encode_payload(basket.lines(), basket.total))
+            render_qr_codes(parts)
+            samples.append(time.perf_counter() - start)
+        results[str(size)] = dict(summarize(samples), codes=len(parts))
+    return results
+
+
+def bench_analytics(catalog, checkouts):
+    """Ingest and report times of the columnar checkout analytics store."""
+    try:
+        from analytics import CheckoutAnalytics
+    except ImportError as e:
+        return {'skipped': f'numpy not available: {e}'}
+    records = make_checkout_records(catalog, checkouts)
+    store = CheckoutAnalytics(tempfile.mkdtemp(prefix="analytics-", dir="."))
+    ingest_seconds, _ = time_call(store.ingest, records)
+    reopen_seconds, store = time_call(CheckoutAnalytics, store.path)
+    return {
+        'checkouts': len(store),
+        'line_items': store.line_item_count,
+        'ingest_ms': round(ingest_seconds * 1000, 3),
+        'open_ms': round(reopen_seconds * 1000, 3),
+        'top_sellers_ms': round(time_call(store.top_sellers, 10)[0] * 1000, 3),
+        'top_by_revenue_ms': round(time_call(store.top_sellers, 10, "revenue")[0] * 1000, 3),
+        'basket_size_ms': round(time_call(store.basket_size_distribution, "units")[0] * 1000, 3),
+        'budget_overrun_ms': round(time_call(store.budget_overrun_rate)[0] * 1000, 3),
+        'full_report_ms': round(time_call(store.report)[0] * 1000, 3),
+    }
+
+
+# --- Tk benchmarks (need a display) ---
+
+def open_ui():
+    """
+    Builds the real basket UI from main.py without starting the scanner.
+
+    Returns:
+        (main module, tk root), or (None, reason) if no display is available.
+    """
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        return None, f'no display: {e}'
+
+    import main
+    main.auto_scan = lambda: None  # The benchmarks drive scanning themselves
+    main.IMAGE_PATH = os.path.join(REPO_DIR, main.IMAGE_PATH)
+    main.root = root
+    main.init(root)
+    root.update()
+    return main, root
+
+
+def pump(root, until, timeout=30.0):
+    """Runs the Tk event loop until `until()` is true."""
+    deadline = time.perf_counter() + timeout
+    while not until() and time.perf_counter() < deadline:
+        root.update()
+        time.sleep(0.001)
+
+
+def bench_render_pipeline(main, root, fake, catalog, unique_items):
+    """
+    Scan-to-render latency: raw read -> scan thread -> update_display_from_scan
+    -> GUI tick (process_scan_events) -> update_display.
+
+    Includes the wait for the next frame (FRAME_INTERVAL_MS).
+    """
+    import firestore
+    firestore.product_cache.clear()
+    stream = synthetic_tag_stream(catalog, unique_items, seed=1)
+    reader = ReplayReader(stream)
+    rendered = {}
+    update_display = main.update_display
+
+    def timed_update_display(changed_ids=None):
+        update_display(changed_ids)
+        root.update_idletasks()  # Include geometry/redraw work in the measurement
+        now = time.perf_counter()
+        for product_id in changed_ids or ():
+            rendered.setdefault(product_id, now)
+
+    main.update_display = timed_update_display
+    try:
+        start_scan_loop(reader, main.update_display_from_scan)
+        root.after(main.FRAME_INTERVAL_MS, main.process_scan_events)
+        pump(root, lambda: len(rendered) >= unique_items)
+    finally:
+        reader.stop()
+        main.update_display = update_display
+
+    latencies = [rendered[tag] - reader.first_read[tag] for tag in rendered if tag in reader.first_read]
+    return {
+        'items': unique_items,
+        'rendered': len(rendered),
+        'frame_interval_ms': main.FRAME_INTERVAL_MS,
+        'scan_to_render': summarize(latencies),
+    }
+
+
+def bench_render_growth(main, root, catalog, sizes, samples=20):
+    """Cost of applying one scan and re-rendering, as the displayed basket grows."""
+    from scan_events import ADD
+    product_ids = list(catalog)
+    main.basket.clear()
+    main.update_display()
+    results = {}
+    added = 0
+    for size in sizes:
+        while added < size - samples:
+            pid = product_ids[added]
+            main.basket.add(pid, pid, catalog[pid]['itemName'], catalog[pid]['itemPrice'])
+            added += 1
+        main.update_display()
+        root.update()
+
+        apply_times = []
+        for _ in range(samples):
+            pid = product_ids[added]
+            product = {'productId': pid, 'itemName': catalog[pid]['itemName'], 'itemPrice': catalog[pid]['itemPrice']}
+            start = time.perf_counter()
+            main.update_display_from_scan(product, pid, ADD)
+            main.apply_pending_scan_events()
+            root.update_idletasks()
+            apply_times.append(time.perf_counter() - start)
+            added += 1
+        results[str(size)] = dict(summarize(apply_times), lines=len(main.basket),
+                                  rows_materialized=main.row_view.materialized_rows)
+    return results
+
+
+def bench_checkout(main, root, catalog):
+    """
+    Time for checkout() to show its window, and until the QR is ready,
+    both cold and after the speculative render while the basket was idle.
+    """
+    def run_checkout():
+        start = time.perf_counter()
+        main.checkout()
+        window_seconds = time.perf_counter() - start
+        future = main.qr_precomputer.request(main.basket.version, main.build_checkout_payload())
+        pump(root, future.done)
+        qr_seconds = time.perf_counter() - start
+        main.qr_window.hide()
+        root.update()
+        return {'window_ms': round(window_seconds * 1000, 3), 'qr_ready_ms': round(qr_seconds * 1000, 3)}
+
+    if not main.basket:
+        return {'skipped': 'empty basket'}
+    cold = run_checkout()
+
+    # Change the basket so the previous render cannot be reused, then let it idle
+    pid = next(iter(catalog))
+    main.basket.add(f"{pid}_checkout", pid, catalog[pid]['itemName'], catalog[pid]['itemPrice'])
+    main.last_basket_change = time.monotonic() - main.QR_IDLE_SECONDS
+    main.precompute_checkout_qr()
+    future = main.qr_precomputer.request(main.basket.version, main.build_checkout_payload())
+    pump(root, future.done)
+    precomputed = run_checkout()
+    return {'lines': len(main.basket), 'cold': cold, 'precomputed': precomputed}
+
+
+def soak(main, root, catalog, sessions, items_per_session=20):
+    """
+    Drives complete shopping sessions through the real UI and checks that
+    resident memory and the number of Tk widgets stay flat.
+
+    Each session scans items in, takes a few out again, sets a budget (every
+    tenth time an invalid one, which opens the error window), checks out,
+    waits for the QR code and resets the basket.
+    """
+    import random
+    from scan_events import ADD, REMOVE
+    rng = random.Random(0)
+    product_ids = list(catalog)
+    manager = main.resource_manager
+    warmup = max(1, min(SOAK_WARMUP_SESSIONS, sessions // 2))
+    baseline = None
+    samples = []
+    start = time.perf_counter()
+
+    for session in range(sessions):
+        chosen = rng.sample(product_ids, items_per_session)
+        for pid in chosen:
+            product = {'productId': pid, 'itemName': catalog[pid]['itemName'], 'itemPrice': catalog[pid]['itemPrice']}
+            main.update_display_from_scan(product, f"{pid}_U{session}", ADD)
+        main.apply_pending_scan_events()
+        root.update()
+        for pid in chosen[:3]:
+            main.update_display_from_scan(None, f"{pid}_U{session}", REMOVE)
+        main.apply_pending_scan_events()
+
+        main.show_budget_entry()
+        main.budget_entry.insert(0, "abc" if session % 10 == 0 else str(rng.randint(100, 5000)))
+        main.set_budget_from_entry()
+        root.update()
+        main.error_window.hide()
+
+        main.checkout()
+        qr_label = main.qr_window.widgets['qr']
+        pump(root, lambda: str(qr_label.cget("image")) != "")
+        main.reset_basket()
+        root.update()
+
+        done = session + 1
+        if done == warmup or done % SOAK_SAMPLE_EVERY == 0 or done == sessions:
+            report = manager.report(collect=True)
+            if done == warmup:
+                baseline = report
+            samples.append({'session': done, 'rss_mb': round(report['rss_bytes'] / 2 ** 20, 2),
+                            'widgets': report['widgets'], 'gc_objects': report['gc_objects']})
+
+    final = manager.report(collect=True)
+    growth = final['rss_bytes'] - baseline['rss_bytes']
+    return {
+        'sessions': sessions,
+        'seconds': round(time.perf_counter() - start, 1),
+        'rss_growth_mb': round(growth / 2 ** 20, 2),
+        'widget_growth': final['widgets'] - baseline['widgets'],
+        'passed': growth <= SOAK_RSS_TOLERANCE and final['widgets'] <= baseline['widgets'],
+        'samples': samples,
+        'resources': final,
+    }
+
+
+# --- Driver ---
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(args):
+    """Runs all benchmarks (or only the soak test) and returns the results dict."""
+    import firestore
+    from tracing import registry
+    catalog = make_catalog(args.catalog_size)
+    fake = install(FakeFirestore(latency=args.latency, jitter=args.jitter, seed=0))
+    fake.load_items(catalog)
+
+    benchmarks = {}
+    if args.soak:
+        main, root = open_ui()
+        if main is None:
+            benchmarks['soak'] = {'skipped': root, 'passed': False}
+        else:
+            benchmarks['soak'] = soak(main, root, catalog, args.soak)
+            root.destroy()
+        return dict(_run_info(args), benchmarks=benchmarks)
+
+    benchmarks['lookup'] = bench_lookup(fake, catalog, args.iterations)
+    benchmarks['tail_latency'] = bench_tail_latency(fake, catalog, args.iterations)
+    benchmarks['scan_pipeline'] = bench_scan_pipeline(fake, catalog, args.items)
+    benchmarks['scan_pipeline_unit_tags'] = bench_scan_pipeline(fake, catalog, args.items // 3 or 1,
+                                                                units_per_product=3)
+    benchmarks['session_replay'] = bench_session_replay(fake, catalog, args.items)
+    benchmarks['aggregation'] = bench_aggregation(catalog, args.basket_sizes)
+    benchmarks['checkout_qr'] = bench_checkout_qr(catalog, [s for s in args.basket_sizes if s <= 200])
+    benchmarks['analytics'] = bench_analytics(catalog, args.checkouts)
+
+    main, root = (None, 'disabled with --headless') if args.headless else open_ui()
+    if main is None:
+        reason = root
+        for name in ('render_pipeline', 'render_growth', 'checkout'):
+            benchmarks[name] = {'skipped': reason}
+    else:
+        benchmarks['render_pipeline'] = bench_render_pipeline(main, root, fake, catalog, args.items)
+        benchmarks['render_growth'] = bench_render_growth(main, root, catalog, args.basket_sizes)
+        benchmarks['checkout'] = bench_checkout(main, root, catalog)
+        root.destroy()
+
+    # Runs last: the exported snapshot would otherwise serve the lookups above
+    benchmarks['snapshot_lookup'] = bench_snapshot_lookup(fake, catalog, args.iterations)
+    benchmarks['product_cache'] = firestore.product_cache.stats()
+    benchmarks['trace_stages'] = registry.snapshot()
+    return dict(_run_info(args), benchmarks=benchmarks)
+
+
+def _run_info(args):
+    """Environment and configuration recorded with every results file."""
+    return {
+        'format': RESULTS_FORMAT,
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'git_revision': git_revision(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'config': {
+            'catalog_size': args.catalog_size,
+            'latency_ms': args.latency * 1000,
+            'jitter_ms': args.jitter * 1000,
+            'iterations': args.iterations,
+            'items': args.items,
+            'basket_sizes': list(args.basket_sizes),
+            'checkouts': args.checkouts,
+            'soak_sessions': args.soak,
+        },
+    }
+
+
+# Main Execution Block
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Smart Basket performance benchmarks")
+    parser.add_argument("--output", default=RESULTS_PATH, help="JSON results file")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated Firestore round trip (s)")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Random extra latency (s)")
+    parser.add_argument("--catalog-size", type=int, default=DEFAULT_CATALOG_SIZE)
+    parser.add_argument("--iterations", type=int, default=100, help="Lookups per lookup benchmark")
+    parser.add_argument("--items", type=int, default=50, help="Items dropped in per scan stream")
+    parser.add_argument("--basket-sizes", type=int, nargs="+", default=list(DEFAULT_BASKET_SIZES))
+    parser.add_argument("--checkouts", type=int, default=100000, help="Checkouts in the analytics benchmark")
+    parser.add_argument("--headless", action="store_true", help="Skip the Tk benchmarks")
+    parser.add_argument("--soak", type=int, metavar="SESSIONS",
+                        help="Only run the soak test with this many sessions; exits 1 if memory grows")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's own output")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+
+    # Local databases (snapshot, outbox) go to a scratch directory, not the repo
+    os.chdir(tempfile.mkdtemp(prefix="basket-bench-"))
+    # Discarded, not buffered: a long soak run must not accumulate its output
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+        results = run(args)
+
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    for name, result in results['benchmarks'].items():
+        print(f"{name}: {json.dumps(result)[:160]}")
+    print(f"Results written to {output}")
+    if args.soak and not results['benchmarks']['soak'].get('passed'):
+        sys.exit(1)
@@ -0,0 +1,62 @@
+import hashlib
+import math
+
+DEFAULT_FALSE_POSITIVE_RATE = 0.01
+
+
+class BloomFilter:
+    """
+    Compact set-membership filter for strings.
+
+    `x in bloom` is False only if x was never added; it may be True for an ID
+    that was not added, with probability close to the configured false
+    positive rate. Each check hashes the key once (BLAKE2b) and derives all
+    `num_hashes` bit positions from it by double hashing, so a lookup costs
+    the same however large the catalog is, at about 10 bits per ID for a 1%
+    false positive rate.
+    """
+
+    def __init__(self, capacity, false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE):
+        """
+        Args:
+            capacity (int): Number of IDs the filter is sized for.
+            false_positive_rate (float): Target rate at `capacity` IDs.
+        """
+        capacity = max(1, capacity)
+        self.num_bits = max(64, int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    @classmethod
+    def from_ids(cls, ids, false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE, headroom=1.25):
+        """
+        Builds a filter holding `ids`, sized with some headroom for IDs added later.
+        """
+        ids = list(ids)
+        bloom = cls(int(len(ids) * headroom) + 16, false_positive_rate)
+        for key in ids:
+            bloom.add(key)
+        return bloom
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    @property
+    def size_bytes(self):
+        return len(self._bits)
+
+    def __repr__(self):
+        return f"BloomFilter({self.count} ids, {self.size_bytes} bytes, {self.num_hashes} hashes)"
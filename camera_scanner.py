@@ -0,0 +1,133 @@
+import queue
+import threading
+import time
+from collections import deque
+
+# OpenCV (cv2) and Pyzbar are used for camera access and barcode decoding.
+import cv2
+import pyzbar.pyzbar as pyzbar
+
+# Only these symbologies are decoded; skipping the rest makes pyzbar faster.
+BARCODE_SYMBOLS = [
+    pyzbar.ZBarSymbol.EAN13,
+    pyzbar.ZBarSymbol.EAN8,
+    pyzbar.ZBarSymbol.UPCA,
+    pyzbar.ZBarSymbol.CODE128,
+    pyzbar.ZBarSymbol.QRCODE,
+]
+
+
+class CameraScanner:
+    """
+    Continuous, pipelined webcam barcode scanner.
+
+    A capture thread keeps the camera open and pushes frames into a small ring
+    buffer; decode workers take the newest frame, convert it to grayscale,
+    crop it to the region of interest, downscale it and run pyzbar on the
+    result. Decoded barcodes are read with `read_tag`, which makes the scanner
+    a drop-in tag source for `firestore.scan_loop`.
+    """
+
+    def __init__(self, device=0, ring_size=4, decode_workers=2, scale=0.5, roi=None):
+        """
+        Args:
+            device (int): OpenCV camera index.
+            ring_size (int): Number of frames kept; older frames are dropped.
+            decode_workers (int): Number of decode threads.
+            scale (float): Downscale factor applied before decoding (1.0 = off).
+            roi (tuple, optional): (x, y, width, height) crop, in full-resolution
+                pixels, where barcodes are expected to appear.
+        """
+        self.device = device
+        self.scale = scale
+        self.roi = roi
+        self.decode_workers = decode_workers
+
+        self._frames = deque(maxlen=ring_size)
+        self._frames_ready = threading.Condition()
+        self._results = queue.Queue()
+        self._running = threading.Event()
+        self._threads = []
+        self._cap = None
+
+        # Counters for tuning ring size and worker count
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.frames_decoded = 0
+
+    def start(self):
+        """Opens the camera once and starts the capture and decode threads."""
+        if self._running.is_set():
+            return
+        self._cap = cv2.VideoCapture(self.device)
+        if not self._cap.isOpened():
+            raise RuntimeError("Could not open camera.")
+        # Keep the driver's own queue short so frames are always fresh.
+        self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self._running.set()
+        self._threads = [threading.Thread(target=self._capture_loop, daemon=True)]
+        for _ in range(self.decode_workers):
+            self._threads.append(threading.Thread(target=self._decode_loop, daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Stops the threads and releases the camera hardware."""
+        self._running.clear()
+        with self._frames_ready:
+            self._frames_ready.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def read_tag(self, timeout=None):
+        """
+        Returns the next decoded barcode string, or None after `timeout` seconds.
+        """
+        try:
+            return self._results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    # --- Pipeline stages ---
+
+    def _capture_loop(self):
+        while self._running.is_set():
+            ok, frame = self._cap.read()
+            if not ok:
+                time.sleep(0.01)
+                continue
+            with self._frames_ready:
+                if len(self._frames) == self._frames.maxlen:
+                    self.frames_dropped += 1
+                self._frames.append(frame)
+                self.frames_captured += 1
+                self._frames_ready.notify()
+
+    def _decode_loop(self):
+        while self._running.is_set():
+            with self._frames_ready:
+                while not self._frames and self._running.is_set():
+                    self._frames_ready.wait(0.5)
+                if not self._running.is_set():
+                    return
+                # Always decode the newest frame; stale ones are not worth it.
+                frame = self._frames.pop()
+
+            for barcode in pyzbar.decode(self._prepare(frame), symbols=BARCODE_SYMBOLS):
+                self._results.put(barcode.data.decode("utf-8"))
+            self.frames_decoded += 1
+
+    def _prepare(self, frame):
+        """Converts a BGR frame into a cropped, downscaled grayscale image."""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.roi is not None:
+            x, y, w, h = self.roi
+            gray = gray[y:y + h, x:x + w]
+        if self.scale != 1.0:
+            gray = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return gray
@@ -0,0 +1,184 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Default sizing for the in-memory product cache. A store catalog rarely has
+# more than a few thousand SKUs, so this comfortably holds a whole shift.
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_TTL_SECONDS = 15 * 60
+
+# Unknown IDs are remembered for a shorter time, so a product that is added
+# to the catalog becomes scannable quickly even without the realtime listener.
+NEGATIVE_MAX_ENTRIES = 1024
+NEGATIVE_TTL_SECONDS = 60
+
+
+class ProductCache:
+    """
+    Bounded, thread-safe LRU cache of product lookups with TTL expiry.
+
+    Entries map a Firestore document ID to an (itemName, itemPrice) tuple.
+    The scanning thread reads from it while the Firestore snapshot listener
+    writes to it, so every operation takes the internal lock.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # doc_id -> (expires_at, (itemName, itemPrice))
+        self._lock = threading.Lock()
+
+        # Counters reported by stats()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, doc_id):
+        """
+        Returns the cached (itemName, itemPrice) tuple for doc_id, or None.
+
+        A hit moves the entry to the most-recently-used end. Expired entries
+        count as misses but stay in the cache (until evicted or refreshed), so
+        `get_stale` can still serve them while the backend is unreachable.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < now:
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(doc_id)
+            self.hits += 1
+            return value
+
+    def get_stale(self, doc_id):
+        """
+        Returns the cached tuple for doc_id even if it has expired, or None.
+
+        Meant as a fallback when a fresh lookup failed; counters are left untouched.
+        """
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            return entry[1] if entry is not None else None
+
+    def put(self, doc_id, name, price):
+        """Stores a product, evicting the least-recently-used entry when full."""
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[doc_id] = (expires_at, (name, price))
+            self._entries.move_to_end(doc_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, doc_id):
+        """Removes a single product (e.g. after it was deleted in Firestore)."""
+        with self._lock:
+            self._entries.pop(doc_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Returns a snapshot of the cache counters as a plain dict."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            }
+
+    # --- Firestore realtime listener ---
+
+    def on_snapshot(self, col_snapshot, changes, read_time):
+        """
+        Callback for `collection.on_snapshot`.
+
+        Only products that are already cached are refreshed, so the listener
+        keeps hot SKUs fresh without filling the cache with the whole catalog.
+        Removed documents are dropped immediately.
+        """
+        for change in changes:
+            doc = change.document
+            if change.type.name == 'REMOVED':
+                self.invalidate(doc.id)
+                continue
+
+            with self._lock:
+                cached = doc.id in self._entries
+            if cached:
+                item_data = doc.to_dict() or {}
+                self.put(doc.id, item_data.get("itemName", "Unknown Item"), item_data.get("itemPrice", 0.0))
+
+
+class NegativeCache:
+    """
+    Bounded, thread-safe set of IDs recently confirmed not to be products.
+
+    A stray tag near the reader (a loyalty card, a neighbouring basket's
+    item, a foreign barcode) is read many times per second; once Firestore has
+    answered "not found" for it, further reads are rejected from memory until
+    the entry expires after `ttl` seconds.
+    """
+
+    def __init__(self, max_entries=NEGATIVE_MAX_ENTRIES, ttl=NEGATIVE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # doc_id -> expires_at
+        self._lock = threading.Lock()
+
+        # Counters reported by stats()
+        self.hits = 0
+
+    def __contains__(self, doc_id):
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._entries.get(doc_id)
+            if expires_at is None:
+                return False
+            if expires_at < now:
+                del self._entries[doc_id]
+                return False
+            self.hits += 1
+            return True
+
+    def add(self, doc_id):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[doc_id] = expires_at
+            self._entries.move_to_end(doc_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, doc_id):
+        """Forgets an ID, e.g. because the product was just created."""
+        with self._lock:
+            self._entries.pop(doc_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'max_entries': self.max_entries, 'hits': self.hits}
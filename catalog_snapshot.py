@@ -0,0 +1,271 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from tag_decoder import tag_prefixes
+
+# Firestore field holding each product's last modification time. Incremental
+# sync queries on it, so the admin tools should set it with SERVER_TIMESTAMP
+# whenever a product is written.
+UPDATED_AT_FIELD = "updatedAt"
+
+# Deletions do not show up in the incremental query, so every
+# RECONCILE_INTERVAL seconds the full list of document IDs (projected on the
+# document name only, without any fields) is compared with the snapshot.
+DOCUMENT_ID_FIELD = "__name__"
+RECONCILE_INTERVAL = 6 * 60 * 60
+
+
+def _to_epoch(value):
+    """Converts a Firestore timestamp (datetime) or number to epoch seconds."""
+    if value is None:
+        return 0.0
+    if hasattr(value, "timestamp"):
+        return value.timestamp()
+    return float(value)
+
+
+def _from_epoch(seconds):
+    """Converts epoch seconds back into a timezone-aware datetime for queries."""
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+class CatalogSnapshot:
+    """
+    Local SQLite copy of the Firestore 'items' collection, keyed by document ID.
+
+    The snapshot lets the basket boot and scan without any network access:
+    lookups are a single primary-key read on a local file. It is filled by a
+    full export the first time and kept current with incremental syncs on the
+    `updatedAt` field plus the realtime listener changes. Products deleted
+    while the listener was not running are dropped by `reconcile`.
+    """
+
+    def __init__(self, path, reconcile_interval=RECONCILE_INTERVAL):
+        self.path = path
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.Lock()
+        self._touched = None  # While export_all streams: IDs the listener changed in the meantime
+        # The scanning thread and the sync thread share the connection.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " doc_id TEXT PRIMARY KEY,"
+            " item_name TEXT NOT NULL,"
+            " item_price REAL NOT NULL,"
+            " updated_at REAL NOT NULL DEFAULT 0,"
+            " tag_prefixes TEXT NOT NULL DEFAULT ''"
+            ") WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(items)")]
+        if "tag_prefixes" not in columns:
+            # Snapshot from before tag prefixes were stored: the next sync re-exports everything
+            self._conn.execute("ALTER TABLE items ADD COLUMN tag_prefixes TEXT NOT NULL DEFAULT ''")
+            self._conn.execute("DELETE FROM meta WHERE key = 'exported_at'")
+        self._conn.commit()
+
+    # --- Lookups ---
+
+    def get(self, doc_id):
+        """Returns (itemName, itemPrice) for doc_id, or None if not in the snapshot."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT item_name, item_price FROM items WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def get_many(self, doc_ids):
+        """Returns {doc_id: (itemName, itemPrice)} for the IDs present in the snapshot."""
+        doc_ids = list(doc_ids)
+        found = {}
+        # Stay well below SQLite's bound-parameter limit.
+        for start in range(0, len(doc_ids), 500):
+            chunk = doc_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT doc_id, item_name, item_price FROM items WHERE doc_id IN ({placeholders})", chunk
+                ).fetchall()
+            for doc_id, name, price in rows:
+                found[doc_id] = (name, price)
+        return found
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def ids(self):
+        """Returns the document IDs of every product in the snapshot."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT doc_id FROM items")]
+
+    def tag_prefixes(self):
+        """Returns (tag prefix, doc_id) pairs for every product that lists tag prefixes."""
+        with self._lock:
+            rows = self._conn.execute("SELECT doc_id, tag_prefixes FROM items WHERE tag_prefixes != ''").fetchall()
+        return [(prefix, doc_id) for doc_id, prefixes in rows for prefix in prefixes.split("\n")]
+
+    # --- Sync bookkeeping ---
+
+    def _get_meta(self, key, default=None):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def last_synced(self):
+        """Highest `updatedAt` seen so far (epoch seconds), 0.0 if never synced."""
+        with self._lock:
+            return float(self._get_meta("last_synced", 0.0))
+
+    @property
+    def is_complete(self):
+        """True once a full export of the collection has been stored."""
+        with self._lock:
+            return self._get_meta("exported_at") is not None
+
+    @property
+    def reconcile_due(self):
+        """True if the IDs were last checked against Firestore over `reconcile_interval` ago."""
+        with self._lock:
+            reconciled_at = float(self._get_meta("reconciled_at", 0.0))
+        return time.time() - reconciled_at >= self.reconcile_interval
+
+    # --- Writes ---
+
+    @staticmethod
+    def _rows(docs):
+        """Returns the items rows for Firestore document snapshots, and their newest update time."""
+        newest = 0.0
+        rows = []
+        for doc in docs:
+            item_data = doc.to_dict() or {}
+            updated_at = _to_epoch(item_data.get(UPDATED_AT_FIELD) or getattr(doc, "update_time", None))
+            newest = max(newest, updated_at)
+            rows.append((
+                doc.id,
+                item_data.get("itemName", "Unknown Item"),
+                float(item_data.get("itemPrice", 0.0)),
+                updated_at,
+                "\n".join(tag_prefixes(item_data)),
+            ))
+        return rows, newest
+
+    def _write_rows(self, rows, newest):
+        """Upserts rows in the current transaction; the caller holds the lock and commits."""
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO items (doc_id, item_name, item_price, updated_at, tag_prefixes)"
+            " VALUES (?, ?, ?, ?, ?)", rows
+        )
+        if newest > float(self._get_meta("last_synced", 0.0)):
+            self._set_meta("last_synced", newest)
+
+    def _upsert_docs(self, docs):
+        """Writes Firestore document snapshots and returns how many were stored."""
+        rows, newest = self._rows(docs)
+        with self._lock:
+            self._write_rows(rows, newest)
+            if self._touched is not None:
+                self._touched.update(row[0] for row in rows)
+            self._conn.commit()
+        return len(rows)
+
+    def export_all(self, collection_ref):
+        """
+        Replaces the snapshot with a full export of the collection.
+
+        The old contents stay readable until the export is written, in a
+        single transaction. Products the realtime listener changed or removed
+        while the export was streaming keep the listener's newer state.
+
+        Returns:
+            int: The number of products written.
+        """
+        with self._lock:
+            self._touched = set()
+        try:
+            rows, newest = self._rows(collection_ref.stream())
+            with self._lock:
+                touched = self._touched
+                exported = {row[0] for row in rows}
+                local_ids = [row[0] for row in self._conn.execute("SELECT doc_id FROM items")]
+                try:
+                    self._conn.executemany("DELETE FROM items WHERE doc_id = ?",
+                                           [(doc_id,) for doc_id in local_ids
+                                            if doc_id not in exported and doc_id not in touched])
+                    self._conn.execute("DELETE FROM meta")
+                    self._write_rows([row for row in rows if row[0] not in touched], newest)
+                    now = time.time()
+                    self._set_meta("exported_at", now)
+                    self._set_meta("reconciled_at", now)
+                    self._conn.commit()
+                except Exception:
+                    self._conn.rollback()
+                    raise
+        finally:
+            with self._lock:
+                self._touched = None
+        return len(rows)
+
+    def sync(self, collection_ref):
+        """
+        Pulls only the products modified since the last sync.
+
+        Falls back to a full export when the snapshot is empty.
+
+        Returns:
+            int: The number of products written.
+        """
+        if not self.is_complete:
+            return self.export_all(collection_ref)
+
+        since = self.last_synced
+        query = collection_ref.where(UPDATED_AT_FIELD, ">", _from_epoch(since))
+        return self._upsert_docs(query.stream())
+
+    def reconcile(self, collection_ref):
+        """
+        Deletes the products that no longer exist in the collection.
+
+        Only document IDs are transferred, so this costs one read per product
+        but a fraction of the bandwidth of a full export.
+
+        Returns:
+            int: The number of products removed.
+        """
+        remote_ids = {doc.id for doc in collection_ref.select([DOCUMENT_ID_FIELD]).stream()}
+        with self._lock:
+            local_ids = [row[0] for row in self._conn.execute("SELECT doc_id FROM items")]
+            deleted = [(doc_id,) for doc_id in local_ids if doc_id not in remote_ids]
+            self._conn.executemany("DELETE FROM items WHERE doc_id = ?", deleted)
+            self._set_meta("reconciled_at", time.time())
+            self._conn.commit()
+        return len(deleted)
+
+    def apply_changes(self, changes):
+        """Applies `on_snapshot` document changes (added, modified and removed)."""
+        upserts = []
+        removed = []
+        for change in changes:
+            if change.type.name == 'REMOVED':
+                removed.append((change.document.id,))
+            else:
+                upserts.append(change.document)
+        if upserts:
+            self._upsert_docs(upserts)
+        if removed:
+            with self._lock:
+                self._conn.executemany("DELETE FROM items WHERE doc_id = ?", removed)
+                if self._touched is not None:
+                    self._touched.update(doc_id for doc_id, in removed)
+                self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
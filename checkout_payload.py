@@ -0,0 +1,258 @@
+"""
+Compact, versioned checkout payload carried by the checkout QR code.
+
+Binary layout (version 1), before text encoding:
+
+    version      1 byte
+    line count   varint
+    per line:
+      id header  varint: (length << 1) | packed
+      id         packed=1: base62 ID as a big-endian integer of a fixed size
+                 packed=0: UTF-8 bytes
+      quantity   varint
+    total        varint, in centavos
+    checksum     4 bytes, CRC32 of everything above (big-endian)
+
+The bytes are Base45 encoded (RFC 9285) and prefixed with PAYLOAD_PREFIX.
+Every character is in the QR alphanumeric set, so the QR code stores them
+at 5.5 bits each instead of 8 bits in byte mode. Firestore's 20-character
+auto IDs pack into 15 bytes, so a 100-line basket stays around 2.6 KB of
+QR data instead of the ~5 KB human-readable listing.
+
+Payloads longer than MAX_PART_CHARS are shown as several QR codes
+(`split_payload`): the Base45 text is cut into equal parts, each prefixed
+with "SB<index>/<count>:". The cashier scans them in any order and
+`join_parts` restores the payload, whose checksum covers the whole basket.
+"""
+import math
+import re
+import struct
+import zlib
+from collections import namedtuple
+
+PAYLOAD_VERSION = 1
+PAYLOAD_PREFIX = "SB:"
+# Largest text put in one QR code: version 25 at error correction L holds
+# 1853 alphanumeric characters, about the largest code that still scans
+# reliably off the basket's screen (version 40 tops out at 4296).
+MAX_PART_CHARS = 1800
+_PART_HEADER = re.compile(r"SB(\d+)/(\d+):")
+
+BASE45_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:"
+BASE62_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+_BASE45_INDEX = {char: index for index, char in enumerate(BASE45_ALPHABET)}
+_BASE62_INDEX = {char: index for index, char in enumerate(BASE62_ALPHABET)}
+
+CheckoutPayload = namedtuple("CheckoutPayload", ["version", "lines", "total"])
+CheckoutPayload.__doc__ = "Decoded payload: lines is a list of (product_id, quantity); total is in pesos."
+
+
+# --- Base45 (RFC 9285) ---
+
+def base45_encode(data):
+    chars = []
+    for i in range(0, len(data) - 1, 2):
+        value = data[i] * 256 + data[i + 1]
+        value, c = divmod(value, 45)
+        e, d = divmod(value, 45)
+        chars += (BASE45_ALPHABET[c], BASE45_ALPHABET[d], BASE45_ALPHABET[e])
+    if len(data) % 2:
+        d, c = divmod(data[-1], 45)
+        chars += (BASE45_ALPHABET[c], BASE45_ALPHABET[d])
+    return "".join(chars)
+
+
+def base45_decode(text):
+    try:
+        values = [_BASE45_INDEX[char] for char in text]
+    except KeyError as e:
+        raise ValueError(f"Invalid Base45 character: {e}") from None
+    if len(values) % 3 == 1:
+        raise ValueError("Invalid Base45 length")
+
+    out = bytearray()
+    for i in range(0, len(values), 3):
+        chunk = values[i:i + 3]
+        if len(chunk) == 3:
+            value = chunk[0] + chunk[1] * 45 + chunk[2] * 45 * 45
+            if value > 0xFFFF:
+                raise ValueError("Invalid Base45 chunk")
+            out += value.to_bytes(2, "big")
+        else:
+            value = chunk[0] + chunk[1] * 45
+            if value > 0xFF:
+                raise ValueError("Invalid Base45 chunk")
+            out.append(value)
+    return bytes(out)
+
+
+# --- Varints and IDs ---
+
+def _write_varint(out, value):
+    if value < 0:
+        raise ValueError("Varints must be non-negative")
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Truncated payload")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _packed_size(length):
+    """Bytes needed to store any base62 string of `length` characters."""
+    return ((62 ** length - 1).bit_length() + 7) // 8
+
+
+def _write_id(out, product_id):
+    if product_id and all(char in _BASE62_INDEX for char in product_id):
+        value = 0
+        for char in product_id:
+            value = value * 62 + _BASE62_INDEX[char]
+        _write_varint(out, (len(product_id) << 1) | 1)
+        out += value.to_bytes(_packed_size(len(product_id)), "big")
+    else:
+        raw = product_id.encode("utf-8")
+        _write_varint(out, len(raw) << 1)
+        out += raw
+
+
+def _read_id(data, pos):
+    header, pos = _read_varint(data, pos)
+    length, packed = header >> 1, header & 1
+    if not packed:
+        end = pos + length
+        if end > len(data):
+            raise ValueError("Truncated payload")
+        return data[pos:end].decode("utf-8"), end
+
+    end = pos + _packed_size(length)
+    if end > len(data):
+        raise ValueError("Truncated payload")
+    value = int.from_bytes(data[pos:end], "big")
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 62)
+        chars.append(BASE62_ALPHABET[index])
+    return "".join(reversed(chars)), end
+
+
+# --- Payload ---
+
+def encode_payload(lines, total):
+    """
+    Encodes basket lines into the QR text.
+
+    Args:
+        lines (iterable): Objects with `product_id` and `quantity` attributes
+                          (e.g. basket.BasketLine).
+        total (float): Basket total in pesos.
+
+    Returns:
+        str: The QR-ready payload text.
+    """
+    lines = list(lines)
+    out = bytearray([PAYLOAD_VERSION])
+    _write_varint(out, len(lines))
+    for line in lines:
+        _write_id(out, line.product_id)
+        _write_varint(out, line.quantity)
+    _write_varint(out, round(total * 100))
+    out += struct.pack(">I", zlib.crc32(out))
+    return PAYLOAD_PREFIX + base45_encode(bytes(out))
+
+
+def decode_payload(text):
+    """
+    Decodes and verifies a payload produced by `encode_payload`.
+
+    Raises:
+        ValueError: If the text is not a valid payload, the version is not
+                    supported or the checksum does not match.
+
+    Returns:
+        CheckoutPayload
+    """
+    if not text.startswith(PAYLOAD_PREFIX):
+        raise ValueError("Not a Smart Basket checkout payload")
+    data = base45_decode(text[len(PAYLOAD_PREFIX):])
+    if len(data) < 5:
+        raise ValueError("Truncated payload")
+
+    body, checksum = data[:-4], struct.unpack(">I", data[-4:])[0]
+    if zlib.crc32(body) != checksum:
+        raise ValueError("Checksum mismatch")
+
+    version = body[0]
+    if version != PAYLOAD_VERSION:
+        raise ValueError(f"Unsupported payload version {version}")
+
+    count, pos = _read_varint(body, 1)
+    lines = []
+    for _ in range(count):
+        product_id, pos = _read_id(body, pos)
+        quantity, pos = _read_varint(body, pos)
+        lines.append((product_id, quantity))
+    total_cents, pos = _read_varint(body, pos)
+    if pos != len(body):
+        raise ValueError("Trailing data in payload")
+    return CheckoutPayload(version, lines, total_cents / 100)
+
+
+# --- Multi-part payloads ---
+
+def split_payload(text, max_chars=MAX_PART_CHARS):
+    """
+    Splits a payload into QR texts of at most `max_chars` characters.
+
+    Returns:
+        list of str: `[text]` if it fits in one code, otherwise the parts.
+    """
+    if len(text) <= max_chars:
+        return [text]
+    body = text[len(PAYLOAD_PREFIX):]
+    # Room for the longest header; parts of equal size render to equal-sized images
+    header = len(f"SB{len(body)}/{len(body)}:")
+    count = math.ceil(len(body) / (max_chars - header))
+    size = math.ceil(len(body) / count)
+    return [f"SB{index + 1}/{count}:{body[index * size:(index + 1) * size]}" for index in range(count)]
+
+
+def join_parts(texts):
+    """
+    Reassembles the payload from the texts of its QR codes, in any order.
+
+    A single-code payload is returned as is.
+
+    Raises:
+        ValueError: If parts are missing, duplicated or of different payloads.
+    """
+    texts = list(texts)
+    if len(texts) == 1 and texts[0].startswith(PAYLOAD_PREFIX):
+        return texts[0]
+    parts = {}
+    counts = set()
+    for text in texts:
+        match = _PART_HEADER.match(text)
+        if match is None:
+            raise ValueError("Not a Smart Basket checkout payload part")
+        index, count = int(match.group(1)), int(match.group(2))
+        if not 1 <= index <= count or index in parts:
+            raise ValueError(f"Invalid or repeated part {index}/{count}")
+        parts[index] = text[match.end():]
+        counts.add(count)
+    if len(counts) != 1 or len(parts) != counts.pop():
+        raise ValueError(f"Missing or mismatched parts (have {sorted(parts)})")
+    return PAYLOAD_PREFIX + "".join(parts[index] for index in sorted(parts))
@@ -0,0 +1,59 @@
+import threading
+
+
+class ScanEventQueue:
+    """
+    Thread-safe hand-off of scan events from the scanner thread to the Tk thread.
+
+    The scanner thread only appends events; it never touches the basket or any
+    widget. The GUI thread drains everything that accumulated since the last
+    frame in one call and folds it into a single basket update and render.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = []
+
+        # Metrics
+        self.enqueued = 0
+        self.drained = 0
+        self.max_depth = 0
+        self.ticks = 0
+
+    def put(self, product, tag, event):
+        """Queues one scan event. Safe to call from any thread."""
+        with self._lock:
+            self._events.append((product, tag, event))
+            self.enqueued += 1
+            depth = len(self._events)
+            if depth > self.max_depth:
+                self.max_depth = depth
+
+    def drain(self):
+        """
+        Removes and returns all pending events, oldest first.
+
+        Returns:
+            list of (product, tag, event) tuples.
+        """
+        with self._lock:
+            events = self._events
+            self._events = []
+            self.ticks += 1
+            self.drained += len(events)
+        return events
+
+    @property
+    def depth(self):
+        """Number of events waiting for the next GUI tick."""
+        return len(self._events)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'depth': len(self._events),
+                'max_depth': self.max_depth,
+                'enqueued': self.enqueued,
+                'drained': self.drained,
+                'ticks': self.ticks,
+            }
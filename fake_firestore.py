@@ -0,0 +1,368 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+# In-process stand-in for the parts of the Firestore client the basket uses,
+# so lookups, catalog sync and checkout can be exercised (and benchmarked)
+# without network access or credentials.
+
+DEFAULT_LATENCY = 0.05  # Seconds per simulated round trip
+DEFAULT_JITTER = 0.01  # Random extra latency, up to this many seconds
+DEFAULT_SLOW_LATENCY = 1.0  # Seconds a stalled round trip takes (see slow_fraction)
+
+
+class FakeDocumentSnapshot:
+    """Mimics google.cloud.firestore.DocumentSnapshot."""
+    __slots__ = ("id", "exists", "update_time", "_data")
+
+    def __init__(self, doc_id, data, update_time=None):
+        self.id = doc_id
+        self.exists = data is not None
+        self.update_time = update_time
+        self._data = data
+
+    def to_dict(self):
+        return None if self._data is None else dict(self._data)
+
+
+class FakeDocumentChange:
+    """Mimics the change objects passed to `on_snapshot` callbacks."""
+    __slots__ = ("type", "document")
+
+    def __init__(self, change_type, document):
+        self.type = type("ChangeType", (), {"name": change_type})()
+        self.document = document
+
+
+class FakeDocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def get(self, timeout=None):
+        self._client.round_trip()
+        return self._client._snapshot(self.path)
+
+    def set(self, data, merge=False):
+        self._client.round_trip()
+        self._client._write(self.path, data, merge)
+
+    def collection(self, name):
+        return FakeCollectionReference(self._client, f"{self.path}/{name}")
+
+
+class FakeQuery:
+    """A `where` query on a collection; only '>', '>=' and '==' filters are supported."""
+
+    def __init__(self, collection, field, op, value):
+        self._collection = collection
+        self._filter = (field, op, value)
+
+    def stream(self):
+        field, op, value = self._filter
+        for doc in self._collection.stream():
+            field_value = doc.to_dict().get(field)
+            if field_value is None:
+                continue
+            if ((op == ">" and field_value > value) or (op == ">=" and field_value >= value)
+                    or (op == "==" and field_value == value)):
+                yield doc
+
+
+class FakeProjection:
+    """A `select` query on a collection; documents come back without fields."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def stream(self):
+        for doc in self._collection.stream():
+            yield FakeDocumentSnapshot(doc.id, {}, doc.update_time)
+
+
+class FakeCollectionReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, doc_id):
+        return FakeDocumentReference(self._client, f"{self.path}/{doc_id}")
+
+    def stream(self):
+        self._client.round_trip()
+        prefix = self.path + "/"
+        with self._client._lock:
+            paths = [path for path in self._client._docs
+                     if path.startswith(prefix) and "/" not in path[len(prefix):]]
+        for path in paths:
+            yield self._client._snapshot(path)
+
+    def where(self, field, op, value):
+        return FakeQuery(self, field, op, value)
+
+    def select(self, field_paths):
+        return FakeProjection(self)
+
+    def on_snapshot(self, callback):
+        """Registers a listener; the initial snapshot is delivered as 'ADDED' changes."""
+        docs = list(self.stream())
+        watch = FakeWatch(self._client, self.path, callback)
+        with self._client._lock:
+            self._client._watches.append(watch)
+        callback(docs, [FakeDocumentChange("ADDED", doc) for doc in docs], datetime.now(timezone.utc))
+        return watch
+
+
+class FakeWatch:
+    def __init__(self, client, path, callback):
+        self._client = client
+        self.path = path
+        self.callback = callback
+
+    def unsubscribe(self):
+        with self._client._lock:
+            if self in self._client._watches:
+                self._client._watches.remove(self)
+
+
+class FakeWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, ref, data, merge=False):
+        self._writes.append(("set", ref.path, data, merge))
+
+    def create(self, ref, data):
+        self._writes.append(("create", ref.path, data, False))
+
+    def update(self, ref, data):
+        self._writes.append(("set", ref.path, data, True))
+
+    def commit(self):
+        self._client.round_trip()
+        with self._client._lock:
+            for kind, path, _, _ in self._writes:
+                if kind == "create" and path in self._client._docs:
+                    raise AlreadyExists(f"Document already exists: {path}")
+        for _, path, data, merge in self._writes:
+            self._client._write(path, data, merge)
+        self._client.batches_committed += 1
+
+
+class AlreadyExists(Exception):
+    """Same name as google.api_core.exceptions.AlreadyExists, which outbox.py matches by name."""
+
+
+class FakeFirestore:
+    """
+    In-memory Firestore client with configurable round-trip latency.
+
+    Every call that would go over the network (`get`, `get_all`, `stream`,
+    batch commits) sleeps for `latency` plus up to `jitter` seconds and is
+    counted in `round_trips`, so callers can measure both time and chattiness.
+    A `slow_fraction` of round trips stall for `slow_latency` instead, to
+    reproduce the long tail of a congested network. Writes notify `on_snapshot` listeners of the affected collection.
+    """
+
+    def __init__(self, latency=DEFAULT_LATENCY, jitter=DEFAULT_JITTER, seed=None, slow_fraction=0.0,
+                 slow_latency=DEFAULT_SLOW_LATENCY):
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self._random = random.Random(seed)
+        self._docs = {}  # "collection/doc[/sub/doc...]" -> dict
+        self._update_times = {}
+        self._watches = []
+        self._lock = threading.Lock()
+
+        # Counters
+        self.round_trips = 0
+        self.slow_round_trips = 0
+        self.batches_committed = 0
+
+    def round_trip(self):
+        with self._lock:
+            self.round_trips += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            if self.slow_fraction and self._random.random() < self.slow_fraction:
+                self.slow_round_trips += 1
+                delay = self.slow_latency
+        if delay > 0:
+            time.sleep(delay)
+
+    def collection(self, name):
+        return FakeCollectionReference(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def get_all(self, refs, timeout=None):
+        """Fetches several documents in one round trip, like `Client.get_all`."""
+        refs = list(refs)
+        self.round_trip()
+        for ref in refs:
+            yield self._snapshot(ref.path)
+
+    def load_items(self, items, collection="items"):
+        """
+        Seeds a collection without latency or listener notifications.
+
+        Args:
+            items (dict): {doc_id: {'itemName': ..., 'itemPrice': ...}}.
+        """
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            for doc_id, data in items.items():
+                self._docs[f"{collection}/{doc_id}"] = dict(data)
+                self._update_times[f"{collection}/{doc_id}"] = now
+
+    def _snapshot(self, path):
+        with self._lock:
+            data = self._docs.get(path)
+            return FakeDocumentSnapshot(path.rsplit("/", 1)[-1], None if data is None else dict(data),
+                                        self._update_times.get(path))
+
+    def _write(self, path, data, merge):
+        with self._lock:
+            existed = path in self._docs
+            current = dict(self._docs.get(path, {})) if merge else {}
+            for key, value in data.items():
+                if _is_sentinel(value, "delete"):
+                    current.pop(key, None)
+                else:
+                    current[key] = _apply_transform(current.get(key), value)
+            self._docs[path] = current
+            self._update_times[path] = datetime.now(timezone.utc)
+            collection = path.rsplit("/", 1)[0]
+            watches = [watch for watch in self._watches if watch.path == collection]
+        if watches:
+            doc = self._snapshot(path)
+            change = FakeDocumentChange("MODIFIED" if existed else "ADDED", doc)
+            for watch in watches:
+                watch.callback([doc], [change], datetime.now(timezone.utc))
+
+
+def _is_sentinel(value, keyword):
+    """True for a firebase_admin sentinel (DELETE_FIELD, SERVER_TIMESTAMP) whose description mentions `keyword`."""
+    return type(value).__name__ == "Sentinel" and keyword in getattr(value, "description", "").lower()
+
+
+def _apply_transform(current, value):
+    """Applies Firestore transforms (Increment, SERVER_TIMESTAMP) to a field value."""
+    if type(value).__name__ == "Increment":
+        return (current or 0) + value.value
+    if _is_sentinel(value, "timestamp"):
+        return datetime.now(timezone.utc)
+    if isinstance(value, dict):
+        # Nested maps written with merge=True are merged field by field
+        merged = dict(current) if isinstance(current, dict) else {}
+        for key, nested in value.items():
+            if _is_sentinel(nested, "delete"):
+                merged.pop(key, None)
+            else:
+                merged[key] = _apply_transform(merged.get(key), nested)
+        return merged
+    return value
+
+
+def make_catalog(size, seed=0):
+    """
+    Builds a synthetic product catalog.
+
+    Returns:
+        dict: {doc_id: {'itemName': ..., 'itemPrice': ...}} with `size` products
+        and Firestore-like 20-character document IDs.
+    """
+    rng = random.Random(seed)
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+    catalog = {}
+    while len(catalog) < size:
+        doc_id = "".join(rng.choice(alphabet) for _ in range(20))
+        catalog[doc_id] = {
+            'itemName': f"Item {len(catalog):05d}",
+            'itemPrice': round(rng.uniform(5, 500), 2),
+        }
+    return catalog
+
+
+def synthetic_tag_stream(product_ids, unique_items, reads_per_item=5, arrival_interval=0.05,
+                         read_interval=0.01, units_per_product=1, seed=0):
+    """
+    Generates raw RFID reads as a basket antenna would report them.
+
+    `unique_items` tags (drawn from `product_ids`) are dropped into the basket
+    `arrival_interval` seconds apart, and each is then reported
+    `reads_per_item` times, `read_interval` apart, so the repeat reads of
+    neighbouring items interleave. With `units_per_product` > 1, each product
+    is bought that many times and every unit carries its own per-unit tag
+    ("<product id>_U<serial>").
+
+    Returns:
+        list of (offset_seconds, tag) tuples in time order.
+    """
+    rng = random.Random(seed)
+    products = rng.sample(list(product_ids), min(unique_items, len(product_ids)))
+    if units_per_product > 1:
+        tags = [f"{product_id}_U{rng.getrandbits(40):012d}"
+                for product_id in products for _ in range(units_per_product)]
+        rng.shuffle(tags)
+    else:
+        tags = products
+    reads = [(i * arrival_interval + j * read_interval, tag)
+             for i, tag in enumerate(tags) for j in range(reads_per_item)]
+    reads.sort(key=lambda read: read[0])
+    return reads
+
+
+def make_checkout_records(catalog, count, max_lines=20, basket_ids=("basket-01", "basket-02"), seed=0,
+                          start_time=1.7e9):
+    """
+    Generates checkout records in the format saved by main.checkout().
+
+    Product popularity is skewed (a few items sell far more than the rest)
+    and roughly half of the shoppers set a budget.
+
+    Returns:
+        list of dict: Records with 'txnId', 'basketId', 'timestamp', 'items',
+        'total' and 'budget'.
+    """
+    rng = random.Random(seed)
+    product_ids = list(catalog)
+    records = []
+    timestamp = start_time
+    for n in range(count):
+        timestamp += rng.expovariate(1 / 60.0)
+        lines = {}
+        for _ in range(rng.randint(1, max_lines)):
+            product_id = product_ids[min(len(product_ids) - 1, int(rng.paretovariate(1.2)) - 1)]
+            lines[product_id] = lines.get(product_id, 0) + rng.randint(1, 3)
+        items = [{'productId': pid, 'itemName': catalog[pid]['itemName'], 'itemPrice': catalog[pid]['itemPrice'],
+                  'quantity': quantity} for pid, quantity in lines.items()]
+        total = round(sum(item['itemPrice'] * item['quantity'] for item in items), 2)
+        budget = round(total * rng.uniform(0.8, 1.5), -1) if rng.random() < 0.5 else 0.0
+        records.append({'txnId': f"{seed:x}{n:012x}", 'basketId': rng.choice(basket_ids), 'timestamp': timestamp,
+                        'items': items, 'total': total, 'budget': budget})
+    return records
+
+
+def install(fake, items_collection="items"):
+    """
+    Points the `firestore` backend module at a fake client instead of Firebase.
+
+    The product cache is cleared so lookups go through the fake, and the
+    local catalog snapshot is opened and `backend_ready` set as `init_backend`
+    would.
+    """
+    import firestore
+    firestore.open_catalog_snapshot()
+    firestore.db = fake
+    firestore.doc_ref = fake.collection(items_collection)
+    firestore.product_cache.clear()
+    firestore.negative_cache.clear()
+    firestore.backend_ready.set()
+    return fake
@@ -1,71 +1,362 @@
-# OpenCV (cv2) and Pyzbar are used for camera access and barcode scanning,
-# but they are commented out for testing in environments without a physical camera.
-# import cv2
-# import pyzbar.pyzbar as pyzbar
-import cv2
-import pyzbar.pyzbar as pyzbar
-
-# Firebase Admin SDK for interacting with Firestore.
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import firestore
-
-# easygui is used for simple GUI elements, but it's often best replaced by a
-# standard terminal interface (print) for cross-environment compatibility.
-import easygui as e
-
-# Firebase Initialization
-# WARNING: Storing the service account JSON key directly in the code is
-# not secure for production. Use environment variables or a dedicated
-# authentication service in a real deployment.
-try:
-    # Load the service account credentials from the JSON file.
-    cred = credentials.Certificate(
-        "smart-basket-90f82-firebase-adminsdk-jns92-99b59e40f0.json"
-        )
-    # Initialize the Firebase app with the loaded credentials.
-    firebase_admin.initialize_app(cred)
-    # Get a Firestore client instance.
-    db = firestore.client()
-    # Reference to the 'items' collection in the Firestore database.
-    doc_ref = db.collection("items")
-    print("Firebase initialized successfully.")
-except Exception as e:
-    print(f"Error initializing Firebase: {e}")
-    # In a real application, you'd want to handle this error
-    # to prevent the app from crashing.
-
-
-# Barcode Scanning Logic (Currently Mocked)
-def scan_barcode():
+# Heavy backends are imported lazily so that importing this module is cheap:
+# - Camera access and barcode decoding (OpenCV + Pyzbar) live in camera_scanner.py
+#   and are only loaded when USE_CAMERA is enabled (see get_camera).
+# - The Firebase Admin SDK is loaded by init_backend(), which main.py runs on a
+#   background thread while the UI is already on screen.
+
+import threading
+import time
+
+# In-memory product cache that sits in front of every Firestore lookup, and
+# its counterpart for IDs that are known not to be products.
+from catalog_cache import ProductCache, NegativeCache
+# Compact filter of every valid product ID, for rejecting foreign tags locally.
+from bloom_filter import BloomFilter
+# Maps raw (per-unit) tags to product document IDs.
+from tag_decoder import TagDecoder, DEFAULT_SCHEMES
+# Local SQLite copy of the catalog for instant cold start and offline scanning.
+from catalog_snapshot import CatalogSnapshot
+# Scan-event state machine between the reader and the basket.
+from scan_events import TagDebouncer, ADD, REMOVE
+# Durable local outbox for checkout transactions.
+from outbox import CheckoutOutbox, OutboxFlusher
+# Sharded stock counters, decremented on checkout.
+from inventory import ShardedInventory
+# Per-scan traces and latency histograms.
+from tracing import registry, tracer
+# Deadlines, hedged requests and a circuit breaker for backend lookups.
+from resilient_lookup import ResilientClient
+# Raw tag reads are logged to replayable session files.
+from session_recorder import SessionLog, SESSION_DIR
+
+# Offline catalog snapshot mode. When enabled, the whole 'items' collection is
+# mirrored into a local file that is loaded at startup and synced in the
+# background, so scanning works at full speed even without Wi-Fi.
+USE_CATALOG_SNAPSHOT = True
+CATALOG_SNAPSHOT_PATH = "catalog_snapshot.db"
+CATALOG_SYNC_INTERVAL = 60 * 60  # Seconds between background syncs of the snapshot
+
+# Cache of recently scanned products, kept fresh by a realtime listener on
+# the 'items' collection (see init_backend).
+product_cache = ProductCache()
+catalog_watch = None
+
+catalog_snapshot = None  # CatalogSnapshot, opened by open_catalog_snapshot()
+
+# Unknown IDs (foreign tags, loyalty cards, items of a neighbouring basket)
+# are rejected without a network round trip: recently confirmed misses are
+# remembered in `negative_cache`, and once the snapshot holds the whole
+# catalog, `known_ids` (a Bloom filter of every product ID) rules out IDs that
+# are definitely not in it.
+negative_cache = NegativeCache()
+KNOWN_IDS_FALSE_POSITIVE_RATE = 0.01
+known_ids = None  # BloomFilter, built by rebuild_known_ids()
+lookups_rejected = registry.counter("basket_lookups_rejected_total", "Unknown IDs rejected without a lookup")
+
+# Tag schemes (EPC SGTIN-96, "<sku>_U<serial>") reduce per-unit tags to a
+# product key, which the prefix index built from the catalog's `tagPrefix`
+# fields maps to a document ID, so every unit of a SKU shares one catalog
+# entry (and one cached lookup). Tags matching no scheme are document IDs.
+TAG_SCHEMES = DEFAULT_SCHEMES
+tag_decoder = TagDecoder(TAG_SCHEMES)
+
+# Firestore handles, set by init_backend()
+db = None
+doc_ref = None
+
+# Product lookups give Firestore at most LOOKUP_DEADLINE seconds. A lookup
+# still running after the recent p95 latency is hedged with a second request,
+# and repeated failures open a circuit breaker so a dead connection is not
+# waited on at every scan. Failed lookups fall back to the last known
+# (possibly expired) cache entry instead of stalling the scanner.
+LOOKUP_DEADLINE = 2.0
+lookup_client = ResilientClient("firestore", LOOKUP_DEADLINE)
+
+# Checkout transactions are appended to a local SQLite outbox and written to
+# Firestore in batches by a background flusher, so checkout never waits on
+# the network and nothing is lost while offline.
+OUTBOX_PATH = "checkout_outbox.db"
+checkout_outbox = None  # CheckoutOutbox, opened by open_outbox()
+outbox_flusher = None  # OutboxFlusher draining it
+_outbox_lock = threading.Lock()
+
+# Inventory sync (optional per store): each checkout decrements sharded stock
+# counters under items/{id}/stock_shards, in the same batch as the transaction.
+SYNC_INVENTORY = True
+INVENTORY_SHARDS = 10
+inventory = None  # ShardedInventory, set by init_backend()
+
+
+def _inventory_writes(record):
+    if inventory is None:
+        return []
+    return inventory.checkout_writes(record)
+
+# Set once init_backend() has finished (whether or not Firebase is reachable);
+# scanning starts after this.
+backend_ready = threading.Event()
+
+
+def init_backend():
+    """
+    Initializes Firebase and starts the catalog sync and realtime listener.
+
+    This imports the Firebase Admin SDK and talks to the network, so it is
+    meant to run on a background thread. Lookups fall back to the local
+    catalog snapshot until (and unless) it succeeds.
+
+    Returns:
+        bool: True if Firestore is available.
+    """
+    global db, doc_ref, catalog_watch, inventory
+
+    # Available offline too: built from the snapshot stored on disk
+    open_catalog_snapshot()
+    open_outbox()
+    rebuild_known_ids()
+    rebuild_tag_index()
+
+    # Firebase Initialization
+    # WARNING: Storing the service account JSON key directly in the code is
+    # not secure for production. Use environment variables or a dedicated
+    # authentication service in a real deployment.
+    try:
+        # Firebase Admin SDK for interacting with Firestore.
+        import firebase_admin
+        from firebase_admin import credentials
+        from firebase_admin import firestore
+
+        # Load the service account credentials from the JSON file.
+        cred = credentials.Certificate(
+            "smart-basket-90f82-firebase-adminsdk-jns92-99b59e40f0.json"
+            )
+        # Initialize the Firebase app with the loaded credentials.
+        firebase_admin.initialize_app(cred)
+        # Get a Firestore client instance.
+        db = firestore.client()
+        # Reference to the 'items' collection in the Firestore database.
+        doc_ref = db.collection("items")
+        print("Firebase initialized successfully.")
+
+    except Exception as e:
+        print(f"Error initializing Firebase: {e}")
+        # Scanning continues from the local catalog snapshot.
+        backend_ready.set()
+        return False
+
+    if catalog_snapshot is not None:
+        # Sync in the background so scanning never waits on the network.
+        threading.Thread(target=catalog_sync_loop, daemon=True).start()
+    try:
+        # Listen for catalog changes so cached prices never go stale.
+        catalog_watch = doc_ref.on_snapshot(_on_catalog_snapshot)
+    except Exception as e:
+        print(f"Error starting catalog listener: {e}")
+
+    if SYNC_INVENTORY:
+        inventory = ShardedInventory(doc_ref, INVENTORY_SHARDS)
+
+    # Deliver checkouts that were saved while offline (or before a restart).
+    outbox_flusher.start()
+    outbox_flusher.notify()
+
+    backend_ready.set()
+    return True
+
+
+def open_catalog_snapshot():
+    """
+    Opens the local catalog snapshot, once.
+
+    Done here rather than at import so that tools importing this module do
+    not create database files in the working directory.
+    """
+    global catalog_snapshot
+    if not USE_CATALOG_SNAPSHOT or catalog_snapshot is not None:
+        return
+    try:
+        catalog_snapshot = CatalogSnapshot(CATALOG_SNAPSHOT_PATH)
+        print(f"Loaded catalog snapshot with {len(catalog_snapshot)} products.")
+    except Exception as e:
+        print(f"Error opening catalog snapshot: {e}")
+
+
+def open_outbox():
+    """
+    Opens the checkout outbox and creates its flusher, once.
+
+    Called by init_backend(), or by the first checkout if that comes sooner;
+    the flusher is only started by init_backend().
+    """
+    global checkout_outbox, outbox_flusher
+    with _outbox_lock:
+        if checkout_outbox is None:
+            checkout_outbox = CheckoutOutbox(OUTBOX_PATH)
+            outbox_flusher = OutboxFlusher(checkout_outbox, lambda: db, extra_writes=_inventory_writes)
+
+
+def save_transaction(record):
+    """
+    Saves a checkout transaction without waiting on the network.
+
+    The record is committed to the local outbox and the background flusher
+    is woken up to send it to the Firestore 'transactions' collection.
+
+    Args:
+        record (dict): JSON-serializable checkout data (items, total, timestamp...).
+
+    Returns:
+        str: The transaction ID, which is also its Firestore document ID.
+    """
+    open_outbox()
+    txn_id = checkout_outbox.append(record)
+    if inventory is not None:
+        inventory.record_local_checkout(record)
+    outbox_flusher.notify()
+    return txn_id
+
+
+def _on_catalog_snapshot(col_snapshot, changes, read_time):
+    """Realtime listener callback that keeps the caches, the ID filter and the snapshot current."""
+    product_cache.on_snapshot(col_snapshot, changes, read_time)
+    if catalog_snapshot is not None:
+        catalog_snapshot.apply_changes(changes)
+    for change in changes:
+        if change.type.name != 'REMOVED':
+            # New products must not be rejected as unknown
+            negative_cache.discard(change.document.id)
+            if known_ids is not None:
+                known_ids.add(change.document.id)
+            tag_decoder.add_product(change.document.id, change.document.to_dict())
+
+
+def rebuild_known_ids():
+    """
+    Rebuilds the Bloom filter of valid product IDs from the catalog snapshot.
+
+    The filter is only used once the snapshot holds a full export; until then
+    (and without a snapshot) every unknown ID still goes to Firestore.
+    """
+    global known_ids
+    if catalog_snapshot is None or not catalog_snapshot.is_complete:
+        known_ids = None
+        return
+    known_ids = BloomFilter.from_ids(catalog_snapshot.ids(), KNOWN_IDS_FALSE_POSITIVE_RATE)
+    print(f"Known product ID filter rebuilt: {known_ids}")
+
+
+def rebuild_tag_index():
+    """Rebuilds the tag prefix index from the `tagPrefix` fields in the catalog snapshot."""
+    if catalog_snapshot is None:
+        return
+    tag_decoder.set_index(catalog_snapshot.tag_prefixes())
+    print(f"Tag prefix index rebuilt ({len(tag_decoder.index)} prefixes).")
+
+
+def is_unknown_id(data):
+    """
+    True if `data` is certainly not a product ID, decided locally in constant time.
+    """
+    if data in negative_cache:
+        lookups_rejected.inc()
+        return True
+    bloom = known_ids
+    if bloom is not None and data not in bloom:
+        lookups_rejected.inc()
+        return True
+    return False
+
+
+def sync_catalog_snapshot():
+    """
+    Brings the local catalog snapshot up to date with Firestore.
+
+    The first run exports the whole 'items' collection; later runs only pull
+    the products whose update time changed since the previous sync, and
+    drop deleted products when a reconciliation is due.
+    """
+    try:
+        count = catalog_snapshot.sync(doc_ref)
+        print(f"Catalog snapshot synced ({count} products updated).")
+        if catalog_snapshot.reconcile_due:
+            removed = catalog_snapshot.reconcile(doc_ref)
+            print(f"Catalog snapshot reconciled ({removed} deleted products removed).")
+    except Exception as e:
+        print(f"Catalog snapshot sync failed, scanning from local copy: {e}")
+        return
+    # Rebuilt from the snapshot, so IDs and prefixes of removed products go too
+    rebuild_known_ids()
+    rebuild_tag_index()
+
+
+def catalog_sync_loop():
+    """Background thread: syncs the catalog snapshot now and every CATALOG_SYNC_INTERVAL seconds."""
+    while True:
+        sync_catalog_snapshot()
+        time.sleep(CATALOG_SYNC_INTERVAL)
+
+
+# Set to True on devices with a webcam; otherwise scans are mocked.
+USE_CAMERA = False
+
+# Shared continuous capture engine; the camera is opened once and kept open.
+camera = None
+
+# How long the scan thread keeps collecting tags after the first read of a
+# burst before resolving them all with a single batched lookup.
+SCAN_BATCH_WINDOW = 0.05  # seconds
+
+# Reads of the same tag closer together than this are duplicates.
+SCAN_DEBOUNCE_WINDOW = 1.0  # seconds
+# RFID presence mode: remove a tag after this long without a read. None keeps
+# barcode behaviour, where scanning an item again takes it out of the basket.
+SCAN_PRESENCE_TIMEOUT = None
+# How often the scan loop wakes up to expire quiet tags.
+SCAN_EXPIRE_TICK = 0.25  # seconds
+
+# Set by reset_scanner() at checkout; the scan thread then resets its
+# debouncer before handling the next read.
+scan_reset = threading.Event()
+
+# Every raw read of the live tag source is appended to a session file under
+# SESSION_DIR, one file per shopper, so reported slowdowns can be replayed
+# with session_recorder.py. Files are size-capped and the oldest are pruned.
+RECORD_SESSIONS = True
+session_log = None  # SessionLog of the running scanner
+
+
+# Barcode Scanning Logic (Mocked unless USE_CAMERA is enabled)
+def scan_barcode(callback=None):
     """
     Attempts to scan a barcode using the webcam (cv2).
 
-    In this current version, the webcam logic is commented out, and a
+    The webcam is only used when USE_CAMERA is enabled; otherwise a
     hardcoded ID is returned for testing the Firestore lookup functionality.
 
+    Args:
+        callback (callable, optional): When given, runs the continuous scanning
+            loop instead (see `scan_loop`) and reports every basket change as
+            `callback(product, tag, event)`. This is how `main.auto_scan` uses it.
+
     Returns:
         str or None: The barcode data string (e.g., product ID) if found,
                      otherwise returns None.
     """
+    if USE_CAMERA:
+        # --- REAL-WORLD WEBCAM LOGIC ---
+        try:
+            engine = get_camera()
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            return None
+        if callback is not None:
+            scan_loop(_recorded(engine.read_tag), callback)
+            return None
+        return engine.read_tag(timeout=2.0)
 
-    # --- REAL-WORLD WEBCAM LOGIC (Commented out for sandbox testing) ---
-    # cap = cv2.VideoCapture(0)  # Open the default camera (index 0)
-    # if not cap.isOpened():
-    #     print("Error: Could not open camera.")
-    #     return None
-    #
-    # ret, frame = cap.read() # Capture a single frame
-    # if ret:
-    #     barcodes = pyzbar.decode(frame) # Decode barcodes in the frame
-    #     for barcode in barcodes:
-    #         barcode_data = barcode.data.decode("utf-8")
-    #         cap.release() # Release the camera hardware
-    #         cv2.destroyAllWindows()
-    #         return barcode_data
-    #
-    # cap.release()
-    # cv2.destroyAllWindows()
+    if callback is not None:
+        scan_loop(_recorded(_mock_tag_reader()), callback)
+        return None
 
     # MOCKED DATA FOR TESTING
     print("--- Simulating Barcode Scan ---")
@@ -74,6 +365,38 @@ def scan_barcode():
     # return None # Uncomment to test failure case
 
 
+def get_tag_reader():
+    """
+    Returns the `read_tag(timeout)` function of the configured tag source:
+    the shared camera engine when USE_CAMERA is enabled, otherwise the mock.
+    """
+    if USE_CAMERA:
+        return _recorded(get_camera().read_tag)
+    return _recorded(_mock_tag_reader())
+
+
+def _recorded(read_tag):
+    """Wraps a tag source so its reads are logged to session files (if RECORD_SESSIONS)."""
+    global session_log
+    if not RECORD_SESSIONS:
+        return read_tag
+    session_log = SessionLog(SESSION_DIR)
+    print(f"Recording scan sessions to {SESSION_DIR}/")
+    return session_log.wrap(read_tag)
+
+
+def get_camera():
+    """Returns the shared CameraScanner, opening the camera on first use."""
+    global camera
+    if camera is None:
+        # Imported here so OpenCV and Pyzbar are only loaded on camera devices.
+        from camera_scanner import CameraScanner
+        engine = CameraScanner()
+        engine.start()  # Raises RuntimeError if the camera cannot be opened
+        camera = engine
+    return camera
+
+
 def sample():
     """
     Provides a different sample barcode data for alternative testing.
@@ -86,11 +409,126 @@ def sample():
     return barcode_data1
 
 
+def _mock_tag_reader():
+    """
+    Returns a `read_tag(timeout)` function that replays the mocked IDs once,
+    as a single burst, and then reports no further tags.
+    """
+    pending = [scan_barcode(), sample()]
+
+    def read_tag(timeout):
+        if pending:
+            return pending.pop(0)
+        # Nothing left to read: idle like a real reader would.
+        time.sleep(timeout if timeout is not None else 1.0)
+        return None
+
+    return read_tag
+
+
+def reset_scanner():
+    """
+    Makes the scan thread forget all tags, e.g. after checkout.
+
+    Safe to call from any thread; the reset happens on the scan thread before
+    its next read is handled. The next shopper's reads go to a new session file.
+    """
+    scan_reset.set()
+    if session_log is not None:
+        session_log.rotate()
+
+
+def scan_loop(read_tag, callback, window=SCAN_BATCH_WINDOW, clock=time.monotonic):
+    """
+    Continuously reads tags, de-duplicates them and resolves them in bursts.
+
+    Every raw read goes through a `TagDebouncer` first, so repeat reads of a
+    tag that is sitting in the reader field are dropped before any lookup.
+    After the first ADD of a burst, further reads are collected for `window`
+    seconds and then all of them are looked up with one call to
+    `get_product_info_many`, so a handful of items dropped together costs a
+    single round trip. Tags are mapped to product IDs by `tag_decoder` first,
+    so several units of the same SKU need only one lookup.
+
+    Args:
+        read_tag (callable): `read_tag(timeout)` returns the next tag string, or
+            None if nothing was read within `timeout` seconds.
+        callback (callable): Called as `callback(product, tag, event)` for every
+            basket change, where event is `scan_events.ADD` or `scan_events.REMOVE`
+            and product is {'productId': ..., 'itemName': ..., 'itemPrice': ...}
+            or None.
+        window (float): Burst collection window in seconds.
+        clock (callable): Time source for de-duplication and the burst
+            window; a session replay passes its own (see session_recorder.py).
+    """
+    debouncer = TagDebouncer(SCAN_DEBOUNCE_WINDOW, SCAN_PRESENCE_TIMEOUT, clock)
+    reads = registry.counter("basket_tag_reads_total", "Raw tag reads from the reader")
+    duplicates = registry.counter("basket_tag_duplicates_total", "Raw reads dropped by the debouncer")
+
+    def observe(tag):
+        reads.inc()
+        event = debouncer.observe(tag)
+        if event is None:
+            duplicates.inc()
+            return
+        # Each basket change is traced from its first read to the redraw
+        tracer.begin(tag, event)
+        events.append((tag, event))
+
+    while True:
+        # Wake up regularly even without reads so quiet tags can expire.
+        tag = read_tag(SCAN_EXPIRE_TICK)
+        if scan_reset.is_set():
+            # Checkout emptied the basket: the next read of any tag is a new ADD
+            scan_reset.clear()
+            debouncer.reset()
+        events = []
+        for expired in debouncer.expire():
+            tracer.begin(expired, REMOVE)
+            events.append((expired, REMOVE))
+
+        if tag is not None:
+            observe(tag)
+
+        if any(event == ADD for _, event in events):
+            deadline = clock() + window
+            remaining = window
+            while remaining > 0:
+                tag = read_tag(remaining)
+                if tag is not None:
+                    observe(tag)
+                remaining = deadline - clock()
+
+        if not events:
+            continue
+
+        traces = [tracer.get(tag) for tag, _ in events]
+        for trace in traces:
+            tracer.mark(trace, "read")
+        product_ids = {tag: tag_decoder.product_id(tag) for tag, _ in events}
+        products = get_product_info_many(product_ids.values())
+        now = time.perf_counter()
+        for trace in traces:
+            tracer.mark(trace, "lookup", now)
+        for tag, event in events:
+            product_id = product_ids[tag]
+            name, price = products.get(product_id, (None, None))
+            product = None
+            if name is not None:
+                product = {'productId': product_id, 'itemName': name, 'itemPrice': price}
+            callback(product, tag, event)
+
+
 # Firestore Data Retrieval
 def get_product_info(data):
     """
     Retrieves product information from Firestore based on the barcode data (document ID).
 
+    Products that were looked up recently are served from `product_cache`,
+    then from the local catalog snapshot, and only then from Firestore
+    (through `lookup_client`). IDs known not to be products (see
+    `is_unknown_id`) are rejected without any lookup.
+
     Args:
         data (str): The barcode data, which is used as the Firestore document ID.
 
@@ -98,14 +536,31 @@ def get_product_info(data):
         tuple (str, float) or (None, None): A tuple containing (itemName, itemPrice)
         if the product is found, otherwise (None, None).
     """
-    print(f"Attempting to look up product with ID: {data}")
-    try:
-        # Get the specific document using the barcode data as the ID.
-        query = doc_ref.document(data).get()
-    except Exception as e:
-        print(f"Firestore query failed: {e}")
+    # Repeat SKUs resolve from memory without touching the network.
+    cached = product_cache.get(data)
+    if cached is not None:
+        return cached
+
+    # Stray and foreign tags stop here instead of costing a round trip.
+    if is_unknown_id(data):
         return None, None
 
+    if catalog_snapshot is not None:
+        local = catalog_snapshot.get(data)
+        if local is not None:
+            product_cache.put(data, *local)
+            return local
+
+    print(f"Attempting to look up product with ID: {data}")
+    # Get the specific document using the barcode data as the ID.
+    query = lookup_client.call(lambda: doc_ref.document(data).get(timeout=LOOKUP_DEADLINE),
+                               fallback=lambda: None)
+    if query is None:
+        # Firestore is slow or unreachable; this is not a confirmed miss, so
+        # the ID is not added to the negative cache.
+        stale = product_cache.get_stale(data)
+        return stale if stale is not None else (None, None)
+
     # Check if the document exists in the database.
     if query.exists:
         item_data = query.to_dict()
@@ -113,14 +568,83 @@ def get_product_info(data):
         itemName = item_data.get("itemName", "Unknown Item")
         itemPrice = item_data.get("itemPrice", 0.0) # Default to 0.0 if price is missing
         print(f"Found Item: {itemName}, Price: {itemPrice}")
+        product_cache.put(data, itemName, itemPrice)
         return itemName, itemPrice
     else:
         print(f"Error: Product ID '{data}' not found in database.")
+        negative_cache.add(data)
         return None, None
 
+
+def get_product_info_many(ids):
+    """
+    Retrieves product information for many barcode IDs with one Firestore request.
+
+    IDs already in `product_cache` or in the local catalog snapshot are
+    resolved locally, and IDs known not to be products are rejected; the
+    rest are fetched together with `db.get_all`, under the same deadline and
+    fallback as `get_product_info`.
+
+    Args:
+        ids (iterable of str): The barcode data / Firestore document IDs.
+                               Duplicates are looked up only once.
+
+    Returns:
+        dict: {id: (itemName, itemPrice)} for every requested ID, with
+        (None, None) for products that could not be found.
+    """
+    results = {}
+    missing = []
+    for data in dict.fromkeys(ids):  # De-duplicate, keeping order
+        cached = product_cache.get(data)
+        if cached is not None:
+            results[data] = cached
+        elif is_unknown_id(data):
+            results[data] = (None, None)
+        else:
+            missing.append(data)
+
+    if missing and catalog_snapshot is not None:
+        for data, local in catalog_snapshot.get_many(missing).items():
+            product_cache.put(data, *local)
+            results[data] = local
+        missing = [data for data in missing if data not in results]
+
+    if not missing:
+        return results
+
+    print(f"Attempting to look up {len(missing)} products in one batch")
+    snapshots = lookup_client.call(
+        lambda: list(db.get_all([doc_ref.document(data) for data in missing], timeout=LOOKUP_DEADLINE)),
+        fallback=lambda: None)
+    if snapshots is None:
+        # Firestore is slow or unreachable: use whatever the cache still holds
+        for data in missing:
+            stale = product_cache.get_stale(data)
+            if stale is not None:
+                results[data] = stale
+        snapshots = []
+
+    for query in snapshots:
+        if not query.exists:
+            negative_cache.add(query.id)
+            continue
+        item_data = query.to_dict()
+        itemName = item_data.get("itemName", "Unknown Item")
+        itemPrice = item_data.get("itemPrice", 0.0)
+        product_cache.put(query.id, itemName, itemPrice)
+        results[query.id] = (itemName, itemPrice)
+
+    for data in missing:
+        if data not in results:
+            print(f"Error: Product ID '{data}' not found in database.")
+            results[data] = (None, None)
+    return results
+
 # Main Execution Block
 if __name__ == "__main__":
     # The main block executes when the script is run directly.
+    init_backend()
 
     # Simulate the primary barcode scan
     barcode = scan_barcode()
@@ -135,6 +659,10 @@ if __name__ == "__main__":
             print(f"Product Price: ${price:.2f}")
             print("------------------------------------")
 
+            # A second lookup of the same ID is served from the cache.
+            get_product_info(barcode)
+            print(f"Product cache stats: {product_cache.stats()}")
+
             # Here, you would typically add the item to a shopping basket or display it in the UI.
         else:
             print("\nProduct lookup failed. The ID may not exist in the database.")
@@ -0,0 +1,531 @@
+import argparse
+import asyncio
+import hmac
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from collections import defaultdict
+
+import firestore
+from basket import Basket
+from checkout_payload import encode_payload, split_payload
+from scan_events import TagDebouncer, ADD, REMOVE
+
+GATEWAY_PORT = 8765
+LOOKUP_BATCH_WINDOW = 0.005  # Seconds to gather lookups from all baskets into one batch
+EXPIRE_TICK = 0.25  # Seconds between presence-timeout sweeps
+SESSION_IDLE_TIMEOUT = 30 * 60  # Forget empty baskets that have been silent this long
+# Shared secret baskets must send in HELLO; None accepts any basket (loopback only, see serve)
+GATEWAY_SECRET = os.environ.get("BASKET_GATEWAY_SECRET") or None
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+RECONNECT_MIN_DELAY = 0.5  # Seconds before the client's first reconnect attempt
+RECONNECT_MAX_DELAY = 30.0  # Cap for the client's doubling reconnect delay
+CHECKOUT_ACK_TIMEOUT = 3.0  # Seconds the client waits for the gateway to confirm a checkout
+
+# Wire protocol (one line per message, UTF-8):
+#   basket -> gateway:  HELLO <basket_id> [secret] | TAG <tag> | CHECKOUT [json] | RESET | STATE
+#   gateway -> basket:  one JSON object per line, e.g.
+#       {"event": "ADD", "tag": ..., "productId": ..., "itemName": ..., "itemPrice": ..., "total": ...}
+# The plain-text requests keep the ESP8266 firmware trivial. Baskets that
+# show their own basket (the Tk UI) send it with CHECKOUT as
+#   {"txnId": ..., "budget": ..., "items": [{"productId": ..., "quantity": ...}], "total": ...}
+# and the gateway only saves the transaction if its copy matches.
+
+_background_tasks = set()  # The event loop only keeps weak references to tasks
+
+
+def _spawn(coro):
+    """Schedules a coroutine as a task that stays referenced until it finishes."""
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+class LookupBatcher:
+    """
+    Coalesces product lookups from every basket into batched catalog calls.
+
+    Lookups requested within LOOKUP_BATCH_WINDOW of each other are resolved
+    with a single `firestore.get_product_info_many` call on a worker thread,
+    on top of the shared product cache and catalog snapshot.
+    """
+
+    def __init__(self, window=LOOKUP_BATCH_WINDOW):
+        self.window = window
+        self._pending = {}  # product_id -> [futures]
+        self._flush_scheduled = False
+        self.batches = 0
+
+    async def resolve(self, product_id):
+        """Returns (itemName, itemPrice), or (None, None) if unknown."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(product_id, []).append(future)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            loop.call_later(self.window, lambda: _spawn(self._flush()))
+        return await future
+
+    async def _flush(self):
+        pending, self._pending = self._pending, {}
+        self._flush_scheduled = False
+        self.batches += 1
+        loop = asyncio.get_running_loop()
+        try:
+            products = await loop.run_in_executor(None, firestore.get_product_info_many, list(pending))
+        except Exception as e:
+            print(f"Gateway lookup failed: {e}")
+            products = {}
+        for product_id, futures in pending.items():
+            result = products.get(product_id, (None, None))
+            for future in futures:
+                if not future.done():
+                    future.set_result(result)
+
+
+class BasketSession:
+    """State of one remote basket: its contents, debouncer and listeners."""
+    __slots__ = ("basket_id", "basket", "debouncer", "listeners", "last_seen")
+
+    def __init__(self, basket_id, debounce_window, presence_timeout):
+        self.basket_id = basket_id
+        self.basket = Basket()
+        self.debouncer = TagDebouncer(debounce_window, presence_timeout)
+        self.listeners = set()  # callables taking an event dict
+        self.last_seen = time.monotonic()
+
+    def notify(self, message):
+        for listener in list(self.listeners):
+            try:
+                listener(message)
+            except Exception as e:
+                print(f"Dropping listener for basket {self.basket_id}: {e}")
+                self.listeners.discard(listener)
+
+
+class BasketGateway:
+    """
+    Headless asyncio service running catalog lookup, basket state and checkout
+    for a fleet of thin baskets.
+
+    Each basket (an ESP8266 over TCP, a broker client, or the Tk UI) streams
+    raw tag reads; the gateway de-duplicates them per basket, resolves
+    products through one shared catalog cache with cross-basket batching,
+    keeps each Basket up to date and pushes ADD/REMOVE events back.
+    TCP baskets must give `secret` in their HELLO when one is set.
+    """
+
+    def __init__(self, debounce_window=firestore.SCAN_DEBOUNCE_WINDOW,
+                 presence_timeout=firestore.SCAN_PRESENCE_TIMEOUT, secret=GATEWAY_SECRET):
+        self.debounce_window = debounce_window
+        self.presence_timeout = presence_timeout
+        self.secret = secret
+        self.sessions = {}
+        self.lookups = LookupBatcher()
+        self.tags_received = 0
+
+    def session(self, basket_id):
+        session = self.sessions.get(basket_id)
+        if session is None:
+            session = self.sessions[basket_id] = BasketSession(basket_id, self.debounce_window,
+                                                               self.presence_timeout)
+        session.last_seen = time.monotonic()
+        return session
+
+    # --- Basket operations ---
+
+    async def handle_tag(self, basket_id, tag):
+        """Processes one raw tag read from a basket."""
+        self.tags_received += 1
+        session = self.session(basket_id)
+        event = session.debouncer.observe(tag)
+        if event is None:
+            return  # Duplicate read
+        if event == REMOVE:
+            self._remove(session, tag)
+            return
+
+        product_id = firestore.tag_decoder.product_id(tag)
+        name, price = await self.lookups.resolve(product_id)
+        if self.sessions.get(basket_id) is not session or not session.debouncer.is_present(tag):
+            return  # Removed, expired or checked out while the lookup was in flight
+        if name is None:
+            session.notify({'event': 'UNKNOWN', 'tag': tag})
+            return
+        if session.basket.add(tag, product_id, name, price):
+            session.notify({'event': ADD, 'tag': tag, 'productId': product_id, 'itemName': name,
+                            'itemPrice': price, 'total': session.basket.total})
+
+    def _remove(self, session, tag):
+        line = session.basket.remove(tag)
+        if line is not None:
+            session.notify({'event': REMOVE, 'tag': tag, 'productId': line.product_id, 'itemName': line.name,
+                            'itemPrice': line.price, 'total': session.basket.total})
+
+    async def checkout(self, basket_id, expected=None):
+        """
+        Saves the basket's transaction, empties it and returns the QR payload.
+
+        `expected` is the basket as the client shows it (see the protocol
+        above). If the gateway's copy differs, nothing is saved and the reply
+        carries an error; the client then saves its own copy.
+        """
+        expected = expected or {}
+        session = self.session(basket_id)
+        basket = session.basket
+        if not basket:
+            session.debouncer.reset()
+            return {'event': 'CHECKOUT', 'txnId': expected.get('txnId'), 'error': 'empty'}
+        if 'items' in expected and not _same_basket(basket, expected):
+            return {'event': 'CHECKOUT', 'txnId': expected.get('txnId'), 'error': 'mismatch'}
+
+        payload = encode_payload(basket.lines(), basket.total)
+        record = {
+            'basketId': basket_id,
+            'timestamp': time.time(),
+            'items': [{'productId': line.product_id, 'itemName': line.name, 'itemPrice': line.price,
+                       'quantity': line.quantity} for line in basket.lines()],
+            'total': basket.total,
+        }
+        if expected.get('txnId'):
+            # The client's ID: if it also saves the record after a lost reply, Firestore keeps one copy
+            record['txnId'] = expected['txnId']
+        if expected.get('budget') is not None:
+            record['budget'] = expected['budget']
+        loop = asyncio.get_running_loop()
+        txn_id = await loop.run_in_executor(None, firestore.save_transaction, record)
+        basket.clear()
+        session.debouncer.reset()
+        return {'event': 'CHECKOUT', 'txnId': txn_id, 'payload': payload, 'parts': split_payload(payload),
+                'total': record['total']}
+
+    def reset(self, basket_id):
+        """Empties a basket without saving a transaction (it was saved elsewhere)."""
+        session = self.session(basket_id)
+        session.basket.clear()
+        session.debouncer.reset()
+        return {'event': 'RESET', 'total': session.basket.total}
+
+    def state(self, basket_id):
+        basket = self.session(basket_id).basket
+        return {'event': 'STATE', 'total': basket.total,
+                'lines': [{'productId': line.product_id, 'itemName': line.name, 'itemPrice': line.price,
+                           'quantity': line.quantity} for line in basket.lines()]}
+
+    async def expire_loop(self):
+        """Applies presence timeouts and drops long-idle empty sessions."""
+        while True:
+            await asyncio.sleep(EXPIRE_TICK)
+            now = time.monotonic()
+            for basket_id, session in list(self.sessions.items()):
+                for tag in session.debouncer.expire(now):
+                    self._remove(session, tag)
+                if (not session.basket and not session.listeners
+                        and now - session.last_seen > SESSION_IDLE_TIMEOUT):
+                    del self.sessions[basket_id]
+
+    # --- TCP transport ---
+
+    async def handle_client(self, reader, writer):
+        """Serves one basket connection using the line protocol."""
+        basket_id = None
+
+        def send(message):
+            writer.write((json.dumps(message) + "\n").encode("utf-8"))
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command, _, argument = line.decode("utf-8", "replace").strip().partition(" ")
+                command = command.upper()
+
+                if command == "HELLO" and argument:
+                    hello_id, _, secret = argument.partition(" ")
+                    if self.secret is not None and not hmac.compare_digest(secret.encode("utf-8"),
+                                                                           self.secret.encode("utf-8")):
+                        send({'event': 'ERROR', 'error': 'bad secret'})
+                        await writer.drain()
+                        break
+                    if basket_id is not None:
+                        self.session(basket_id).listeners.discard(send)
+                    basket_id = hello_id
+                    self.session(basket_id).listeners.add(send)
+                    send(self.state(basket_id))
+                elif basket_id is None:
+                    send({'event': 'ERROR', 'error': 'send HELLO <basket_id> first'})
+                elif command == "TAG" and argument:
+                    _spawn(self.handle_tag(basket_id, argument))
+                elif command == "CHECKOUT":
+                    send(await self.checkout(basket_id, _parse_checkout(argument)))
+                elif command == "RESET":
+                    send(self.reset(basket_id))
+                elif command == "STATE":
+                    send(self.state(basket_id))
+                else:
+                    send({'event': 'ERROR', 'error': f'unknown command {command}'})
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if basket_id is not None and basket_id in self.sessions:
+                self.sessions[basket_id].listeners.discard(send)
+            writer.close()
+
+    # --- Broker transport ---
+
+    def attach_broker(self, broker):
+        """
+        Serves baskets through a publish/subscribe broker.
+
+        Baskets publish raw reads to 'basket/<id>/tag' and 'CHECKOUT' to
+        'basket/<id>/cmd'; the gateway publishes events to 'basket/<id>/event'.
+        """
+        async def on_message(topic, payload):
+            parts = topic.split("/")
+            if len(parts) != 3:
+                return
+            _, basket_id, kind = parts
+            session = self.session(basket_id)
+            if not session.listeners:
+                event_topic = f"basket/{basket_id}/event"
+                session.listeners.add(lambda message: broker.publish_nowait(event_topic, message))
+            if kind == "tag":
+                await self.handle_tag(basket_id, payload)
+            elif kind == "cmd" and payload == "CHECKOUT":
+                session.notify(await self.checkout(basket_id))
+
+        broker.subscribe("basket/", on_message)
+
+    def stats(self):
+        return {
+            'sessions': len(self.sessions),
+            'tags_received': self.tags_received,
+            'lookup_batches': self.lookups.batches,
+            'product_cache': firestore.product_cache.stats(),
+        }
+
+
+def _parse_checkout(argument):
+    """The optional JSON argument of a CHECKOUT request, as a dict."""
+    try:
+        expected = json.loads(argument) if argument else {}
+    except ValueError:
+        return {}
+    return expected if isinstance(expected, dict) else {}
+
+
+def _same_basket(basket, expected):
+    """True if `basket` holds the quantities and total of a client's CHECKOUT request."""
+    quantities = defaultdict(int)
+    for item in expected.get('items') or ():
+        quantities[item.get('productId')] += item.get('quantity', 0)
+    mine = {line.product_id: line.quantity for line in basket.lines()}
+    return mine == dict(quantities) and abs(basket.total - float(expected.get('total', 0))) < 0.005
+
+
+class LocalBroker:
+    """
+    Minimal in-process publish/subscribe broker.
+
+    A stand-in for a local MQTT broker when testing the gateway: topics are
+    plain strings and subscriptions match by prefix.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(list)  # prefix -> [async callback(topic, payload)]
+
+    def subscribe(self, prefix, callback):
+        self._subscribers[prefix].append(callback)
+
+    async def publish(self, topic, payload):
+        for prefix, callbacks in list(self._subscribers.items()):
+            if topic.startswith(prefix):
+                for callback in callbacks:
+                    await callback(topic, payload)
+
+    def publish_nowait(self, topic, payload):
+        _spawn(self.publish(topic, payload))
+
+
+class GatewayClient:
+    """
+    Blocking client for the gateway, used when the Tk UI is one of its baskets.
+
+    `scan_loop` has the same contract as `firestore.scan_loop`: raw reads from
+    `read_tag` are forwarded to the gateway, and the ADD/REMOVE events it
+    sends back are delivered as `callback(product, tag, event)`. The gateway
+    owns the basket, so checkout goes through it as well (see `checkout`);
+    a checkout it does not confirm is saved locally by the caller.
+
+    A lost connection is retried with a doubling delay; `on_status(connected)`
+    is called on every change so the UI can show that the scanner is offline.
+    Tags read while offline are dropped: nothing could resolve them.
+    """
+
+    def __init__(self, host, port, basket_id, on_status=None, secret=GATEWAY_SECRET):
+        self.address = (host, port)
+        self.basket_id = basket_id
+        self.secret = secret
+        self.on_status = on_status
+        self.connected = None  # Unknown until the first connection attempt
+        self._sock = None
+        self._send_lock = threading.Lock()
+        self._reset_pending = False  # A checkout was saved locally; clear the gateway's basket
+        self._checkout_replies = queue.Queue()
+
+    def _send(self, line):
+        with self._send_lock:
+            self._sock.sendall(f"{line}\n".encode("utf-8"))
+
+    def checkout(self, record, timeout=CHECKOUT_ACK_TIMEOUT):
+        """
+        Asks the gateway to save `record` (a transaction with a 'txnId') and
+        empty its basket, and waits up to `timeout` seconds for it to confirm.
+
+        Called from the Tk thread.
+
+        Returns:
+            bool: True once the gateway has saved the transaction. Otherwise
+            (offline, no reply, or the gateway's basket differs from
+            `record`) the caller must save `record` itself; the gateway's
+            basket is reset, now or as soon as the connection is back. The
+            gateway saves under the same txnId, so a reply that was merely
+            late still yields a single Firestore document.
+        """
+        txn_id = record['txnId']
+        request = {
+            'txnId': txn_id,
+            'budget': record.get('budget'),
+            'items': [{'productId': item['productId'], 'quantity': item['quantity']} for item in record['items']],
+            'total': record['total'],
+        }
+        while not self._checkout_replies.empty():
+            self._checkout_replies.get_nowait()  # Late replies to earlier checkouts
+        try:
+            if not self.connected:
+                raise ConnectionError("not connected")
+            self._send(f"CHECKOUT {json.dumps(request, separators=(',', ':'))}")
+            deadline = time.monotonic() + timeout
+            while True:
+                reply = self._checkout_replies.get(timeout=max(0.0, deadline - time.monotonic()))
+                if reply.get('txnId') == txn_id:
+                    break
+        except queue.Empty:
+            print(f"Gateway did not confirm checkout {txn_id} within {timeout:g}s")
+        except (OSError, AttributeError) as e:
+            print(f"Could not send checkout to the gateway: {e}")
+        else:
+            if 'error' not in reply:
+                return True
+            print(f"Gateway refused checkout {txn_id}: {reply['error']}")
+        self._reset_gateway()
+        return False
+
+    def _reset_gateway(self):
+        """Clears the gateway's copy of the basket, now or on the next connection."""
+        try:
+            self._send("RESET")
+        except (OSError, AttributeError):
+            self._reset_pending = True
+
+    def _handle_message(self, message, callback):
+        event = message.get('event')
+        if event in (ADD, REMOVE):
+            product = {'productId': message['productId'], 'itemName': message['itemName'],
+                       'itemPrice': message['itemPrice']}
+            callback(product, message['tag'], event)
+        elif event == 'CHECKOUT':
+            self._checkout_replies.put(message)
+
+    def _set_connected(self, connected):
+        if connected != self.connected:
+            self.connected = connected
+            if self.on_status is not None:
+                self.on_status(connected)
+
+    def _connect(self, callback):
+        """Opens a session with the gateway; returns an Event set when it drops."""
+        sock = socket.create_connection(self.address, timeout=RECONNECT_MAX_DELAY)
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+        self._send(f"HELLO {self.basket_id}" if self.secret is None else f"HELLO {self.basket_id} {self.secret}")
+        if self._reset_pending:
+            self._send("RESET")
+            self._reset_pending = False
+        closed = threading.Event()
+
+        def receive():
+            try:
+                for line in sock.makefile("r", encoding="utf-8"):
+                    self._handle_message(json.loads(line), callback)
+            except (OSError, ValueError) as e:
+                print(f"Gateway connection error: {e}")
+            finally:
+                closed.set()
+
+        threading.Thread(target=receive, daemon=True).start()
+        return closed
+
+    def scan_loop(self, read_tag, callback):
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            try:
+                closed = self._connect(callback)
+            except OSError as e:
+                self._set_connected(False)
+                print(f"Gateway {self.address[0]}:{self.address[1]} unreachable ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+
+            self._set_connected(True)
+            delay = RECONNECT_MIN_DELAY
+            try:
+                while not closed.is_set():
+                    tag = read_tag(1.0)
+                    if tag is not None:
+                        self._send(f"TAG {tag}")
+            except OSError as e:
+                print(f"Gateway connection error: {e}")
+            self._set_connected(False)
+            self._sock.close()
+            print("Lost the gateway connection; reconnecting")
+
+
+async def serve(host="127.0.0.1", port=GATEWAY_PORT, secret=GATEWAY_SECRET):
+    """
+    Initializes the backend and runs the gateway until cancelled.
+
+    Anyone who can connect can save checkouts, so listening beyond loopback
+    requires a shared secret.
+    """
+    if host not in LOOPBACK_HOSTS and secret is None:
+        raise ValueError(f"Refusing to listen on {host} without a shared secret (set BASKET_GATEWAY_SECRET)")
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, firestore.init_backend)
+
+    gateway = BasketGateway(secret=secret)
+    server = await asyncio.start_server(gateway.handle_client, host, port)
+    print(f"Basket gateway listening on {host}:{port}")
+    async with server:
+        await asyncio.gather(server.serve_forever(), gateway.expire_loop())
+
+
+# Main Execution Block
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless Smart Basket gateway")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address to listen on; anything but loopback needs BASKET_GATEWAY_SECRET")
+    parser.add_argument("--port", type=int, default=GATEWAY_PORT)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,156 @@
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageTk
+
+THUMBNAIL_DIR = ".thumbnails"  # On-disk store of pre-resized images
+DEFAULT_MAX_ENTRIES = 256  # Ready PhotoImage objects kept in memory
+ITEM_THUMBNAIL_SIZE = (40, 40)  # Size used by the shopping list rows
+
+_MISSING = object()  # Cached marker for images that do not exist
+
+
+def thumbnail_path(source_path, size, thumb_dir=THUMBNAIL_DIR):
+    """Returns the on-disk path of the pre-resized thumbnail for an image."""
+    stem = os.path.splitext(source_path.replace(os.sep, "_"))[0]
+    return os.path.join(thumb_dir, f"{stem}_{size[0]}x{size[1]}.png")
+
+
+def build_thumbnail(source_path, size, thumb_dir=THUMBNAIL_DIR):
+    """
+    Resizes one image and stores it in the thumbnail directory.
+
+    The thumbnail is only rebuilt when the source image is newer, so calling
+    this for an already built image costs two `stat` calls.
+
+    Returns:
+        str or None: The thumbnail path, or None if the source image is missing.
+    """
+    target = thumbnail_path(source_path, size, thumb_dir)
+    try:
+        source_mtime = os.path.getmtime(source_path)
+    except OSError:
+        return None
+    if os.path.exists(target) and os.path.getmtime(target) >= source_mtime:
+        return target
+
+    os.makedirs(thumb_dir, exist_ok=True)
+    # Write to a temporary name first so readers never see a partial file;
+    # the name is unique per thread because prebuild and get() may race.
+    temp = f"{target}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with Image.open(source_path) as image:
+        image = image.resize(size, Image.Resampling.LANCZOS)
+        image.save(temp, format="PNG")
+    os.replace(temp, target)
+    return target
+
+
+def build_thumbnails(source_dir, size=ITEM_THUMBNAIL_SIZE, thumb_dir=THUMBNAIL_DIR):
+    """
+    Pre-builds thumbnails for every image in a directory (e.g. 'items/').
+
+    Returns:
+        int: The number of images processed.
+    """
+    if not os.path.isdir(source_dir):
+        return 0
+    count = 0
+    for entry in sorted(os.listdir(source_dir)):
+        if entry.lower().endswith((".png", ".jpg", ".jpeg")):
+            try:
+                build_thumbnail(os.path.join(source_dir, entry), size, thumb_dir)
+                count += 1
+            except Exception as e:
+                print(f"Warning: could not build thumbnail for '{entry}': {e}")
+    return count
+
+
+class ImageCache:
+    """
+    Two-level cache of display-ready images.
+
+    Level one is an in-memory LRU of `ImageTk.PhotoImage` objects keyed by
+    (path, size); level two is the on-disk thumbnail directory. A redraw that
+    hits level one does no file access at all, and a level-one miss only
+    decodes a tiny pre-resized PNG. The full-size decode and LANCZOS resample
+    only happen when a thumbnail has not been built yet.
+
+    `get` creates PhotoImage objects and must be called from the Tk thread;
+    `prebuild` only uses PIL and can run on a background thread.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, thumb_dir=THUMBNAIL_DIR):
+        self.max_entries = max_entries
+        self.thumb_dir = thumb_dir
+        self._images = OrderedDict()  # (path, size) -> PhotoImage or _MISSING
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path, size):
+        """
+        Returns a PhotoImage of `path` resized to `size`, or None if it is missing.
+        """
+        key = (path, size)
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+            self.hits += 1
+            return None if image is _MISSING else image
+
+        self.misses += 1
+        try:
+            target = build_thumbnail(path, size, self.thumb_dir)
+            if target is None:
+                image = _MISSING
+            else:
+                with Image.open(target) as thumbnail:
+                    image = ImageTk.PhotoImage(thumbnail)
+        except Exception as e:
+            print(f"Warning: could not load image '{path}': {e}")
+            image = _MISSING
+
+        self._images[key] = image
+        while len(self._images) > self.max_entries:
+            self._images.popitem(last=False)
+            self.evictions += 1
+        return None if image is _MISSING else image
+
+    def invalidate(self, path=None):
+        """Drops cached images for one path, or everything when path is None."""
+        if path is None:
+            self._images.clear()
+            return
+        for key in [key for key in self._images if key[0] == path]:
+            del self._images[key]
+
+    def prebuild(self, source_dir, size=ITEM_THUMBNAIL_SIZE, background=True):
+        """
+        Builds the on-disk thumbnails for a directory ahead of time.
+
+        Args:
+            background (bool): Run on a daemon thread so startup is not delayed.
+        """
+        if not background:
+            return build_thumbnails(source_dir, size, self.thumb_dir)
+        thread = threading.Thread(target=build_thumbnails, args=(source_dir, size, self.thumb_dir), daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        return {
+            'size': len(self._images),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+if __name__ == "__main__":
+    # Pre-build the item thumbnails, e.g. as part of deploying new product images.
+    built = build_thumbnails("items")
+    print(f"Built {built} thumbnails in '{THUMBNAIL_DIR}'.")
@@ -0,0 +1,108 @@
+import random
+import threading
+import time
+
+SHARD_COLLECTION = "stock_shards"  # Sub-collection under each items/{productId} document
+DEFAULT_NUM_SHARDS = 10
+STOCK_CACHE_TTL = 30.0  # Seconds an aggregated stock level is reused
+
+
+def _increment(amount):
+    """Returns a Firestore server-side increment transform."""
+    from firebase_admin import firestore
+    return firestore.Increment(amount)
+
+
+class ShardedInventory:
+    """
+    Inventory counts spread over N shard documents per product.
+
+    Firestore sustains roughly one write per second per document, so a single
+    stock field on a hot SKU would make concurrent checkouts contend. Each
+    product instead has `num_shards` documents in items/{id}/stock_shards,
+    each holding a partial 'count'. A checkout decrements one random shard per
+    product, and the stock level is the sum of the shards, read lazily and
+    cached for STOCK_CACHE_TTL seconds.
+    """
+
+    def __init__(self, items_ref, num_shards=DEFAULT_NUM_SHARDS, cache_ttl=STOCK_CACHE_TTL):
+        """
+        Args:
+            items_ref: The Firestore 'items' collection reference.
+        """
+        self.items_ref = items_ref
+        self.num_shards = num_shards
+        self.cache_ttl = cache_ttl
+        self._stock = {}  # product_id -> (expires_at, count)
+        self._lock = threading.Lock()
+
+    def _shard_ref(self, product_id, shard):
+        return self.items_ref.document(product_id).collection(SHARD_COLLECTION).document(str(shard))
+
+    def init_product(self, db, product_id, count):
+        """Creates (or resets) the shards of a product with `count` units in stock."""
+        batch = db.batch()
+        for shard in range(self.num_shards):
+            batch.set(self._shard_ref(product_id, shard), {"count": count if shard == 0 else 0})
+        batch.commit()
+        self._cache_stock(product_id, count)
+
+    def checkout_writes(self, record):
+        """
+        Returns the shard decrements for a checkout record.
+
+        Each product line decrements one randomly chosen shard. The writes are
+        meant to go into the same WriteBatch as the transaction document (see
+        outbox.OutboxFlusher), so stock is decremented exactly once, together
+        with the transaction being recorded.
+
+        Returns:
+            list of (document_ref, data) pairs for `batch.set(..., merge=True)`.
+        """
+        writes = []
+        for item in record.get('items', []):
+            shard = random.randrange(self.num_shards)
+            writes.append((self._shard_ref(item['productId'], shard), {"count": _increment(-item['quantity'])}))
+        return writes
+
+    def record_local_checkout(self, record):
+        """Applies a checkout to the cached stock levels without a read."""
+        with self._lock:
+            for item in record.get('items', []):
+                cached = self._stock.get(item['productId'])
+                if cached is not None:
+                    self._stock[item['productId']] = (cached[0], cached[1] - item['quantity'])
+
+    def apply_checkout(self, db, record):
+        """Decrements stock for a checkout in one batched write (outside the outbox)."""
+        batch = db.batch()
+        for ref, data in self.checkout_writes(record):
+            batch.set(ref, data, merge=True)
+        batch.commit()
+        self.record_local_checkout(record)
+
+    def get_stock(self, product_id):
+        """
+        Returns the aggregated stock of a product, summing its shards when the
+        cached value is missing or older than `cache_ttl`.
+        """
+        with self._lock:
+            cached = self._stock.get(product_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        shards = self.items_ref.document(product_id).collection(SHARD_COLLECTION).stream()
+        count = sum((shard.to_dict() or {}).get("count", 0) for shard in shards)
+        self._cache_stock(product_id, count)
+        return count
+
+    def _cache_stock(self, product_id, count):
+        with self._lock:
+            self._stock[product_id] = (time.monotonic() + self.cache_ttl, count)
+
+    def invalidate(self, product_id=None):
+        with self._lock:
+            if product_id is None:
+                self._stock.clear()
+            else:
+                self._stock.pop(product_id, None)
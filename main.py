@@ -1,14 +1,30 @@
+# Imported first so startup phases are timed from (almost) process start
+from startup_timing import timer as startup_timer
+
 import tkinter as tk
-from PIL import Image, ImageTk
-import qrcode
 import threading
 import time
 import os
+import socket
+import uuid
 import customtkinter
 
-# Import the backend logic from the separate file
+# Import the backend logic from the separate file. This is cheap: Firebase and
+# the camera libraries are loaded later, on the scanning thread (see auto_scan).
 import firestore
-from firestore import scan_barcode, get_product_info
+from firestore import scan_barcode
+from scan_events import REMOVE
+from basket import Basket
+from basket_view import BasketRowView
+from image_cache import ImageCache, ITEM_THUMBNAIL_SIZE
+from event_queue import ScanEventQueue
+from qr_render import QrPrecomputer
+from checkout_payload import encode_payload, split_payload
+from basket_sync import BasketSync
+from gateway import GatewayClient
+from tracing import registry, tracer, MetricsServer
+from alerts import BudgetAlertEngine, AlertOverlay
+from resources import ResourceManager, PhotoSlot, memory_usage
 
 # --- IMPORTANT SETUP NOTES ---
 # 1. This script requires a local image file named 'savers.png' for the logo.
@@ -18,12 +34,61 @@ from firestore import scan_barcode, get_product_info
 # -----------------------------
 
 # Global variables for basket state and UI elements
-global items, total, budget, total_label, budget_label_display, rows_frame, button_frame
-items = {}  # Stores items: {unique_key: {'price': p, 'quantity': q, 'itemName': n}}
-total = 0.0  # Current basket total
+global basket, budget, total_label, budget_label_display, rows_frame, button_frame
+basket = Basket()  # Tagged units, per-product lines and the running total
 budget = 0.0  # Set budget amount
 
+# Budget thresholds are checked on every basket change, but each one alerts
+# only once per crossing, on a non-modal banner (see alerts.py).
+budget_alerts = BudgetAlertEngine()
+alert_overlay = None  # AlertOverlay, created by init()
+
 IMAGE_PATH = "items"  # Directory where item images are stored
+BASKET_ID = socket.gethostname()  # Identifies this basket in saved transactions
+
+# Live basket state is mirrored to baskets/{BASKET_ID} for cashier consoles and
+# dashboards, as debounced deltas (see basket_sync.py).
+SYNC_BASKET_STATE = True
+
+# (host, port) of a basket gateway (see gateway.py) to stream tags to instead
+# of resolving them locally; None runs the basket standalone.
+GATEWAY_ADDRESS = None
+gateway_client = None  # GatewayClient, set by auto_scan when GATEWAY_ADDRESS is used
+scanner_offline = False  # Set from the scanning thread while the gateway cannot be reached
+shown_scanner_status = None  # Text currently on scanner_status_label
+basket_sync = BasketSync(lambda: firestore.db, BASKET_ID) if SYNC_BASKET_STATE else None
+
+# Scan events are handed from the scanner thread to the Tk thread through this
+# queue and applied once per frame (FRAME_INTERVAL_MS) instead of once per scan.
+scan_queue = ScanEventQueue()
+FRAME_INTERVAL_MS = 50  # 20 frames per second
+
+# Resized PhotoImages for item rows, the logo and the warning icon
+image_cache = ImageCache()
+
+# Checkout QR codes are rendered in memory on a worker thread, speculatively
+# once the basket has been idle for QR_IDLE_SECONDS.
+qr_precomputer = QrPrecomputer()
+QR_IDLE_SECONDS = 1.0
+QR_POLL_MS = 30
+last_basket_change = 0.0  # time.monotonic() of the last basket change
+pending_qr = None  # Future of the QR the checkout window is waiting for
+qr_parts = []  # Images of the checkout QR codes shown (several for very large baskets)
+qr_part_index = 0
+
+# Dialogs, pooled row widgets and the checkout QR image are created once and
+# reused for the whole (multi-day) life of the process; see resources.py.
+resource_manager = ResourceManager()
+resource_manager.register("images", image_cache)
+qr_photo = resource_manager.register("checkout_qr_image", PhotoSlot())
+error_window = None  # ReusableWindows, created by init()
+qr_window = None
+keyboard_window = None
+
+# Per-scan latency histograms (read, lookup, queue, update, render) are served
+# in Prometheus format on localhost; see tracing.py. Set to False to disable.
+SERVE_METRICS = True
+metrics_server = MetricsServer(registry)
 
 
 def init(root):
@@ -44,18 +109,16 @@ def init(root):
     title_frame.grid(row=0, column=0, columnspan=2, sticky="nsew", padx=10)
     title_frame.grid_columnconfigure(0, weight=1)  # Center content
 
-    # Load and display the logo image
-    try:
-        logo_image = Image.open("savers.png")
-        logo_image = logo_image.resize((200, 50), Image.Resampling.LANCZOS)
-        logo_tk = ImageTk.PhotoImage(logo_image)
-
-        global logoImage  # Keep a reference to prevent garbage collection
-        logoImage = logo_tk
+    # Build item thumbnails ahead of time so redraws never resize images
+    image_cache.prebuild(IMAGE_PATH)
 
+    # Load and display the logo image
+    global logoImage  # Keep a reference to prevent garbage collection
+    logoImage = image_cache.get("savers.png", (200, 50))
+    if logoImage is not None:
         image_label = tk.Label(title_frame, image=logoImage, bg="#FFC4C4")
         image_label.pack(side=tk.LEFT, padx=10, pady=5)
-    except FileNotFoundError:
+    else:
         tk.Label(title_frame, text="Sentinels Smart Basket", bg="#FFC4C4", font=("Arial", 20, "bold")).pack(
             side=tk.LEFT, padx=10, pady=5)
         print("Warning: 'savers.png' not found. Using text title instead.")
@@ -104,6 +167,22 @@ def init(root):
     rows_frame.grid_columnconfigure(1, weight=0)
     rows_frame.grid_columnconfigure(2, weight=0)
 
+    # Reused, non-modal banner for budget alerts
+    global alert_overlay
+    alert_overlay = AlertOverlay(root, lambda: image_cache.get("warning.jpg", (30, 30)))
+
+    # Keyed, virtualized renderer for the item rows
+    global row_view
+    row_view = BasketRowView(rows_frame, table_frame, load_item_image)
+    resource_manager.register("basket_rows", row_view.pool)
+
+    # Dialogs are built on first use and then only hidden and shown again
+    global error_window, qr_window, keyboard_window
+    resource_manager.root = root
+    error_window = resource_manager.window("error_window", root, build_error_window)
+    qr_window = resource_manager.window("checkout_window", root, build_checkout_window, "Checkout QR Code")
+    keyboard_window = resource_manager.window("keyboard_window", root, build_on_screen_keyboard, "Enter Budget")
+
     # --- Control Buttons and Total Frame ---
     global button_frame
     button_frame = tk.Frame(bottom_frame, bg="#FFC4C4")
@@ -120,12 +199,24 @@ def init(root):
                                     font=("Arial", 12, "bold"))
     budget_label_display.grid(row=2, column=0, sticky="s", padx=5, pady=(5, 2))
 
+    # Scanner status, until the backend has finished loading
+    global scanner_status_label
+    scanner_status_label = tk.Label(button_frame, text="Starting scanner...", bg="#FFC4C4", fg="#555555",
+                                    font=("Arial", 10))
+    scanner_status_label.grid(row=1, column=0, sticky="s", padx=5)
+
     # Set Budget Button
     global set_budget_button
     set_budget_button = tk.Button(button_frame, text="Set Budget", command=show_budget_entry, bd=0, fg="white",
                                   bg="#CB4949", font=("Sans-Serif", 12, "bold"), height=2)
     set_budget_button.grid(row=3, column=0, sticky="nsew", padx=5, pady=2)
 
+    # Budget entry and its confirm button, shown in place of the button by show_budget_entry
+    global budget_entry, confirm_budget_button
+    budget_entry = tk.Entry(button_frame, font=("Arial", 14), width=10, justify='center', bd=1, relief="solid")
+    confirm_budget_button = tk.Button(button_frame, text="Confirm", command=set_budget_from_entry, bd=0, fg="white",
+                                      bg="#64A048", font=("Sans-Serif", 12, "bold"))
+
     # Separator
     tk.Label(button_frame, text="—", bg="#FFC4C4").grid(row=4, column=0, pady=5)
 
@@ -147,87 +238,187 @@ def init(root):
                           font=("Sans-Serif", 12, "bold"), height=2)
     qr_button.grid(row=6, column=0, sticky="nsew", padx=5, pady=(10, 5))
 
-    # Start the continuous scanning loop after a short delay
-    root.after(500, auto_scan)
+    # Start loading the backend and scanning as soon as the window is up
+    root.after(0, auto_scan)
+    root.after_idle(lambda: startup_timer.mark("first_frame"))
 
 
 def auto_scan():
     """
-    Starts the continuous scanning thread and defines the callback for updates.
+    Starts the continuous scanning thread and the GUI tick that applies its events.
+
+    The scanning thread first initializes the backend (Firebase, catalog sync),
+    so the UI stays responsive while it loads; scanning starts once it is ready.
     """
+    def init_backend_and_scan():
+        global gateway_client
+        firestore.init_backend()
+        startup_timer.mark("backend_ready")
+        if GATEWAY_ADDRESS is not None:
+            # Thin-client mode: the basket gateway does lookups and de-duplication
+            gateway_client = GatewayClient(*GATEWAY_ADDRESS, BASKET_ID, on_status=set_scanner_online)
+            gateway_client.scan_loop(firestore.get_tag_reader(), update_display_from_scan)
+        else:
+            scan_barcode(update_display_from_scan)
 
-    # The callback function called by the threaded scanner (firestore_py.scan_barcode)
-    def update_display_from_scan(product, tag):
-        """Processes a single scan event (add or remove) and updates the basket state."""
-        global items
+    # Start barcode scanning in a separate, non-blocking thread
+    # The scan_barcode function needs to be passed the callback.
+    scanning_thread = threading.Thread(target=init_backend_and_scan)
+    scanning_thread.daemon = True  # Allows the thread to exit when the main program does
+    scanning_thread.start()
 
-        if not product:
-            print("Product not found in the database. Ignoring scan.")
-            return
+    if basket_sync is not None:
+        basket_sync.start()
 
-        name = product['itemName']
-        price = float(product['itemPrice'])
-        unique_key = tag  # The full tag is the unique key (e.g., RT101_U12345...)
+    if SERVE_METRICS:
+        register_metrics()
+        metrics_server.start()
 
-        # Check if the unique tag is already in the 'items' dictionary
-        if unique_key in items:
-            # Item exists, this means the scanner *removed* the tag.
-            # In our simulation, the backend only reports a scan. The GUI logic
-            # for adding/removing items based on tag is complex for this structure.
-            # A simple implementation: if the tag exists, remove it. If it doesn't, add it.
+    # Apply queued scan events at a fixed frame rate on the Tk thread
+    root.after(FRAME_INTERVAL_MS, process_scan_events)
 
-            # --- REMOVAL LOGIC ---
-            # Remove the item completely from the unique items dictionary
-            del items[unique_key]
-            print(f"Removed unique tag: {unique_key}. Item: {name}")
 
-        else:
-            # --- ADDITION LOGIC ---
-            # Item doesn't exist, add it to the unique items dictionary
-            items[unique_key] = {'price': price, 'quantity': 1, 'itemName': name}
-            print(f"Added unique tag: {unique_key}. Item: {name}")
-
-        # Re-aggregate the items by name for display purposes
-        aggregate_items = {}
-        for details in items.values():
-            item_name = details['itemName']
-            item_price = details['price']
-
-            if item_name not in aggregate_items:
-                # Use the price from the current item as the list price
-                aggregate_items[item_name] = {'price': item_price, 'quantity': 1,
-                                              'image_path': os.path.join(IMAGE_PATH, f"{item_name}.png")}
-            else:
-                aggregate_items[item_name]['quantity'] += 1
-
-        # Update the display using the aggregated item names and quantities
-        root.after(0, lambda: update_display(aggregate_items))
+def register_metrics():
+    """Publishes the existing queue, cache, outbox and sync counters as gauges."""
+    registry.gauge("basket_scan_queue_depth", "Scan events waiting for the next GUI tick",
+                   lambda: scan_queue.depth)
+    registry.gauge("basket_product_cache_hit_rate", "Product cache hit rate",
+                   lambda: firestore.product_cache.stats()['hit_rate'])
+    registry.gauge("basket_outbox_pending", "Checkouts not yet written to Firestore",
+                   lambda: firestore.checkout_outbox.pending_count() if firestore.checkout_outbox else 0)
+    registry.gauge("basket_lines", "Product lines in the basket", lambda: len(basket))
+    if basket_sync is not None:
+        registry.gauge("basket_sync", "Basket sync counters", basket_sync.stats)
+    registry.gauge("basket_rss_bytes", "Resident memory of the basket process", memory_usage)
+    registry.gauge("basket_row_pool", "Pooled basket row widgets", row_view.pool.stats)
 
-    # Start barcode scanning in a separate, non-blocking thread
-    # The scan_barcode function needs to be passed the callback.
-    scanning_thread = threading.Thread(target=scan_barcode, args=(update_display_from_scan,))
-    scanning_thread.daemon = True  # Allows the thread to exit when the main program does
-    scanning_thread.start()
+
+# The callback function called by the threaded scanner (firestore.scan_barcode)
+def update_display_from_scan(product, tag, event):
+    """
+    Queues a single ADD or REMOVE scan event for the GUI thread.
+
+    This runs on the scanner thread, so it must not touch the basket or any
+    widget; `process_scan_events` applies the event on the next frame.
+    """
+    scan_queue.put(product, tag, event)
+
+
+def apply_scan_event(product, tag, event):
+    """
+    Applies a single ADD or REMOVE scan event to the basket.
+
+    Returns:
+        bool: True if the basket changed.
+    """
+    # The full tag is the unique key of the unit (e.g., RT101_U12345...); the
+    # scanner has already resolved it to its product (see tag_decoder.py).
+    unique_key = tag
+
+    if event == REMOVE:
+        # --- REMOVAL LOGIC ---
+        # The scanner has already de-duplicated reads, so a REMOVE means the
+        # tag really left the basket (or was scanned out deliberately).
+        removed = basket.remove(unique_key)
+        if removed is None:
+            return False
+        print(f"Removed unique tag: {unique_key}. Item: {removed.name}")
+        return True
+
+    if not product:
+        print("Product not found in the database. Ignoring scan.")
+        return False
+
+    # --- ADDITION LOGIC ---
+    # The basket updates the product line and running total in O(1).
+    name = product['itemName']
+    if not basket.add(unique_key, product.get('productId', unique_key), name, product['itemPrice']):
+        return False  # Already in the basket
+    print(f"Added unique tag: {unique_key}. Item: {name}")
+    return True
+
+
+def apply_pending_scan_events():
+    """
+    Folds all pending scan events into one basket update and one render.
+
+    Returns:
+        bool: True if the basket changed.
+    """
+    global last_basket_change
+    changed = False
+    traces = {}  # Traces of the events that changed the basket in this frame
+    for product, tag, event in scan_queue.drain():
+        trace = tracer.get(tag)
+        tracer.mark(trace, "queue")
+        applied = apply_scan_event(product, tag, event)
+        tracer.mark(trace, "update")
+        if applied and trace is not None:
+            traces[trace.trace_id] = trace
+        elif trace is not None:
+            tracer.finish(trace, "ignored")
+        changed = applied or changed
+
+    if changed:
+        last_basket_change = time.monotonic()
+        changed_ids = basket.drain_changes()
+        update_display(changed_ids)
+        rendered_at = time.perf_counter()
+        for trace in traces.values():
+            tracer.mark(trace, "render", rendered_at)
+            tracer.finish(trace)
+        if basket_sync is not None:
+            basket_sync.push(basket, changed_ids)
+        if startup_timer.mark("first_scan"):
+            startup_timer.write_report()
+    return changed
+
+
+def set_scanner_online(online):
+    """Gateway connection status callback (scanning thread); shown by the next GUI tick."""
+    global scanner_offline
+    scanner_offline = not online
+
+
+def update_scanner_status():
+    """Shows whether the scanner is starting, ready or offline, touching the label only on a change."""
+    global shown_scanner_status
+    if scanner_offline:
+        text, color = "Scanner offline", "#C0392B"
+    elif firestore.backend_ready.is_set():
+        text, color = "Ready to scan", "#555555"
+    else:
+        text, color = "Starting scanner...", "#555555"
+    if text != shown_scanner_status:
+        scanner_status_label.config(text=text, fg=color)
+        shown_scanner_status = text
+
+
+def process_scan_events():
+    """
+    GUI tick: applies pending scan events, then reschedules itself.
+    """
+    apply_pending_scan_events()
+    update_scanner_status()
+    precompute_checkout_qr()
+
+    root.after(FRAME_INTERVAL_MS, process_scan_events)
 
 
 def show_budget_entry():
     """Replaces the 'Set Budget' button with an entry field and opens the keyboard."""
-    global budget_entry, keyboard_window, set_budget_button, confirm_budget_button
-
     # Remove the button
     set_budget_button.grid_forget()
 
-    # Create a new Entry box where the button was
-    budget_entry = tk.Entry(button_frame, font=("Arial", 14), width=10, justify='center', bd=1, relief="solid")
+    # Show the (emptied) Entry box where the button was
+    budget_entry.delete(0, tk.END)
     budget_entry.grid(row=3, column=0, sticky="nsew", padx=5, pady=2)
 
-    # Add a new button for confirming budget entry
-    confirm_budget_button = tk.Button(button_frame, text="Confirm", command=set_budget_from_entry, bd=0, fg="white",
-                                      bg="#64A048", font=("Sans-Serif", 12, "bold"))
+    # Show the button for confirming budget entry
     confirm_budget_button.grid(row=4, column=0, sticky="nsew", padx=5, pady=2)
 
     # Show the on-screen keyboard
-    keyboard_window = show_on_screen_keyboard(budget_entry)
+    keyboard_window.show()
 
 
 def key_press(button_text, entry_widget):
@@ -244,18 +435,17 @@ def key_press(button_text, entry_widget):
         entry_widget.insert(tk.END, button_text)
 
 
-# Function to show the numerical on-screen keyboard
-def show_on_screen_keyboard(entry_widget):
-    """Creates a top-level window for the numerical keyboard."""
-    keyboard_window = tk.Toplevel(root)
-    keyboard_window.title("Enter Budget")
-    keyboard_window.geometry("250x300")
-    keyboard_window.configure(bg="#F0F0F0")
+# Function to build the numerical on-screen keyboard
+def build_on_screen_keyboard(keyboard_top):
+    """Builds the numerical keyboard for the budget entry in its (reusable) window."""
+    entry_widget = budget_entry
+    keyboard_top.geometry("250x300")
+    keyboard_top.configure(bg="#F0F0F0")
 
     # Grid configuration
     for i in range(4):
-        keyboard_window.grid_rowconfigure(i, weight=1)
-        keyboard_window.grid_columnconfigure(i % 3, weight=1)
+        keyboard_top.grid_rowconfigure(i, weight=1)
+        keyboard_top.grid_columnconfigure(i % 3, weight=1)
 
     buttons = [
         '1', '2', '3',
@@ -276,27 +466,23 @@ def show_on_screen_keyboard(entry_widget):
             bg_color = '#FFFFFF'
 
         button = tk.Button(
-            keyboard_window, text=display_text, width=8, height=2, bd=0,
+            keyboard_top, text=display_text, width=8, height=2, bd=0,
             bg=bg_color, fg="black", font=("Arial", 14, "bold"),
             command=lambda text=button_text: key_press(text, entry_widget)
         )
         button.grid(row=i // 3, column=i % 3, padx=3, pady=3, sticky="nsew")
 
-    clear_button = tk.Button(keyboard_window, text="Clear", bd=0, bg="#4C78A8", fg="white", font=("Arial", 14, "bold"),
+    clear_button = tk.Button(keyboard_top, text="Clear", bd=0, bg="#4C78A8", fg="white", font=("Arial", 14, "bold"),
                              command=lambda: key_press("Clear", entry_widget))
     clear_button.grid(row=4, column=0, columnspan=3, sticky="nsew", padx=3, pady=3)
 
-    keyboard_window.grab_set()  # Modal behavior
-    return keyboard_window
-
 
 def set_budget_from_entry():
     """Sets the global budget from the entry field and checks for over-budget."""
     global budget
     amount = budget_entry.get()
 
-    if 'keyboard_window' in globals() and keyboard_window:
-        keyboard_window.destroy()
+    keyboard_window.hide()
 
     try:
         budget = float(amount)
@@ -310,9 +496,10 @@ def set_budget_from_entry():
         # Show the set_budget_button again
         set_budget_button.grid(row=3, column=0, sticky="nsew", padx=5, pady=2)
 
-        # Check if the total exceeds the budget
-        if total > budget:
-            show_custom_error("Budget Alert", f"Your current total (₱{total:.2f}) exceeds the budget (₱{budget:.2f})!")
+        # Re-arm the budget alerts and check the current total against the new budget
+        for alert in budget_alerts.set_budget(budget, basket.total):
+            alert_overlay.show_alert(alert)
+        update_display()
 
     except ValueError:
         show_custom_error("Invalid Input", "Please enter a valid number for the budget.")
@@ -320,203 +507,237 @@ def set_budget_from_entry():
 
 def show_custom_error(title, message="Error occurred"):
     """Displays a custom modal error/alert message."""
-    # Create a new window for the error message
-    error_window = tk.Toplevel(root)
-    error_window.title(title)
-    error_window.geometry("300x150")
-    error_window.configure(bg="#FFC4C4")
-    error_window.resizable(False, False)
-
     # Center the window
     x = root.winfo_x() + root.winfo_width() // 2 - 150
     y = root.winfo_y() + root.winfo_height() // 2 - 75
-    error_window.geometry(f'+{x}+{y}')
 
-    # Try to load a warning image
-    try:
-        img = Image.open("warning.jpg")
-        img = img.resize((30, 30), Image.Resampling.LANCZOS)
-        img_tk = ImageTk.PhotoImage(img)
-        global warningImage
-        warningImage = img_tk
-        image_label = tk.Label(error_window, image=warningImage, bg="#FFC4C4")
+    # The error window is built once and reused for every message
+    widgets = error_window.show(f'300x150+{x}+{y}', title)
+    widgets['message'].config(text=message)
+
+
+def build_error_window(error_window_top):
+    """Builds the contents of the reusable error window."""
+    error_window_top.configure(bg="#FFC4C4")
+    error_window_top.resizable(False, False)
+
+    # Try to load a warning image (cached by the image cache)
+    warning_image = image_cache.get("warning.jpg", (30, 30))
+    if warning_image is not None:
+        image_label = tk.Label(error_window_top, image=warning_image, bg="#FFC4C4")
+        image_label.image = warning_image  # Keep a reference
         image_label.pack(pady=5)
-    except Exception:
-        tk.Label(error_window, text="⚠️", font=("Arial", 20), bg="#FFC4C4").pack(pady=5)
+    else:
+        tk.Label(error_window_top, text="⚠️", font=("Arial", 20), bg="#FFC4C4").pack(pady=5)
 
-    # Display the error message
-    error_label = tk.Label(error_window, text=message, font=("Arial", 10), wraplength=250, bg="#FFC4C4")
+    # Label for the error message
+    error_label = tk.Label(error_window_top, font=("Arial", 10), wraplength=250, bg="#FFC4C4")
     error_label.pack(pady=5)
 
     # OK button to close the error window
-    ok_button = tk.Button(error_window, text="OK", command=error_window.destroy, bd=0, fg="white", bg="#CB4949")
+    ok_button = tk.Button(error_window_top, text="OK", command=error_window.hide, bd=0, fg="white", bg="#CB4949")
     ok_button.pack(pady=5)
+    return {'message': error_label}
 
-    error_window.grab_set()  # Modal behavior
+
+def build_transaction_record():
+    """Returns the checkout transaction saved to Firestore for the current basket."""
+    return {
+        'txnId': uuid.uuid4().hex,
+        'basketId': BASKET_ID,
+        'timestamp': time.time(),
+        'items': [
+            {'productId': line.product_id, 'itemName': line.name, 'itemPrice': line.price, 'quantity': line.quantity}
+            for line in basket.lines()
+        ],
+        'total': basket.total,
+        'budget': budget,
+    }
 
 
 def reset_basket():
-    """Resets the shopping basket state and updates the display."""
-    global items, total
-    items = {}
-    total = 0.0
+    """Saves the finished checkout, then resets the shopping basket state and updates the display."""
+    if basket:
+        record = build_transaction_record()
+        if gateway_client is not None and gateway_client.checkout(record):
+            # The gateway owns the basket: it saved the transaction and emptied its copy
+            print(f"Checkout saved by the basket gateway as transaction {record['txnId']}")
+        else:
+            # Goes to the local outbox; the upload happens in the background.
+            txn_id = firestore.save_transaction(record)
+            print(f"Checkout saved as transaction {txn_id}")
+
+    basket.clear()
 
-    # Re-aggregate an empty list to clear the display
-    update_display({})
+    # The scanner forgets every tag, so the next shopper's first scan of an
+    # item is an ADD; events read before checkout are dropped with it.
+    firestore.reset_scanner()
+    scan_queue.drain()
 
-    if 'qr_window' in globals() and qr_window:
-        qr_window.destroy()
+    # Redraw the now empty basket
+    update_display(basket.drain_changes())
+    if basket_sync is not None:
+        basket_sync.push_reset(basket)
+
+    qr_window.hide()
+
+
+def build_checkout_payload():
+    """
+    Returns the texts of the checkout QR codes for the current basket.
+
+    The compact, checksummed format (product IDs, quantities and total) is
+    described in checkout_payload.py; the cashier decodes it with pos_decoder.py.
+    Baskets too large for one readable code get several, scanned in turn.
+    """
+    return split_payload(encode_payload(basket.lines(), basket.total))
+
+
+def precompute_checkout_qr():
+    """
+    Speculatively renders the checkout QR once the basket has been idle.
+
+    Called from the GUI tick; the rendering itself runs on the QR worker thread.
+    """
+    if not basket or qr_precomputer.has(basket.version):
+        return
+    if time.monotonic() - last_basket_change < QR_IDLE_SECONDS:
+        return
+    qr_precomputer.request(basket.version, build_checkout_payload())
 
 
 def checkout():
-    """Generates a QR code containing the final basket contents and total."""
-    global qr_window
+    """Shows the checkout window with a QR code of the final basket contents and total."""
+    global pending_qr
 
-    if not items:
+    if not basket:
         show_custom_error("Basket Empty", "Please add items before checking out.")
         return
 
-    # Prepare data for the QR code
-    qr_data = "Sentinels Smart Basket Checkout:\n"
-    # Re-aggregate for a nice printout (as update_display does)
-    aggregate_items = {}
-    for details in items.values():
-        item_name = details['itemName']
-        item_price = details['price']
-        if item_name not in aggregate_items:
-            aggregate_items[item_name] = {'price': item_price, 'quantity': 1}
-        else:
-            aggregate_items[item_name]['quantity'] += 1
+    # Reuses the speculative render if the basket has not changed since
+    qr_future = qr_precomputer.request(basket.version, build_checkout_payload())
+    pending_qr = qr_future
+
+    # Show the QR Display Window right away, with a placeholder until the QR is ready
+    x = root.winfo_x() + root.winfo_width() // 2 - 150
+    y = root.winfo_y() + root.winfo_height() // 2 - 150
+    widgets = qr_window.show(f'300x350+{x}+{y}')
+    qr_label = widgets['qr']
+    qr_label.config(image="", text="Generating QR code...", width=30, height=12)
+    widgets['part'].pack_forget()
+    widgets['next'].pack_forget()
+
+    def show_qr_when_ready():
+        if pending_qr is not qr_future or not qr_window.visible:
+            return  # Window was closed, or a newer checkout took over
+        if not qr_future.done():
+            root.after(QR_POLL_MS, show_qr_when_ready)
+            return
+        try:
+            images = qr_future.result()
+        except Exception as e:
+            qr_label.config(text=f"Could not generate QR code: {e}")
+            return
+        show_qr_parts(images)
 
-    for name, details in aggregate_items.items():
-        qty = details['quantity']
-        price = details['price']
-        qr_data += f"{name} ({qty}x) @ ₱{price:.2f} each\n"
+    show_qr_when_ready()
 
-    qr_data += f"\nTOTAL: ₱{total:.2f}"
 
-    # Generate QR Code
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=4,  # Smaller box size for better fit on screen
-        border=4,
-    )
-    qr.add_data(qr_data)
-    qr.make(fit=True)
+def show_qr_parts(images):
+    """Shows the first of the checkout QR codes, with a 'Next code' button if there are several."""
+    global qr_parts, qr_part_index
+    qr_parts, qr_part_index = images, 0
+    widgets = qr_window.widgets
+    if len(images) > 1:
+        widgets['part'].pack(after=widgets['qr'])
+        widgets['next'].pack(after=widgets['part'], pady=(0, 5))
+    else:
+        widgets['part'].pack_forget()
+        widgets['next'].pack_forget()
+    show_qr_part()
 
-    qr_img = qr.make_image(fill='black', back_color='white')
-    qr_img.save("basket_qr.png")
 
-    qr_img_tk = ImageTk.PhotoImage(Image.open("basket_qr.png"))
+def show_qr_part():
+    """Shows the current checkout QR code (on the Tk thread) and grows the window to fit it."""
+    widgets = qr_window.widgets
+    image = qr_parts[qr_part_index]
+    # PhotoImage must be created (or pasted into) on the Tk thread
+    widgets['qr'].config(image=qr_photo.set(image), text="", width=0, height=0)
+    widgets['part'].config(text=f"Code {qr_part_index + 1} of {len(qr_parts)}: scan every code")
+    window = qr_window.window
+    width, height = max(300, image.width + 20), image.height + (170 if len(qr_parts) > 1 else 130)
+    window.geometry(f"{width}x{height}+{window.winfo_x()}+{window.winfo_y()}")
 
-    # Create QR Display Window
-    qr_window = tk.Toplevel(root)
-    qr_window.title("Checkout QR Code")
-    qr_window.configure(bg="#FFC4C4")
 
-    # Center the window
-    x = root.winfo_x() + root.winfo_width() // 2 - 150
-    y = root.winfo_y() + root.winfo_height() // 2 - 150
-    qr_window.geometry(f'300x350+{x}+{y}')
+def show_next_qr_part():
+    """'Next code' button: cycles through the checkout QR codes."""
+    global qr_part_index
+    if qr_parts:
+        qr_part_index = (qr_part_index + 1) % len(qr_parts)
+        show_qr_part()
 
-    qr_label = tk.Label(qr_window, image=qr_img_tk, bg="white")
-    qr_label.image = qr_img_tk
+
+def build_checkout_window(qr_window_top):
+    """Builds the contents of the reusable checkout window."""
+    qr_window_top.configure(bg="#FFC4C4")
+
+    qr_label = tk.Label(qr_window_top, bg="white", font=("Arial", 10))
     qr_label.pack(pady=10)
 
-    tk.Label(qr_window, text="Scan this code at the payment terminal.", bg="#FFC4C4", font=("Arial", 10)).pack()
+    # Only packed when the payload is split over several codes (see show_qr_parts)
+    part_label = tk.Label(qr_window_top, bg="#FFC4C4", font=("Arial", 10, "bold"))
+    next_button = tk.Button(qr_window_top, text="Next code", command=show_next_qr_part, bd=0, fg="white",
+                            bg="#4C78A8", font=("Sans-Serif", 11), padx=8, pady=4)
+
+    tk.Label(qr_window_top, text="Scan this code at the payment terminal.", bg="#FFC4C4", font=("Arial", 10)).pack()
 
     # Finish Shopping button
-    finish_button = tk.Button(qr_window, text="Finish Shopping / Reset", command=reset_basket, bd=0, fg="white",
+    finish_button = tk.Button(qr_window_top, text="Finish Shopping / Reset", command=reset_basket, bd=0, fg="white",
                               bg="#4C78A8", font=("Sans-Serif", 12), padx=10, pady=8)
     finish_button.pack(pady=10)
+    return {'qr': qr_label, 'part': part_label, 'next': next_button}
 
-    qr_window.grab_set()
 
-
-def update_display(aggregate_items):
+def load_item_image(name):
     """
-    Clears and redraws the item list based on the aggregated items.
+    Returns the 40x40 thumbnail for a product name from the image cache.
 
-    Args:
-        aggregate_items (dict): A dictionary of items aggregated by name,
-                                containing total quantity and price.
+    Returns:
+        ImageTk.PhotoImage or None: The image, or None if there is no usable file.
     """
-    global total, total_label, budget, budget_label_display, item_image_references
-
-    # Clear all existing item row widgets
-    for widget in rows_frame.winfo_children():
-        widget.destroy()
-
-    # Need to keep track of image references to prevent garbage collection
-    item_image_references = []
-    row_number = 0
-
-    # Sort items alphabetically for better readability
-    sorted_items = sorted(aggregate_items.items(), key=lambda item: item[0])
-
-    for name, details in sorted_items:
-        quantity = details['quantity']
-        price = details['price']
-
-        # --- Row Frame for the item ---
-        item_row_frame = tk.Frame(rows_frame, bg="#F0F0F0")
-        item_row_frame.grid(row=row_number, column=0, columnspan=3, sticky="ew", padx=5)
-        item_row_frame.grid_columnconfigure(0, weight=1)  # Name
-        item_row_frame.grid_columnconfigure(1, weight=0)  # Price
-        item_row_frame.grid_columnconfigure(2, weight=0)  # Quantity
-
-        # --- Image and Name (Column 0) ---
-        product_frame = tk.Frame(item_row_frame, bg="#F0F0F0")
-        product_frame.grid(row=0, column=0, sticky="w", padx=5, pady=5)
-
-        # Load the item image
-        image_file = os.path.join(IMAGE_PATH, f"{name.lower().replace(' ', '_')}.png")  # Normalize filename
-
-        item_image_tk = None
-        if os.path.exists(image_file):
-            try:
-                item_image = Image.open(image_file)
-                item_image = item_image.resize((40, 40), Image.Resampling.LANCZOS)
-                item_image_tk = ImageTk.PhotoImage(item_image)
-                item_image_references.append(item_image_tk)  # Store reference
-
-                image_label = tk.Label(product_frame, image=item_image_tk, bg="#F0F0F0")
-                image_label.pack(side=tk.LEFT, padx=(5, 10))
-            except Exception:
-                image_label = tk.Label(product_frame, text="🖼️", font=("Arial", 16), bg="#F0F0F0")
-                image_label.pack(side=tk.LEFT, padx=(5, 10))
-        else:
-            image_label = tk.Label(product_frame, text="📦", font=("Arial", 16), bg="#F0F0F0")
-            image_label.pack(side=tk.LEFT, padx=(5, 10))
+    image_file = os.path.join(IMAGE_PATH, f"{name.lower().replace(' ', '_')}.png")  # Normalize filename
+    return image_cache.get(image_file, ITEM_THUMBNAIL_SIZE)
 
-        # Product name
-        name_label = tk.Label(product_frame, text=name, bg="#F0F0F0", font=("Arial", 12, "bold"))
-        name_label.pack(side=tk.LEFT)
 
-        # Price (Column 1)
-        tk.Label(item_row_frame, text=f"₱{price:.2f}", bg="#F0F0F0", font=("Arial", 12)).grid(row=0, column=1,
-                                                                                              sticky="e", padx=(10, 20))
+def update_display(changed_ids=None):
+    """
+    Updates the item list and total from the basket.
 
-        # Quantity (Column 2)
-        quantity_label = tk.Label(item_row_frame, text=f"{quantity}", bg="#F0F0F0", font=("Arial", 12))
-        quantity_label.grid(row=0, column=2, sticky="e", padx=(10, 20))
+    Only the rows of products that changed are touched (see
+    basket_view.BasketRowView); the rest of the list is left as is.
 
-        # Underline for separation
-        underline_frame = tk.Frame(rows_frame, height=1, bg="#CB4949")
-        underline_frame.grid(row=row_number + 1, column=0, columnspan=3, sticky="ew", padx=10)
+    Args:
+        changed_ids (set, optional): Product IDs that changed, as returned by
+            `basket.drain_changes()`. Drained here when not given.
+    """
+    global total_label, budget, budget_label_display
 
-        row_number += 2
+    if changed_ids is None:
+        changed_ids = basket.drain_changes()
+    row_view.apply(basket, changed_ids)
 
     # --- Update Total ---
-    # Calculate the new total based on the unique items dictionary
-    total = sum(details['price'] * details['quantity'] for details in items.values())
+    # The basket keeps the running total up to date on every add/remove
+    total = basket.total
     total_label.config(text=f"₱{total:.2f}")
 
+    # Budget alerts fire once per threshold crossing, not on every scan
+    for alert in budget_alerts.evaluate(total):
+        alert_overlay.show_alert(alert)
+
     # Budget Check and Color Change
     if budget > 0 and total > budget:
         total_label.config(bg="#FF7777", fg="white", text=f"₱{total:.2f} (OVER)")  # Danger color
-        show_custom_error("Budget Alert", f"Your total (₱{total:.2f}) is over your budget (₱{budget:.2f})!")
     elif budget > 0 and total > (budget * 0.9):
         total_label.config(bg="#FFD700", fg="black")  # Warning color
     else:
@@ -524,13 +745,17 @@ def update_display(aggregate_items):
 
 
 # Main Application Execution
-root = tk.Tk()
-try:
-    init(root)
-    root.mainloop()
-except NameError as e:
-    print(f"\nFATAL ERROR: A required asset or dependency is missing. Details: {e}")
-    print("\nPLEASE ENSURE:")
-    print("1. 'savers.png' and 'warning.jpg' are in the same directory.")
-    print("2. The 'firestore_py.py' file is in the same directory.")
-    print("3. There is an 'items' directory with product images (e.g., 'items/apple.png').")
\ No newline at end of file
+if __name__ == "__main__":
+    startup_timer.mark("imports")
+    root = tk.Tk()
+    startup_timer.mark("tk_root")
+    try:
+        init(root)
+        startup_timer.mark("ui_built")
+        root.mainloop()
+    except NameError as e:
+        print(f"\nFATAL ERROR: A required asset or dependency is missing. Details: {e}")
+        print("\nPLEASE ENSURE:")
+        print("1. 'savers.png' and 'warning.jpg' are in the same directory.")
+        print("2. The 'firestore_py.py' file is in the same directory.")
+        print("3. There is an 'items' directory with product images (e.g., 'items/apple.png').")
\ No newline at end of file
@@ -0,0 +1,324 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+TRANSACTIONS_COLLECTION = "transactions"
+# Server time at which a transaction reached Firestore. Readers page on it:
+# a record's own 'timestamp' comes from the basket's clock, and a basket that
+# was offline delivers its checkouts late with older timestamps.
+RECEIVED_AT_FIELD = "receivedAt"
+FLUSH_BATCH_SIZE = 100  # Transactions read from the outbox per flush
+MAX_BATCH_WRITES = 500  # Firestore's limit on writes in one WriteBatch
+FLUSH_INTERVAL = 2.0  # Seconds between flush attempts when idle
+MAX_BACKOFF = 60.0  # Upper bound for the retry delay after failures
+SENT_RETENTION = 7 * 24 * 3600  # Seconds delivered records are kept for local readers
+PURGE_INTERVAL = 60 * 60  # Seconds between purges of delivered records
+READER_TIMEOUT = 14 * 24 * 3600  # Seconds after which a reader that stopped calling mark_read no longer holds back purges
+
+
+class CheckoutOutbox:
+    """
+    Durable local write-ahead outbox for checkout transactions.
+
+    Every checkout is first committed to a local SQLite database in WAL mode
+    (a few milliseconds, no network). A background `OutboxFlusher` later
+    drains it to Firestore. Each record gets a transaction ID when it is
+    appended; the ID doubles as the Firestore document ID, which makes
+    re-sending a record after a crash or a lost acknowledgement harmless.
+
+    Local readers of `records_after` (the analytics store) record how far
+    they got with `mark_read`; `purge_sent` never deletes past the slowest
+    reader that has advanced within `READER_TIMEOUT`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL makes every append durable across power loss, not just crashes.
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " txn_id TEXT NOT NULL UNIQUE,"
+            " record TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " sent_at REAL"
+            ")"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (sent_at, seq)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS readers ("
+            " name TEXT PRIMARY KEY,"
+            " seq INTEGER NOT NULL,"
+            " updated_at REAL NOT NULL DEFAULT 0"
+            ")"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(readers)")]
+        if "updated_at" not in columns:
+            # Readers from before expiry was tracked start their timeout now
+            self._conn.execute("ALTER TABLE readers ADD COLUMN updated_at REAL NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE readers SET updated_at = ?", (time.time(),))
+        self._conn.commit()
+
+    def append(self, record):
+        """
+        Durably stores a transaction record.
+
+        Args:
+            record (dict): JSON-serializable transaction data.
+
+        Returns:
+            str: The transaction ID (also stored in the record as 'txnId').
+        """
+        txn_id = record.get('txnId') or uuid.uuid4().hex
+        record = dict(record, txnId=txn_id)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (txn_id, record, created_at) VALUES (?, ?, ?)",
+                (txn_id, json.dumps(record, separators=(",", ":")), time.time()),
+            )
+            self._conn.commit()
+        return txn_id
+
+    def pending(self, limit=FLUSH_BATCH_SIZE):
+        """Returns up to `limit` unsent (txn_id, record) pairs, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT txn_id, record FROM outbox WHERE sent_at IS NULL ORDER BY seq LIMIT ?", (limit,)
+            ).fetchall()
+        return [(txn_id, json.loads(record)) for txn_id, record in rows]
+
+    def records_after(self, seq, limit=1000):
+        """
+        Returns up to `limit` records (sent or not) appended after `seq`, for
+        incremental readers such as the analytics store.
+
+        Returns:
+            list of (seq, txn_id, record) tuples, oldest first.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, txn_id, record FROM outbox WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limit)
+            ).fetchall()
+        return [(row_seq, txn_id, json.loads(record)) for row_seq, txn_id, record in rows]
+
+    def mark_read(self, reader, seq):
+        """Records that `reader` has consumed every record up to `seq` (see `records_after`)."""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO readers (name, seq, updated_at) VALUES (?, ?, ?)",
+                               (reader, seq, time.time()))
+            self._conn.commit()
+
+    def mark_sent(self, txn_ids):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany("UPDATE outbox SET sent_at = ? WHERE txn_id = ?",
+                                   [(now, txn_id) for txn_id in txn_ids])
+            self._conn.commit()
+
+    def mark_attempted(self, txn_ids):
+        with self._lock:
+            self._conn.executemany("UPDATE outbox SET attempts = attempts + 1 WHERE txn_id = ?",
+                                   [(txn_id,) for txn_id in txn_ids])
+            self._conn.commit()
+
+    def purge_sent(self, older_than=SENT_RETENTION, reader_timeout=READER_TIMEOUT):
+        """
+        Deletes records that were delivered more than `older_than` seconds ago
+        and that every registered reader has already consumed.
+
+        Readers that have not called `mark_read` for `reader_timeout` seconds
+        are dropped first, so a reader that went away cannot block purging
+        forever. If it comes back it simply misses the purged records.
+
+        Returns:
+            int: The number of records deleted.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM readers WHERE updated_at < ?", (time.time() - reader_timeout,))
+            read_up_to = self._conn.execute("SELECT MIN(seq) FROM readers").fetchone()[0]
+            if read_up_to is None:
+                read_up_to = self._conn.execute("SELECT MAX(seq) FROM outbox").fetchone()[0] or 0
+            deleted = self._conn.execute(
+                "DELETE FROM outbox WHERE sent_at IS NOT NULL AND sent_at < ? AND seq <= ?",
+                (time.time() - older_than, read_up_to),
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE sent_at IS NULL").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _is_already_exists(error):
+    """True for Firestore's 'document already exists' error (409)."""
+    return type(error).__name__ in ("AlreadyExists", "Conflict")
+
+
+class OutboxFlusher:
+    """
+    Background thread that drains a CheckoutOutbox into Firestore.
+
+    Pending records are written in WriteBatches of up to `batch_size`
+    documents. Documents are written with `create`, keyed by transaction ID,
+    so a record that already reached Firestore is never written twice. If a
+    batch fails because one of its documents already exists, the records are
+    retried one by one. Any other failure backs off exponentially; records
+    stay in the outbox until Firestore has acknowledged them.
+
+    Additional per-transaction writes (such as inventory decrements) can be
+    attached with `extra_writes`; they are committed in the same batch as the
+    transaction document, so they are applied exactly once as well.
+
+    Every `purge_interval` seconds, delivered records older than `retention`
+    are purged (see `CheckoutOutbox.purge_sent`).
+    """
+
+    def __init__(self, outbox, get_db, collection=TRANSACTIONS_COLLECTION, batch_size=FLUSH_BATCH_SIZE,
+                 interval=FLUSH_INTERVAL, max_backoff=MAX_BACKOFF, extra_writes=None,
+                 retention=SENT_RETENTION, purge_interval=PURGE_INTERVAL):
+        """
+        Args:
+            outbox (CheckoutOutbox): The outbox to drain.
+            get_db (callable): Returns the Firestore client, or None while offline.
+            extra_writes (callable, optional): `extra_writes(record)` returns a
+                list of (document_ref, data) pairs merged in with the transaction.
+        """
+        self.outbox = outbox
+        self.get_db = get_db
+        self.extra_writes = extra_writes
+        self.collection = collection
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.retention = retention
+        self.purge_interval = purge_interval
+
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._backoff = 0.0
+        self._last_purge = 0.0
+
+        # Counters
+        self.flushed = 0
+        self.failures = 0
+        self.purged = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def notify(self):
+        """
+        Asks the flusher to run now (e.g. right after a checkout). Ignored
+        while backing off after a failure, so checkouts don't cut the retry
+        delay short; the record is picked up when the backoff expires.
+        """
+        if not self._backoff:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self._backoff or self.interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                while self.flush_once():
+                    pass  # Keep draining while full batches are going through
+                self._backoff = 0.0
+            except Exception as e:
+                self.failures += 1
+                self._backoff = min(self.max_backoff, max(1.0, self._backoff * 2))
+                print(f"Outbox flush failed, retrying in {self._backoff:.0f}s: {e}")
+            self.purge_if_due()
+
+    def purge_if_due(self):
+        """Purges old delivered records if `purge_interval` has passed since the last purge."""
+        now = time.monotonic()
+        if self._last_purge and now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+        try:
+            self.purged += self.outbox.purge_sent(self.retention)
+        except Exception as e:
+            print(f"Outbox purge failed: {e}")
+
+    def flush_once(self):
+        """
+        Sends one batch of pending records.
+
+        Returns:
+            bool: True if a full batch was sent (more may be pending).
+        """
+        db = self.get_db()
+        if db is None:
+            return False
+        pending = self.outbox.pending(self.batch_size)
+        if not pending:
+            return False
+
+        collection_ref = db.collection(self.collection)
+
+        # Fill one WriteBatch, staying within Firestore's write limit.
+        batch = db.batch()
+        sent = []
+        writes = 0
+        for txn_id, record in pending:
+            extra = self.extra_writes(record) if self.extra_writes else []
+            if sent and writes + 1 + len(extra) > MAX_BATCH_WRITES:
+                break
+            self._add_to_batch(batch, collection_ref, txn_id, record, extra)
+            sent.append((txn_id, record))
+            writes += 1 + len(extra)
+
+        txn_ids = [txn_id for txn_id, _ in sent]
+        self.outbox.mark_attempted(txn_ids)
+        try:
+            batch.commit()
+        except Exception as e:
+            if not _is_already_exists(e):
+                raise
+            # Some records were delivered before; send the others individually.
+            self._flush_individually(db, collection_ref, sent)
+            return len(pending) == self.batch_size or len(sent) < len(pending)
+
+        self.outbox.mark_sent(txn_ids)
+        self.flushed += len(txn_ids)
+        return len(pending) == self.batch_size or len(sent) < len(pending)
+
+    @staticmethod
+    def _add_to_batch(batch, collection_ref, txn_id, record, extra):
+        from firebase_admin import firestore
+        batch.create(collection_ref.document(txn_id), dict(record, **{RECEIVED_AT_FIELD: firestore.SERVER_TIMESTAMP}))
+        for ref, data in extra:
+            batch.set(ref, data, merge=True)
+
+    def _flush_individually(self, db, collection_ref, pending):
+        for txn_id, record in pending:
+            try:
+                batch = db.batch()
+                extra = self.extra_writes(record) if self.extra_writes else []
+                self._add_to_batch(batch, collection_ref, txn_id, record, extra)
+                batch.commit()
+                self.flushed += 1
+            except Exception as e:
+                if not _is_already_exists(e):
+                    raise
+            self.outbox.mark_sent([txn_id])
@@ -0,0 +1,62 @@
+import sys
+
+from checkout_payload import decode_payload, join_parts
+
+
+def decode_checkout(text, lookup=None):
+    """
+    Decodes a scanned checkout QR for the cashier's POS.
+
+    Args:
+        text (str or list of str): The text read from the QR code, or the
+            texts of all the codes of a basket shown as several (any order).
+        lookup (callable, optional): `lookup(ids)` returning
+            {id: (itemName, itemPrice)}, e.g. `firestore.get_product_info_many`.
+            When given, names and prices are filled in and the basket total is
+            re-computed from the POS catalog.
+
+    Raises:
+        ValueError: If the payload is corrupt, incomplete or of an unsupported version.
+
+    Returns:
+        dict: {'version', 'lines': [{'productId', 'quantity', 'itemName',
+        'itemPrice'}], 'total', 'computedTotal', 'totalMatches'}.
+    """
+    payload = decode_payload(join_parts([text] if isinstance(text, str) else text))
+    products = lookup([product_id for product_id, _ in payload.lines]) if lookup else {}
+
+    lines = []
+    computed_cents = 0
+    for product_id, quantity in payload.lines:
+        name, price = products.get(product_id, (None, None))
+        if price is not None:
+            computed_cents += round(float(price) * 100) * quantity
+        lines.append({'productId': product_id, 'quantity': quantity, 'itemName': name, 'itemPrice': price})
+
+    computed_total = computed_cents / 100 if lookup else None
+    return {
+        'version': payload.version,
+        'lines': lines,
+        'total': payload.total,
+        'computedTotal': computed_total,
+        'totalMatches': None if computed_total is None else computed_total == payload.total,
+    }
+
+
+# Main Execution Block
+if __name__ == "__main__":
+    # Usage: python pos_decoder.py "<scanned QR text>" ["<next QR text>" ...]
+    if len(sys.argv) < 2:
+        print("Usage: python pos_decoder.py <payload> [<payload part> ...]")
+        sys.exit(2)
+
+    try:
+        checkout = decode_checkout(sys.argv[1:])
+    except ValueError as e:
+        print(f"Invalid checkout code: {e}")
+        sys.exit(1)
+
+    print(f"--- CHECKOUT (payload v{checkout['version']}) ---")
+    for line in checkout['lines']:
+        print(f"{line['productId']}  x{line['quantity']}")
+    print(f"TOTAL: ₱{checkout['total']:.2f}")
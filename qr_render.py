@@ -0,0 +1,73 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def render_qr(data, box_size=4, border=4):
+    """
+    Renders QR code data to an in-memory PIL image (no temporary file).
+
+    qrcode is imported here so it is only loaded by the worker thread.
+
+    Returns:
+        PIL.Image.Image: The QR code as an RGB image.
+    """
+    import qrcode
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,  # Smaller box size for better fit on screen
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.make_image(fill='black', back_color='white').get_image().convert("RGB")
+
+
+def render_qr_codes(texts, box_size=4, border=4):
+    """Renders each QR text of a (possibly multi-part) payload; returns the list of images."""
+    return [render_qr(text, box_size, border) for text in texts]
+
+
+class QrPrecomputer:
+    """
+    Renders checkout QR codes on a single worker thread.
+
+    Each render is keyed (by the basket version), and the latest one is kept:
+    asking again for the same key returns the same future, so a QR that was
+    computed speculatively while the basket sat idle is ready the moment
+    Checkout is pressed. Only PIL work happens here; turning the image into a
+    PhotoImage is left to the Tk thread.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="qr")
+        self._lock = threading.Lock()
+        self._key = None
+        self._future = None
+
+        # Counters
+        self.renders = 0
+        self.reused = 0
+
+    def request(self, key, texts):
+        """
+        Returns a future for the QR images of `texts` (the parts of a
+        payload, see checkout_payload.split_payload), rendering them only if
+        the latest render was for a different key.
+        """
+        with self._lock:
+            if self._future is not None and self._key == key:
+                self.reused += 1
+                return self._future
+            self._key = key
+            self._future = self._executor.submit(render_qr_codes, list(texts))
+            self.renders += 1
+            return self._future
+
+    def has(self, key):
+        """True if a render for `key` has been requested (finished or not)."""
+        with self._lock:
+            return self._key == key and self._future is not None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,219 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from tracing import registry as default_registry
+
+LOOKUP_DEADLINE = 2.0  # Seconds a lookup may take before the scanner gives up on it
+HEDGE_MIN_DELAY = 0.05  # Never send the hedged request sooner than this
+HEDGE_QUANTILE = 0.95  # Hedge once a call is slower than this share of recent calls
+HEDGE_REFRESH_CALLS = 20  # Recompute the hedge delay every this many calls
+FAILURE_THRESHOLD = 5  # Consecutive failures that open the circuit
+OPEN_SECONDS = 30.0  # How long the circuit stays open before a trial call
+
+# Circuit breaker states, as exported in the breaker state gauge
+CLOSED = 0
+HALF_OPEN = 1
+OPEN = 2
+STATE_NAMES = {CLOSED: "closed", HALF_OPEN: "half_open", OPEN: "open"}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Classic three-state circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls are refused for `open_seconds`. Then a single trial call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, open_seconds=OPEN_SECONDS, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and self.clock() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """True if a call may go through now."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if self.clock() - self._opened_at < self.open_seconds:
+                    return False
+                self._state = HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                print("Circuit breaker closed: backend is responding again.")
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    print(f"Circuit breaker opened after {self._failures} failures; "
+                          f"using local data for {self.open_seconds:.0f}s.")
+                self._state = OPEN
+                self._opened_at = self.clock()
+                self._trial_in_flight = False
+
+
+class ResilientClient:
+    """
+    Runs blocking backend calls with a deadline, request hedging and a
+    circuit breaker.
+
+    Each call runs on a small worker pool, so the caller (the scanning
+    thread) waits at most `deadline` seconds however long the backend hangs.
+    If the first attempt is still running after the recent p95 latency, an
+    identical second request is sent and the first answer wins; this trims
+    the tail without doubling the load. Timeouts and errors count towards
+    the circuit breaker; while it is open, calls fail immediately. In every
+    failure case the `fallback`, if given, supplies the result instead.
+
+    Only idempotent reads should go through a hedging client.
+    """
+
+    def __init__(self, name, deadline=LOOKUP_DEADLINE, hedge=True, breaker=None, max_workers=4,
+                 registry=default_registry):
+        """
+        Args:
+            name (str): Backend name, used in the metric labels.
+            deadline (float): Seconds before a call is abandoned.
+            hedge (bool): Send a second request once the p95 latency has passed.
+        """
+        self.name = name
+        self.deadline = deadline
+        self.hedge = hedge
+        self.breaker = breaker or CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-lookup")
+        self._lock = threading.Lock()  # Guards _calls and _hedge_delay; calls come from several threads
+        self._calls = 0
+        self._hedge_delay = None
+
+        labels = {"backend": name}
+        self._latency = registry.histogram("basket_backend_call_seconds",
+                                           "Latency of successful backend calls (including hedging)", labels)
+        self._outcomes = {outcome: registry.counter("basket_backend_calls_total", "Backend calls by outcome",
+                                                    dict(labels, outcome=outcome))
+                          for outcome in ("ok", "timeout", "error", "short_circuited")}
+        self._hedged = registry.counter("basket_backend_hedged_total", "Hedged second requests sent", labels)
+        self._hedge_wins = registry.counter("basket_backend_hedge_wins_total",
+                                            "Calls answered by the hedged request", labels)
+        self._fallbacks = registry.counter("basket_backend_fallbacks_total",
+                                           "Calls answered from the local fallback", labels)
+        registry.gauge(f"basket_{name}_breaker_state", f"Circuit breaker state of {name} "
+                       "(0 closed, 1 half-open, 2 open)", lambda: self.breaker.state)
+
+    def hedge_delay(self):
+        """Delay before hedging: the recent p95 call latency, recomputed every few calls."""
+        with self._lock:
+            if self._hedge_delay is None or self._calls % HEDGE_REFRESH_CALLS == 0:
+                p95 = self._latency.quantiles((HEDGE_QUANTILE,))[HEDGE_QUANTILE]
+                self._hedge_delay = max(HEDGE_MIN_DELAY, p95 if p95 is not None else self.deadline / 4)
+            return self._hedge_delay
+
+    def call(self, function, *args, fallback=None):
+        """
+        Calls `function(*args)` under the deadline, hedging and breaker policy.
+
+        Args:
+            fallback (callable, optional): Returns the result to use when the
+                call times out, fails or is refused by the open breaker.
+
+        Raises:
+            CircuitOpenError, TimeoutError or the function's own exception,
+            when no fallback is given.
+        """
+        with self._lock:
+            self._calls += 1
+        if not self.breaker.allow():
+            self._outcomes["short_circuited"].inc()
+            return self._fail(CircuitOpenError(f"{self.name} circuit is open"), fallback)
+
+        start = time.perf_counter()
+        deadline = start + self.deadline
+        hedge_at = start + self.hedge_delay() if self.hedge else None
+        pending = {self._executor.submit(function, *args)}
+        hedge = None
+        error = None
+
+        while pending:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            wake_at = deadline if hedge_at is None else min(hedge_at, deadline)
+            done, pending = wait(pending, timeout=wake_at - now, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e  # The other attempt, if any, may still succeed
+                    continue
+                self._succeeded(start, hedged=future is hedge)
+                return result
+            if pending and hedge_at is not None and time.perf_counter() >= hedge_at:
+                # Slower than usual: race an identical second request
+                hedge = self._executor.submit(function, *args)
+                pending.add(hedge)
+                self._hedged.inc()
+                hedge_at = None
+
+        self.breaker.record_failure()
+        if pending or error is None:
+            # Abandoned attempts finish (or hang) on the pool without blocking the caller
+            self._outcomes["timeout"].inc()
+            return self._fail(TimeoutError(f"{self.name} call exceeded {self.deadline:.1f}s"), fallback)
+        self._outcomes["error"].inc()
+        return self._fail(error, fallback)
+
+    def _succeeded(self, start, hedged):
+        self._latency.observe(time.perf_counter() - start)
+        self._outcomes["ok"].inc()
+        if hedged:
+            self._hedge_wins.inc()
+        self.breaker.record_success()
+
+    def _fail(self, error, fallback):
+        if fallback is None:
+            raise error
+        print(f"{self.name} lookup failed ({error}); using local data.")
+        self._fallbacks.inc()
+        return fallback()
+
+    def stats(self):
+        with self._lock:
+            hedge_delay = self._hedge_delay
+        return {
+            'state': STATE_NAMES[self.breaker.state],
+            'hedge_delay': hedge_delay,
+            **{outcome: counter.value for outcome, counter in self._outcomes.items()},
+            'hedged': self._hedged.value,
+            'hedge_wins': self._hedge_wins.value,
+            'fallbacks': self._fallbacks.value,
+        }
@@ -0,0 +1,231 @@
+import gc
+import os
+import tkinter as tk
+
+from PIL import ImageTk
+
+# Long-lived UI resources for a basket that runs for days without a restart.
+#
+# Widgets, windows and images are created once and then reused: row widgets
+# go back to a WidgetPool instead of being destroyed, dialogs are hidden and
+# shown again (ReusableWindow), and the checkout QR is pasted into the same
+# PhotoImage (PhotoSlot). ResourceManager keeps track of all of them and,
+# together with the process RSS, reports their sizes for the metrics
+# endpoint and the soak test (benchmark.py --soak).
+
+DEFAULT_MAX_IDLE = 64  # Idle items a WidgetPool keeps for reuse
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def memory_usage():
+    """
+    Returns the resident set size of this process in bytes.
+
+    Reads /proc/self/statm (Linux, including the Raspberry Pi); returns None
+    where it is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def count_widgets(widget):
+    """Number of Tk widgets in the tree under `widget`, including itself."""
+    count = 0
+    stack = [widget]
+    while stack:
+        current = stack.pop()
+        count += 1
+        stack.extend(current.winfo_children())
+    return count
+
+
+class WidgetPool:
+    """
+    Free list of identical widget groups (e.g. the rows of the basket list).
+
+    `acquire` hands out an idle item if there is one and builds a new one
+    otherwise; `release` hides the item and keeps it for the next `acquire`.
+    Only when `max_idle` items are already waiting is a released item
+    destroyed, so the number of widgets stays bounded by the peak in use.
+    """
+
+    def __init__(self, build, hide, destroy, max_idle=DEFAULT_MAX_IDLE):
+        """
+        Args:
+            build (callable): Returns a new item.
+            hide (callable): `hide(item)` takes an item off the screen.
+            destroy (callable): `destroy(item)` frees its widgets.
+            max_idle (int): Idle items kept for reuse.
+        """
+        self._build = build
+        self._hide = hide
+        self._destroy = destroy
+        self.max_idle = max_idle
+        self._idle = []
+
+        # Counters
+        self.created = 0
+        self.reused = 0
+        self.destroyed = 0
+
+    def acquire(self):
+        if self._idle:
+            self.reused += 1
+            return self._idle.pop()
+        self.created += 1
+        return self._build()
+
+    def release(self, item):
+        self._hide(item)
+        if len(self._idle) < self.max_idle:
+            self._idle.append(item)
+        else:
+            self._destroy(item)
+            self.destroyed += 1
+
+    def clear(self):
+        """Destroys the idle items."""
+        for item in self._idle:
+            self._destroy(item)
+        self.destroyed += len(self._idle)
+        self._idle.clear()
+
+    def stats(self):
+        return {
+            'in_use': self.created - self.destroyed - len(self._idle),
+            'idle': len(self._idle),
+            'created': self.created,
+            'reused': self.reused,
+            'destroyed': self.destroyed,
+        }
+
+
+class ReusableWindow:
+    """
+    A Toplevel that is built on first use and afterwards only shown and hidden.
+
+    Closing it (including with the window manager's close button) withdraws
+    it instead of destroying it, so opening a dialog for the thousandth time
+    allocates nothing.
+    """
+
+    def __init__(self, root, build, title="", modal=True):
+        """
+        Args:
+            root (tk.Tk): Parent window.
+            build (callable): `build(window)` creates the contents and returns
+                whatever the caller needs to update them later (e.g. a dict of
+                widgets); it is available as `widgets`.
+            modal (bool): Grab input while shown.
+        """
+        self.root = root
+        self._build = build
+        self.title = title
+        self.modal = modal
+        self.window = None
+        self.widgets = None
+
+        # Counters
+        self.builds = 0
+        self.shown = 0
+
+    def show(self, geometry=None, title=None):
+        """Shows the window, building it first if needed, and returns `widgets`."""
+        if self.window is None or not self.window.winfo_exists():
+            self.window = tk.Toplevel(self.root)
+            self.window.withdraw()
+            self.window.protocol("WM_DELETE_WINDOW", self.hide)
+            self.widgets = self._build(self.window)
+            self.builds += 1
+        self.window.title(title or self.title)
+        if geometry:
+            self.window.geometry(geometry)
+        self.window.deiconify()
+        self.window.lift()
+        if self.modal:
+            self.window.grab_set()
+        self.shown += 1
+        return self.widgets
+
+    def hide(self):
+        if self.window is not None and self.window.winfo_exists():
+            self.window.grab_release()
+            self.window.withdraw()
+
+    @property
+    def visible(self):
+        return self.window is not None and self.window.winfo_exists() and self.window.state() != "withdrawn"
+
+    def stats(self):
+        return {'builds': self.builds, 'shown': self.shown, 'visible': self.visible}
+
+
+class PhotoSlot:
+    """
+    One PhotoImage that is reused for a series of images (e.g. checkout QRs).
+
+    An image of the same size is pasted into the existing PhotoImage; only a
+    new size allocates a new one, and the previous one is released with it.
+    Must be used from the Tk thread.
+    """
+
+    def __init__(self):
+        self.photo = None
+        self.size = None
+        self.allocations = 0
+
+    def set(self, image):
+        """Shows a PIL image in the slot and returns the PhotoImage."""
+        if self.photo is not None and image.size == self.size:
+            self.photo.paste(image)
+        else:
+            self.photo = ImageTk.PhotoImage(image)
+            self.size = image.size
+            self.allocations += 1
+        return self.photo
+
+    def stats(self):
+        return {'size': self.size, 'allocations': self.allocations}
+
+
+class ResourceManager:
+    """
+    Registry of the UI's pools, windows and caches, for memory introspection.
+
+    Anything with a `stats()` method can be registered; `report` combines
+    their stats with the process RSS, the live Tk widget count and the
+    number of objects tracked by the garbage collector.
+    """
+
+    def __init__(self):
+        self.root = None  # Set to the Tk root to count its widgets
+        self._resources = {}
+
+    def register(self, name, resource):
+        self._resources[name] = resource
+        return resource
+
+    def window(self, name, root, build, title="", modal=True):
+        """Creates and registers a ReusableWindow."""
+        return self.register(name, ReusableWindow(root, build, title, modal))
+
+    def widget_count(self):
+        return count_widgets(self.root) if self.root is not None else None
+
+    def report(self, collect=False):
+        """
+        Args:
+            collect (bool): Run a full garbage collection first, for a stable
+                reading (used by the soak test; too slow for every scrape).
+        """
+        if collect:
+            gc.collect()
+        return {
+            'rss_bytes': memory_usage(),
+            'widgets': self.widget_count(),
+            'gc_objects': len(gc.get_objects()),
+            **{name: resource.stats() for name, resource in self._resources.items()},
+        }
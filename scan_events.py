@@ -0,0 +1,155 @@
+import time
+from collections import OrderedDict
+
+# Scan event types delivered to the basket
+ADD = "ADD"
+REMOVE = "REMOVE"
+
+# Toggle mode keeps quiet tags that are still in the basket so a second scan
+# can take them out. They are forgotten after IDLE_MAX_AGE seconds (longer
+# than any shopping trip), and at most IDLE_MAX_TAGS are kept.
+IDLE_MAX_AGE = 2 * 60 * 60
+IDLE_MAX_TAGS = 4096
+
+
+class _TagState:
+    __slots__ = ("present", "last_seen")
+
+    def __init__(self, present, last_seen):
+        self.present = present
+        self.last_seen = last_seen
+
+
+class TagDebouncer:
+    """
+    Per-tag state machine that turns raw reader output into ADD/REMOVE events.
+
+    Readers report the same tag many times per second while it is in the
+    field. Reads that arrive within `debounce_window` of the previous read of
+    the same tag are duplicates and are dropped with a single dict lookup.
+
+    Two removal modes are supported:
+
+    - Toggle mode (`presence_timeout=None`), for barcodes: a tag that is read
+      again after a quiet gap longer than the window is taken out again.
+    - Presence mode (`presence_timeout` in seconds), for RFID: a tag stays in
+      the basket while it keeps being read and is removed once it has not been
+      seen for `presence_timeout` seconds (see `expire`).
+
+    Tags are kept ordered by their last read, so `expire` only ever looks at
+    the tags that are actually due. The owner must call `reset` when the
+    basket is emptied (checkout), so that the next shopper's first scan of an
+    item is an ADD and not a REMOVE of an item the previous shopper bought.
+    """
+
+    def __init__(self, debounce_window=1.0, presence_timeout=None, clock=time.monotonic,
+                 idle_max_age=IDLE_MAX_AGE, idle_max_tags=IDLE_MAX_TAGS):
+        self.debounce_window = debounce_window
+        self.presence_timeout = presence_timeout
+        self.clock = clock
+        self.idle_max_age = idle_max_age
+        self.idle_max_tags = idle_max_tags
+        self._tags = OrderedDict()  # tag -> _TagState, oldest read first
+        self._idle = OrderedDict()  # Toggle mode: quiet tags still in the basket, oldest first
+
+        # Counters
+        self.reads = 0
+        self.duplicates = 0
+
+    def observe(self, tag, now=None):
+        """
+        Records one raw read of `tag`.
+
+        Returns:
+            str or None: ADD or REMOVE if the read changes the basket, or None
+            for a duplicate read.
+        """
+        if now is None:
+            now = self.clock()
+        self.reads += 1
+
+        state = self._tags.get(tag)
+        if state is None:
+            state = self._idle.pop(tag, None)
+            if state is None:
+                self._tags[tag] = _TagState(True, now)
+                return ADD
+            self._tags[tag] = state
+
+        quiet_for = now - state.last_seen
+        state.last_seen = now
+        self._tags.move_to_end(tag)
+
+        if quiet_for < self.debounce_window:
+            self.duplicates += 1
+            return None
+
+        if self.presence_timeout is not None:
+            # Presence mode: a read only matters if the tag had been removed.
+            if state.present:
+                self.duplicates += 1
+                return None
+            state.present = True
+            return ADD
+
+        # Toggle mode: a deliberate second scan takes the item out again.
+        state.present = not state.present
+        return ADD if state.present else REMOVE
+
+    def expire(self, now=None):
+        """
+        Retires tags that have gone quiet.
+
+        In presence mode this emits REMOVE for every tag that has not been read
+        for `presence_timeout` seconds. In toggle mode it only forgets removed
+        tags so the table does not grow without bound.
+
+        Returns:
+            list of str: Tags that must be removed from the basket.
+        """
+        if now is None:
+            now = self.clock()
+
+        removed = []
+        if self.presence_timeout is not None:
+            horizon = self.presence_timeout
+        else:
+            horizon = self.debounce_window
+
+        while self._tags:
+            tag, state = next(iter(self._tags.items()))
+            if now - state.last_seen < horizon:
+                break
+            del self._tags[tag]
+            if self.presence_timeout is not None:
+                if state.present:
+                    removed.append(tag)
+            elif state.present:
+                # Still in the basket; it needs a new read to toggle out.
+                self._idle[tag] = state
+
+        # Bound the idle table by age and size
+        while self._idle:
+            tag, state = next(iter(self._idle.items()))
+            if now - state.last_seen < self.idle_max_age and len(self._idle) <= self.idle_max_tags:
+                break
+            del self._idle[tag]
+        return removed
+
+    def is_present(self, tag):
+        """Whether `tag` currently counts as being in the basket."""
+        state = self._tags.get(tag) or self._idle.get(tag)
+        return state is not None and state.present
+
+    def forget(self, tag):
+        """Drops all state for a tag (e.g. after checkout)."""
+        self._tags.pop(tag, None)
+        self._idle.pop(tag, None)
+
+    def reset(self):
+        """Forgets every tag (e.g. after checkout)."""
+        self._tags.clear()
+        self._idle.clear()
+
+    def __len__(self):
+        return len(self._tags) + len(self._idle)
@@ -0,0 +1,484 @@
+import argparse
+import itertools
+import json
+import os
+import struct
+import threading
+import time
+
+# Scan sessions: every raw tag read, as it came out of the reader, appended to
+# a compact binary log so a shopper's session can be replayed later through
+# the real scan pipeline (debouncer, lookups, basket, UI) - at recorded speed,
+# faster, or as fast as the pipeline goes.
+#
+# File layout (one file per shopper, see SessionLog):
+#   MAGIC, then the session start as a little-endian double (Unix time), then
+#   one record per read:
+#     varint  microseconds since the previous read
+#     varint  tag number (tags are numbered in order of first appearance)
+#     [varint length + UTF-8 bytes]  only when the tag number is new
+# A repeat read costs 3-4 bytes. A record cut short by a crash is ignored.
+
+MAGIC = b"SBTAGS1\n"
+START_TIME = struct.Struct("<d")
+SESSION_DIR = "sessions"
+SESSION_SUFFIX = ".tags"
+FLUSH_INTERVAL = 1.0  # Seconds between flushes of the recorder's write buffer
+MAX_SESSIONS = 100  # Oldest session files beyond this many are deleted
+MAX_SESSION_BYTES = 4 * 1024 * 1024  # A session file this large is closed and a new one started
+
+# Virtual seconds a replay keeps running after the last read, so tags that
+# leave the reader field still produce their REMOVE events.
+DRAIN_SECONDS = 5.0
+
+
+def _encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_varint(data, position):
+    """Returns (value, new position); raises IndexError if the data ends mid-varint."""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+_session_numbers = itertools.count()
+
+
+def new_session_path(directory=SESSION_DIR):
+    """Returns a fresh, timestamped session file path in `directory`."""
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(directory, f"session-{stamp}-{os.getpid()}-{next(_session_numbers):04d}{SESSION_SUFFIX}")
+
+
+def list_sessions(directory=SESSION_DIR):
+    """Session files in `directory`, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(name for name in os.listdir(directory) if name.endswith(SESSION_SUFFIX))
+    return [os.path.join(directory, name) for name in names]
+
+
+def prune_sessions(directory=SESSION_DIR, keep=MAX_SESSIONS):
+    """Deletes the oldest session files so at most `keep` remain."""
+    sessions = list_sessions(directory)
+    for path in sessions[:max(0, len(sessions) - keep)]:
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"Could not delete old session {path}: {e}")
+
+
+class SessionRecorder:
+    """
+    Appends raw tag reads to a session file.
+
+    Records are encoded into an in-memory buffer and written out at most every
+    FLUSH_INTERVAL seconds, so recording costs the scan thread a few byte
+    appends per read. Meant to be used from a single thread (the scan thread).
+    """
+
+    def __init__(self, path, clock=time.monotonic):
+        """
+        Args:
+            path (str): New session file; it must not exist yet.
+            clock (callable): Monotonic clock the read times are taken from.
+        """
+        self.path = path
+        self.clock = clock
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "xb")
+        self._file.write(MAGIC + START_TIME.pack(time.time()))
+        self._file.flush()
+        self._buffer = bytearray()
+        self._tags = {}  # tag -> tag number
+        self._last = self.clock()
+        self._last_flush = self._last
+
+        # Counters
+        self.reads = 0
+        self.bytes_written = len(MAGIC) + START_TIME.size
+
+    def record(self, tag, now=None):
+        """Appends one read of `tag`."""
+        if now is None:
+            now = self.clock()
+        delta_us = max(0, int(round((now - self._last) * 1_000_000)))
+        self._last = now
+        number = self._tags.get(tag)
+        if number is None:
+            number = self._tags[tag] = len(self._tags)
+            _encode_varint(delta_us, self._buffer)
+            _encode_varint(number, self._buffer)
+            encoded = tag.encode("utf-8")
+            _encode_varint(len(encoded), self._buffer)
+            self._buffer += encoded
+        else:
+            _encode_varint(delta_us, self._buffer)
+            _encode_varint(number, self._buffer)
+        self.reads += 1
+        self._maybe_flush(now)
+
+    def _maybe_flush(self, now):
+        if self._buffer and now - self._last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def idle(self):
+        """Called when a poll read nothing, so a quiet basket does not sit on unwritten reads."""
+        self._maybe_flush(self.clock())
+
+    def flush(self):
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._file.flush()
+            self.bytes_written += len(self._buffer)
+            self._buffer.clear()
+        self._last_flush = self.clock()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def wrap(self, read_tag):
+        """
+        Returns a `read_tag(timeout)` function that records every tag it returns.
+
+        Idle polls (None) record nothing but give the buffer a chance to be
+        flushed, so a quiet basket does not sit on unwritten reads.
+        """
+        def recording_read_tag(timeout):
+            tag = read_tag(timeout)
+            if tag is not None:
+                self.record(tag)
+            else:
+                self.idle()
+            return tag
+        return recording_read_tag
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'reads': self.reads,
+            'distinct_tags': len(self._tags),
+            'bytes': self.bytes_written + len(self._buffer),
+        }
+
+
+class SessionLog:
+    """
+    Records a long-running scanner as a series of bounded session files.
+
+    A new file is started for every shopper (`rotate`, called at checkout)
+    and whenever the current one reaches `max_bytes`; each new file prunes
+    the directory down to `keep` files. Files are only created on the first
+    read, so an idle basket leaves none behind.
+
+    Reads are recorded on the scan thread (see `wrap`); `rotate` may be
+    called from any thread and takes effect there.
+    """
+
+    def __init__(self, directory=SESSION_DIR, keep=MAX_SESSIONS, max_bytes=MAX_SESSION_BYTES,
+                 clock=time.monotonic):
+        self.directory = directory
+        self.keep = keep
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.recorder = None  # SessionRecorder of the current shopper, if anything was read
+        self._rotate = threading.Event()
+        self._failed = False
+
+        # Counters
+        self.files = 0
+
+    def rotate(self):
+        """Ends the current session file; the next read starts a new one."""
+        self._rotate.set()
+
+    def _close_current(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def _current(self):
+        if self._rotate.is_set():
+            self._rotate.clear()
+            self._close_current()
+        elif self.recorder is not None and self.recorder.bytes_written >= self.max_bytes:
+            self._close_current()
+        if self.recorder is None:
+            prune_sessions(self.directory, self.keep - 1)
+            self.recorder = SessionRecorder(new_session_path(self.directory), self.clock)
+            self.files += 1
+        return self.recorder
+
+    def wrap(self, read_tag):
+        """
+        Returns a `read_tag(timeout)` function that records every tag it returns.
+
+        Recording stops (and scanning goes on) if a file cannot be written.
+        """
+        def recording_read_tag(timeout):
+            tag = read_tag(timeout)
+            if self._failed:
+                return tag
+            try:
+                if tag is not None:
+                    self._current().record(tag)
+                elif self._rotate.is_set():
+                    # Close the finished shopper's file now rather than at the next read
+                    self._rotate.clear()
+                    self._close_current()
+                elif self.recorder is not None:
+                    self.recorder.idle()
+            except OSError as e:
+                print(f"Scan session recording stopped: {e}")
+                self._failed = True
+            return tag
+        return recording_read_tag
+
+    def close(self):
+        self._close_current()
+
+
+class Session:
+    """A recorded session: its start time and (offset seconds, tag) reads."""
+
+    def __init__(self, start_time, reads, truncated=False):
+        self.start_time = start_time
+        self.reads = reads
+        self.truncated = truncated  # The file ended in the middle of a record
+
+    @property
+    def duration(self):
+        return self.reads[-1][0] if self.reads else 0.0
+
+    def __len__(self):
+        return len(self.reads)
+
+
+def read_session(path):
+    """
+    Loads a session file.
+
+    Raises:
+        ValueError: If the file is not a session file.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC) or len(data) < len(MAGIC) + START_TIME.size:
+        raise ValueError(f"{path} is not a scan session file")
+    (start_time,) = START_TIME.unpack_from(data, len(MAGIC))
+
+    tags = []
+    reads = []
+    offset_us = 0
+    position = len(MAGIC) + START_TIME.size
+    truncated = False
+    while position < len(data):
+        try:
+            delta_us, next_position = _decode_varint(data, position)
+            number, next_position = _decode_varint(data, next_position)
+            if number == len(tags):
+                length, next_position = _decode_varint(data, next_position)
+                if next_position + length > len(data):
+                    raise IndexError
+                tags.append(data[next_position:next_position + length].decode("utf-8"))
+                next_position += length
+            tag = tags[number]
+        except (IndexError, UnicodeDecodeError):
+            truncated = True
+            break
+        position = next_position
+        offset_us += delta_us
+        reads.append((offset_us / 1_000_000, tag))
+    return Session(start_time, reads, truncated)
+
+
+class ReplayFinished(Exception):
+    """Raised by `SessionReplay.read_tag` once the session and its drain time are over."""
+
+
+class VirtualClock:
+    """Session time of a replay, in seconds; a drop-in for `time.monotonic`."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SessionReplay:
+    """
+    A `read_tag(timeout)` function that plays back a recorded session.
+
+    Time in the scan pipeline is the session's own: `clock` advances to each
+    read's recorded offset (or by the poll timeout when nothing is due), and
+    `scan_loop` is given it in place of `time.monotonic`. The debouncer
+    therefore sees exactly the recorded timing and emits the same ADD and
+    REMOVE events at any `speed`; the speed only sets how long the replay
+    waits in real time (1.0 = as recorded, 10.0 = ten times faster,
+    None = no waiting at all).
+    """
+
+    def __init__(self, session, speed=1.0, drain=DRAIN_SECONDS):
+        self.reads = session.reads
+        self.speed = speed
+        self.clock = VirtualClock()
+        self._end = session.duration + drain
+        self._position = 0
+        self._real_start = None
+        self.finished = threading.Event()
+
+    def _advance(self, seconds):
+        self.clock.now += seconds
+        if self.speed:
+            # Paced against the real clock, so time spent in the pipeline
+            # does not add up to drift.
+            wait = self._real_start + self.clock.now / self.speed - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+
+    def read_tag(self, timeout):
+        if self._real_start is None:
+            self._real_start = time.perf_counter()
+        if timeout is None:
+            timeout = 1.0
+        now = self.clock.now
+
+        if self._position >= len(self.reads):
+            if now >= self._end:
+                self.finished.set()
+                raise ReplayFinished
+            self._advance(min(timeout, self._end - now))
+            return None
+
+        offset, tag = self.reads[self._position]
+        if offset - now > timeout:
+            self._advance(timeout)
+            return None
+        self._advance(max(0.0, offset - now))
+        self._position += 1
+        return tag
+
+
+def replay_session(session, callback, speed=1.0):
+    """
+    Feeds a recorded session through `firestore.scan_loop` into `callback`.
+
+    Blocks until the whole session has been played back.
+
+    Args:
+        session (Session or str): The session, or the path of a session file.
+        callback (callable): Scan callback, `callback(product, tag, event)`;
+            pass `main.update_display_from_scan` to drive the real UI.
+        speed (float or None): Replay speed factor; None replays as fast as
+            the pipeline allows.
+
+    Returns:
+        dict: Reads replayed, session and real duration.
+    """
+    import firestore
+    if isinstance(session, str):
+        session = read_session(session)
+    replay = SessionReplay(session, speed)
+    start = time.perf_counter()
+    try:
+        firestore.scan_loop(replay.read_tag, callback, clock=replay.clock)
+    except ReplayFinished:
+        pass
+    return {
+        'reads': len(session),
+        'session_seconds': round(session.duration, 3),
+        'replay_seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def _replay_headless(session, speed):
+    """Replays into the basket logic of main.py without building any widgets."""
+    import main
+    from tracing import registry, tracer
+    events = []
+
+    def callback(product, tag, event):
+        main.update_display_from_scan(product, tag, event)
+        # Apply right away on this thread, as the GUI tick would
+        for queued_product, queued_tag, queued_event in main.scan_queue.drain():
+            trace = tracer.get(queued_tag)
+            tracer.mark(trace, "queue")
+            applied = main.apply_scan_event(queued_product, queued_tag, queued_event)
+            tracer.mark(trace, "update")
+            tracer.finish(trace, "headless" if applied else "ignored")
+            events.append((queued_tag, queued_event, applied))
+
+    summary = replay_session(session, callback, speed)
+    summary.update({
+        'events': len(events),
+        'applied': sum(1 for _, _, applied in events if applied),
+        'basket_lines': len(main.basket),
+        'basket_total': round(main.basket.total, 2),
+        'stages': registry.snapshot(),
+    })
+    return summary
+
+
+def _replay_with_ui(session, speed):
+    """Runs the full basket UI with the session in place of the tag reader."""
+    import tkinter as tk
+    import main
+    root = tk.Tk()
+    main.root = root
+    # auto_scan initializes the backend, then hands update_display_from_scan
+    # to scan_barcode; the replay takes the scanner's place.
+    main.scan_barcode = lambda callback=None: print(replay_session(session, callback, speed))
+    main.init(root)
+    root.mainloop()
+
+
+# Main Execution Block
+if __name__ == "__main__":
+    # Usage: python session_recorder.py [--list] [--info PATH] [--replay PATH --speed 10 --headless]
+    parser = argparse.ArgumentParser(description="Smart Basket scan session recorder and replay")
+    parser.add_argument("--dir", default=SESSION_DIR, help="Directory of recorded sessions")
+    parser.add_argument("--list", action="store_true", help="List recorded sessions")
+    parser.add_argument("--info", metavar="PATH", help="Summarize a session file")
+    parser.add_argument("--replay", metavar="PATH", help="Replay a session file")
+    parser.add_argument("--speed", default="1", help="Replay speed factor (1, 10, ...) or 'max'")
+    parser.add_argument("--headless", action="store_true", help="Replay without the Tk UI and print a summary")
+    args = parser.parse_args()
+
+    if args.list:
+        for path in list_sessions(args.dir):
+            session = read_session(path)
+            print(f"{path}: {len(session)} reads over {session.duration:.1f}s")
+    if args.info:
+        session = read_session(args.info)
+        print(json.dumps({
+            'start_time': time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(session.start_time)),
+            'reads': len(session),
+            'distinct_tags': len({tag for _, tag in session.reads}),
+            'duration_seconds': round(session.duration, 3),
+            'truncated': session.truncated,
+        }, indent=2))
+    if args.replay:
+        speed = None if args.speed == "max" else float(args.speed)
+        session = read_session(args.replay)
+        if args.headless:
+            import firestore
+            firestore.init_backend()
+            print(json.dumps(_replay_headless(session, speed), indent=2))
+        else:
+            _replay_with_ui(session, speed)
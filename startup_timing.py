@@ -0,0 +1,61 @@
+import json
+import threading
+import time
+
+# Taken when this module is first imported; main.py imports it before anything
+# else, so it is as close to process start as we can get without extra deps.
+PROCESS_START = time.perf_counter()
+
+REPORT_PATH = "startup_report.json"
+
+
+class StartupTimer:
+    """
+    Records how long each startup phase took, relative to process start.
+
+    Phases are marked once (later marks of the same phase are ignored), from
+    any thread. The report is printed and written to REPORT_PATH as JSON so
+    boot times can be tracked across releases.
+    """
+
+    def __init__(self, start=PROCESS_START, report_path=REPORT_PATH):
+        self.start = start
+        self.report_path = report_path
+        self._phases = {}  # phase -> seconds since start, in marking order
+        self._lock = threading.Lock()
+
+    def mark(self, phase):
+        """
+        Records that `phase` has been reached.
+
+        Returns:
+            bool: True the first time the phase is marked.
+        """
+        elapsed = time.perf_counter() - self.start
+        with self._lock:
+            if phase in self._phases:
+                return False
+            self._phases[phase] = elapsed
+        print(f"[startup] {phase}: {elapsed * 1000:.0f} ms")
+        return True
+
+    def elapsed(self, phase):
+        """Seconds from process start to `phase`, or None if not reached yet."""
+        return self._phases.get(phase)
+
+    def report(self):
+        """Returns {phase: milliseconds since process start}."""
+        with self._lock:
+            return {phase: round(seconds * 1000, 1) for phase, seconds in self._phases.items()}
+
+    def write_report(self):
+        """Writes the report to the JSON file; failures are only logged."""
+        try:
+            with open(self.report_path, "w") as f:
+                json.dump(self.report(), f, indent=2)
+        except OSError as e:
+            print(f"Warning: could not write startup report: {e}")
+
+
+# Shared timer for the kiosk process
+timer = StartupTimer()
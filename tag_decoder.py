@@ -0,0 +1,170 @@
+import threading
+
+# Catalog field listing the tag prefixes (SKU codes, GTINs) of a product, as
+# a string or a list of strings. Products without it are matched by ID.
+TAG_PREFIX_FIELD = "tagPrefix"
+
+UNIT_SEPARATOR = "_U"  # Per-unit tags look like "<sku>_U<serial>", e.g. RT101_U12345
+
+# EPC SGTIN-96 partition table: partition -> (company prefix bits, digits, item reference bits, digits)
+SGTIN_PARTITIONS = {
+    0: (40, 12, 4, 1),
+    1: (37, 11, 7, 2),
+    2: (34, 10, 10, 3),
+    3: (30, 9, 14, 4),
+    4: (27, 8, 17, 5),
+    5: (24, 7, 20, 6),
+    6: (20, 6, 24, 7),
+}
+SGTIN96_HEADER = 0x30
+
+
+def _gtin_check_digit(digits):
+    """Check digit for the first 13 digits of a GTIN-14."""
+    total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(digits)))
+    return str((10 - total % 10) % 10)
+
+
+class Sgtin96Scheme:
+    """
+    EPC SGTIN-96 tags, as 24 hex characters (the usual UHF RFID encoding).
+
+    The product key is the GTIN-14 of the tag (company prefix and item
+    reference); the 38-bit serial number, which differs for every unit, is
+    dropped.
+    """
+    name = "sgtin96"
+
+    def product_key(self, tag):
+        if len(tag) != 24 or tag[:2] != "30":
+            return None
+        try:
+            value = int(tag, 16)
+        except ValueError:
+            return None
+        partition = (value >> 82) & 0x7
+        layout = SGTIN_PARTITIONS.get(partition)
+        if layout is None:
+            return None
+        company_bits, company_digits, item_bits, item_digits = layout
+        company = (value >> (38 + item_bits)) & ((1 << company_bits) - 1)
+        item = (value >> 38) & ((1 << item_bits) - 1)
+
+        item_text = str(item).zfill(item_digits)
+        # The indicator digit leads the item reference; the GTIN puts it first.
+        digits = item_text[0] + str(company).zfill(company_digits) + item_text[1:]
+        if len(digits) != 13:
+            return None
+        return digits + _gtin_check_digit(digits)
+
+
+class SeparatorScheme:
+    """Tags made of a product code, a separator and a unit serial (e.g. RT101_U12345)."""
+    name = "separator"
+
+    def __init__(self, separator=UNIT_SEPARATOR):
+        self.separator = separator
+
+    def product_key(self, tag):
+        head, found, _ = tag.partition(self.separator)
+        return head if found and head else None
+
+
+# Tried in order; a tag matching none of them is used as is (barcodes, and
+# tags that already carry the product document ID).
+DEFAULT_SCHEMES = (Sgtin96Scheme(), SeparatorScheme())
+
+
+class PrefixIndex:
+    """
+    Longest-prefix map from tag prefixes to product document IDs.
+
+    Prefixes are kept in one dict plus the set of distinct prefix lengths, so
+    resolving a key costs one dict probe per distinct length (typically one
+    or two), independent of the number of products.
+    """
+
+    def __init__(self, pairs=()):
+        self._prefixes = {}
+        self._lengths = []  # Distinct prefix lengths, longest first
+        for prefix, product_id in pairs:
+            self.add(prefix, product_id)
+
+    def add(self, prefix, product_id):
+        if not prefix:
+            return
+        self._prefixes[prefix] = product_id
+        if len(prefix) not in self._lengths:
+            # Copy-on-write so concurrent lookups never see a half-updated list
+            self._lengths = sorted(self._lengths + [len(prefix)], reverse=True)
+
+    def lookup(self, key):
+        """Returns the product ID of the longest prefix of `key`, or None."""
+        prefixes = self._prefixes
+        for length in self._lengths:
+            if length <= len(key):
+                product_id = prefixes.get(key[:length])
+                if product_id is not None:
+                    return product_id
+        return None
+
+    def get(self, key):
+        """Returns the product ID registered for exactly `key`, or None."""
+        return self._prefixes.get(key)
+
+    def __len__(self):
+        return len(self._prefixes)
+
+
+def tag_prefixes(item_data):
+    """Returns the tag prefixes listed in a catalog document, as a list."""
+    value = (item_data or {}).get(TAG_PREFIX_FIELD)
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(prefix) for prefix in value if prefix]
+
+
+class TagDecoder:
+    """
+    Maps raw tags to product document IDs.
+
+    Per-unit tags (RFID serials) are unique to each physical item, but all
+    units of a SKU must resolve to the same catalog entry so one cached
+    lookup serves them all. A tag is first reduced to a product key by the
+    first matching scheme, then the key is mapped through the prefix index
+    built from the catalog's `tagPrefix` fields; without a match, the key
+    itself is taken as the document ID.
+
+    Tags that match no scheme (barcodes, document IDs) are only mapped when
+    they equal a listed prefix: a prefix match would turn a product ID such
+    as "RT1015" into whichever product lists "RT101".
+    """
+
+    def __init__(self, schemes=DEFAULT_SCHEMES, index=None):
+        self.schemes = tuple(schemes)
+        self.index = index or PrefixIndex()
+        self._lock = threading.Lock()
+
+    def product_id(self, tag):
+        """Returns the product document ID for a raw tag."""
+        for scheme in self.schemes:
+            key = scheme.product_key(tag)
+            if key is not None:
+                mapped = self.index.lookup(key)
+                return mapped if mapped is not None else key
+        mapped = self.index.get(tag)
+        return mapped if mapped is not None else tag
+
+    def set_index(self, pairs):
+        """Replaces the prefix index with (prefix, product_id) pairs."""
+        index = PrefixIndex(pairs)
+        with self._lock:
+            self.index = index
+
+    def add_product(self, product_id, item_data):
+        """Adds the prefixes of one catalog document (e.g. from the realtime listener)."""
+        with self._lock:
+            for prefix in tag_prefixes(item_data):
+                self.index.add(prefix, product_id)
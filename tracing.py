@@ -0,0 +1,389 @@
+import bisect
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+# Per-scan tracing and metrics.
+#
+# Every tag read that changes the basket gets a trace ID and is timed stage by
+# stage on its way to the screen:
+#
+#   read    first read of the tag -> lookup starts (debounce and burst window)
+#   lookup  catalog lookup (cache, snapshot or Firestore)
+#   queue   handed to the Tk thread -> picked up by the next GUI tick
+#   update  basket mutation
+#   render  row and total redraw
+#
+# Stage and end-to-end durations feed rolling histograms, which are served in
+# Prometheus text format by `MetricsServer` (GET /metrics) and summarized per
+# trace in a rotating JSON-lines log.
+
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9464
+TRACE_LOG_PATH = "scan_traces.log"
+TRACE_LOG_MAX_BYTES = 1024 * 1024
+TRACE_LOG_BACKUPS = 3
+
+# Histogram buckets in seconds, from 1 ms to 5 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+ROLLING_WINDOW = 300.0  # Seconds of samples behind the p50/p95/p99 figures
+ROLLING_MAX_SAMPLES = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+MAX_ACTIVE_TRACES = 512  # Traces kept while waiting to be rendered
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+def _is_sample(value):
+    """True for values that can be exported as a gauge sample (numbers, but not bools)."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class Counter:
+    """Monotonically increasing count."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """
+    Duration histogram with cumulative buckets and rolling quantiles.
+
+    The buckets, sum and count cover the whole process lifetime (what
+    Prometheus expects); p50/p95/p99 are computed over the samples of the last
+    `window` seconds, capped at `max_samples`, so they follow the current
+    behaviour of the basket rather than its history.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=ROLLING_WINDOW, max_samples=ROLLING_MAX_SAMPLES):
+        self.buckets = tuple(buckets)
+        self.window = window
+        self._lock = threading.Lock()
+        self._bucket_counts = [0] * (len(self.buckets) + 1)  # Last one is +Inf
+        self._recent = deque(maxlen=max_samples)  # (monotonic time, seconds)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        with self._lock:
+            self._bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self._recent.append((time.monotonic(), seconds))
+            self.count += 1
+            self.sum += seconds
+
+    def quantiles(self, quantiles=QUANTILES):
+        """
+        Returns:
+            dict: {quantile: seconds} over the rolling window (None without samples).
+        """
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            while self._recent and self._recent[0][0] < cutoff:
+                self._recent.popleft()
+            values = sorted(seconds for _, seconds in self._recent)
+        if not values:
+            return {q: None for q in quantiles}
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in quantiles}
+
+    def cumulative_buckets(self):
+        with self._lock:
+            counts = list(self._bucket_counts)
+        running = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            result.append((bound, running))
+        return result
+
+
+class MetricsRegistry:
+    """
+    Named metrics, rendered in the Prometheus text exposition format.
+
+    Histograms and counters are created on first use and may carry labels;
+    gauges are callbacks evaluated at scrape time, so other modules can
+    publish their existing counters (cache hit rate, queue depth, ...)
+    without extra bookkeeping.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = OrderedDict()  # name -> (kind, help, {label tuple: metric})
+        self._gauges = OrderedDict()  # name -> (help, callable)
+
+    def _get(self, kind, factory, name, help_text, labels):
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            family = self._metrics.get(name)
+            if family is None:
+                family = self._metrics[name] = (kind, help_text, {})
+            metric = family[2].get(key)
+            if metric is None:
+                metric = family[2][key] = factory()
+            return metric
+
+    def histogram(self, name, help_text="", labels=None):
+        return self._get("histogram", Histogram, name, help_text, labels)
+
+    def counter(self, name, help_text="", labels=None):
+        return self._get("counter", Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text, read_value):
+        """
+        Registers a gauge read at scrape time.
+
+        Args:
+            read_value (callable): Returns a number, or a {label value: number}
+                dict rendered with a 'key' label.
+        """
+        with self._lock:
+            self._gauges[name] = (help_text, read_value)
+
+    def render(self):
+        """Returns all metrics in the Prometheus text format."""
+        with self._lock:
+            families = [(name, kind, help_text, list(metrics.items()))
+                        for name, (kind, help_text, metrics) in self._metrics.items()]
+            gauges = list(self._gauges.items())
+
+        lines = []
+        for name, kind, help_text, metrics in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in metrics:
+                if kind == "counter":
+                    lines.append(f"{name}{_format_labels(labels)} {metric.value}")
+                    continue
+                for bound, count in metric.cumulative_buckets():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels, {'le': le})} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {metric.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+
+            if kind == "histogram":
+                # Rolling quantiles as a separate summary family
+                lines.append(f"# HELP {name}_recent {help_text} (last {ROLLING_WINDOW:.0f}s)")
+                lines.append(f"# TYPE {name}_recent summary")
+                for labels, metric in metrics:
+                    for q, value in metric.quantiles().items():
+                        value = "NaN" if value is None else value
+                        lines.append(f"{name}_recent{_format_labels(labels, {'quantile': q})} {value}")
+
+        for name, (help_text, read_value) in gauges:
+            try:
+                value = read_value()
+            except Exception as e:
+                print(f"Metrics gauge {name} failed: {e}")
+                continue
+            # None (e.g. memory usage where /proc is missing) and non-numeric
+            # stats are skipped; a family with no samples left is left out.
+            if isinstance(value, dict):
+                samples = [(f"{name}{_format_labels((('key', key),))}", item)
+                           for key, item in value.items() if _is_sample(item)]
+            else:
+                samples = [(name, value)] if _is_sample(value) else []
+            if not samples:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(f"{series} {item}" for series, item in samples)
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        Returns the rolling quantiles of every histogram, for logs and reports.
+
+        Returns:
+            dict: {'name{labels}': {'count': n, 'p50': s, 'p95': s, 'p99': s}}.
+        """
+        with self._lock:
+            families = [(name, list(metrics.items())) for name, (kind, _, metrics) in self._metrics.items()
+                        if kind == "histogram"]
+        result = {}
+        for name, metrics in families:
+            for labels, metric in metrics:
+                quantiles = metric.quantiles()
+                result[name + _format_labels(labels)] = {
+                    'count': metric.count,
+                    **{f"p{round(q * 100)}": quantiles[q] for q in QUANTILES},
+                }
+        return result
+
+
+class Trace:
+    """Timing of one tag read on its way from the reader to the screen."""
+    __slots__ = ("trace_id", "tag", "event", "started", "last", "stages")
+
+    def __init__(self, trace_id, tag, event, started):
+        self.trace_id = trace_id
+        self.tag = tag
+        self.event = event
+        self.started = started
+        self.last = started
+        self.stages = {}  # stage -> seconds
+
+
+class Tracer:
+    """
+    Creates and completes per-scan traces.
+
+    Stages run on different threads (the scanner thread reads and looks up,
+    the Tk thread updates and renders), and the scan callback only carries
+    the tag, so the trace in flight for a tag is looked up by tag with `get`.
+    Each `mark` closes the stage that ran since the previous mark.
+    """
+
+    def __init__(self, registry, log_path=TRACE_LOG_PATH, enabled=True):
+        self.registry = registry
+        self.log_path = log_path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._active = OrderedDict()  # tag -> Trace
+        self._ids = itertools.count(1)
+        self._prefix = f"{os.getpid():x}-"
+        self._logger = None
+
+        self._total = registry.histogram("basket_scan_to_render_seconds",
+                                         "Time from the first read of a tag to the rendered basket change")
+        self._dropped = registry.counter("basket_traces_dropped_total",
+                                         "Traces discarded before being rendered")
+
+    def begin(self, tag, event=None, started=None):
+        """Starts the trace of a tag read that changes the basket; returns it (or None if disabled)."""
+        if not self.enabled:
+            return None
+        trace = Trace(self._prefix + format(next(self._ids), "x"), tag, event,
+                      time.perf_counter() if started is None else started)
+        with self._lock:
+            if self._active.pop(tag, None) is not None:
+                self._dropped.inc()  # Superseded before it was rendered
+            self._active[tag] = trace
+            while len(self._active) > MAX_ACTIVE_TRACES:
+                self._active.popitem(last=False)
+                self._dropped.inc()
+        return trace
+
+    def get(self, tag):
+        """Returns the trace in flight for a tag, or None."""
+        with self._lock:
+            return self._active.get(tag)
+
+    def mark(self, trace, stage, now=None):
+        """Ends `stage` of a trace, timing it from the previous mark."""
+        if trace is None:
+            return
+        now = time.perf_counter() if now is None else now
+        seconds = now - trace.last
+        trace.last = now
+        trace.stages[stage] = trace.stages.get(stage, 0.0) + seconds
+        self.registry.histogram("basket_scan_stage_seconds", "Duration of each stage of a scan",
+                                {"stage": stage}).observe(seconds)
+
+    def finish(self, trace, outcome="rendered"):
+        """Completes a trace: records the end-to-end time and writes it to the log."""
+        if trace is None:
+            return
+        with self._lock:
+            if self._active.get(trace.tag) is not trace:
+                return  # Already finished, or superseded by a newer read
+            del self._active[trace.tag]
+        total = trace.last - trace.started
+        if outcome == "rendered":
+            self._total.observe(total)
+        self.registry.counter("basket_traces_total", "Completed scan traces",
+                              {"outcome": outcome}).inc()
+        self._log({
+            'trace': trace.trace_id,
+            'tag': trace.tag,
+            'event': trace.event,
+            'outcome': outcome,
+            'total_ms': round(total * 1000, 3),
+            'stages_ms': {stage: round(seconds * 1000, 3) for stage, seconds in trace.stages.items()},
+        })
+
+    def _log(self, record):
+        if self.log_path is None:
+            return
+        if self._logger is None:
+            logger = logging.getLogger("smart_basket.traces")
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            try:
+                handler = RotatingFileHandler(self.log_path, maxBytes=TRACE_LOG_MAX_BYTES,
+                                              backupCount=TRACE_LOG_BACKUPS)
+            except OSError as e:
+                print(f"Trace log disabled: {e}")
+                self.log_path = None
+                return
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            self._logger = logger
+        record['ts'] = round(time.time(), 3)
+        self._logger.info(json.dumps(record, separators=(",", ":")))
+
+
+class MetricsServer:
+    """Serves the registry on http://host:port/metrics from a daemon thread."""
+
+    def __init__(self, registry, host=METRICS_HOST, port=METRICS_PORT):
+        self.registry = registry
+        self.address = (host, port)
+        self._server = None
+
+    def start(self):
+        if self._server is not None:
+            return True
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the console
+
+        try:
+            self._server = ThreadingHTTPServer(self.address, Handler)
+        except OSError as e:
+            print(f"Metrics endpoint not started on {self.address[0]}:{self.address[1]}: {e}")
+            return False
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"Metrics available at http://{self.address[0]}:{self._server.server_port}/metrics")
+        return True
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# Shared instances used by firestore.py, main.py and the gateway
+registry = MetricsRegistry()
+tracer = Tracer(registry)